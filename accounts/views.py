@@ -17,32 +17,43 @@ from django.core.mail import send_mail
 from .sms_utils import send_sms_otp
 from django.conf import settings
 from rest_framework.permissions import AllowAny
+from wedding_backend.db_writes import serialized_write
+
+
+@serialized_write
+def create_user_with_otps(serializer):
+    """
+    Create the user and one OTP per verification method in one write
+    transaction; returns (user, {method: otp_code}). Nothing is sent here, so
+    a retry on "database is locked" only repeats the inserts.
+    """
+    # create() rather than save(): save() would turn a retry into an update
+    user = serializer.create(dict(serializer.validated_data))
+    otp_codes = {}
+    methods = (['email'] if user.email else []) + (['phone'] if user.phone_number else [])
+    for method in methods:
+        otp_code = ''.join([str(random.randint(0, 9)) for _ in range(6)])
+        OTP.objects.create(
+            user=user,
+            otp=otp_code,
+            otp_type=method,
+            expires_at=timezone.now() + timedelta(minutes=settings.OTP_EXPIRY_MINUTES)
+        )
+        otp_codes[method] = otp_code
+    return user, otp_codes
 
 
 class RegisterView(APIView):
     permission_classes = [AllowAny] 
+    
     def post(self, request):
         serializer = UserRegisterSerializer(data=request.data)
         if serializer.is_valid():
-            user = serializer.save()
-            
-            verification_methods = []
-            if user.email:
-                verification_methods.append('email')
-            if user.phone_number:
-                verification_methods.append('phone')
+            # The mail/SMS below run after the write transaction has committed
+            user, otp_codes = create_user_with_otps(serializer)
+            verification_methods = list(otp_codes)
             
-            for method in verification_methods:
-                otp_code = ''.join([str(random.randint(0, 9)) for _ in range(6)])
-                expires_at = timezone.now() + timedelta(minutes=settings.OTP_EXPIRY_MINUTES)
-                
-                OTP.objects.create(
-                    user=user,
-                    otp=otp_code,
-                    otp_type=method,
-                    expires_at=expires_at
-                )
-                
+            for method, otp_code in otp_codes.items():
                 if method == 'email':
                     send_mail(
                         'Verify Your Account',
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Order, OrderItem, VendorOrderNotification
+from .models import Order, OrderItem, VendorOrder, VendorOrderNotification, EmailOutbox
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -49,4 +49,18 @@ class OrderItemAdmin(admin.ModelAdmin):
 class VendorOrderNotificationAdmin(admin.ModelAdmin):
     list_display = ['order', 'vendor', 'email_sent', 'email_sent_at', 'viewed', 'viewed_at']
     list_filter = ['email_sent', 'viewed', 'created_at']
-    readonly_fields = ['order', 'vendor', 'created_at']
\ No newline at end of file
+    readonly_fields = ['order', 'vendor', 'created_at']
+
+@admin.register(VendorOrder)
+class VendorOrderAdmin(admin.ModelAdmin):
+    list_display = ['order', 'vendor', 'status', 'viewed', 'created_at']
+    list_filter = ['status', 'viewed', 'created_at']
+    search_fields = ['order__order_number', 'vendor__email']
+    readonly_fields = ['order', 'vendor', 'created_at']
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'to_email', 'order', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['kind', 'status', 'created_at']
+    search_fields = ['to_email', 'order__order_number']
+    readonly_fields = ['order', 'notification', 'created_at', 'sent_at']
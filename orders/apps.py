@@ -5,4 +5,4 @@ class OrdersConfig(AppConfig):
     name = 'orders'
     
     def ready(self):
-        pass
\ No newline at end of file
+        from . import signals  # noqa: F401
@@ -0,0 +1,103 @@
+from decimal import Decimal
+from django.db import transaction
+from services import popularity
+from services.availability import parse_day, reserve_dates
+from services.resolver import ServiceRef, make_snapshot, resolve_many
+from .models import Order, OrderItem, VendorOrder
+from .events import record_event
+from .notifications import queue_order_notifications
+from . import vendor_stats
+from .serializers import snapshot_items
+
+
+def customer_fields(user):
+    return {
+        'customer': user,
+        'customer_name': f"{user.first_name} {user.last_name}".strip() or user.username,
+        'customer_email': user.email,
+        'customer_phone': user.phone_number or '',
+    }
+
+
+def place_order(user, lines, event_date=None, special_instructions=''):
+    """
+    Create an order from lines (dicts with service_type, service_id and
+    optional quantity, service_date, service_time, notes) in one batched
+    pass: services are loaded with one query per type, the order is
+    inserted once with its total, items and vendor notifications are
+    bulk-inserted, the rendered items are stored on the order as its
+    immutable items_snapshot, each vendor gets a VendorOrder inbox row, and
+    emails are queued in the outbox. Lines
+    whose service no longer exists are skipped.
+
+    The number of queries does not depend on the number of lines. Must run
+    inside a transaction; raises BookingConflict if a date is taken.
+    """
+    lines = list(lines)
+    services = resolve_many((line['service_type'], line['service_id']) for line in lines)
+
+    order = Order(
+        event_date=event_date,
+        special_instructions=special_instructions,
+        **customer_fields(user)
+    )
+
+    order_items = []
+    for line in lines:
+        service = services.get(ServiceRef(line['service_type'], int(line['service_id'])))
+        if not service:
+            continue
+        snapshot = make_snapshot(line['service_type'], service)
+
+        quantity = line.get('quantity') or 1
+        unit_price = snapshot['unit_price']
+        item = OrderItem(
+            order=order,
+            service_type=line['service_type'],
+            service_id=line['service_id'],
+            service_name=snapshot['name'],
+            service_price=unit_price,
+            vendor_id=snapshot['creator_id'],
+            vendor_name=snapshot['creator_name'] if snapshot['creator_id'] else 'Unknown Vendor',
+            vendor_email=snapshot['creator_email'],
+            quantity=quantity,
+            unit_price=unit_price,
+            total_price=unit_price * quantity,
+            service_date=line.get('service_date'),
+            service_time=line.get('service_time'),
+            notes=line.get('notes', '')
+        )
+        item._service_cache = service
+        order_items.append(item)
+
+    order.total_amount = sum((item.total_price for item in order_items), Decimal('0'))
+    order.save()
+    OrderItem.objects.bulk_create(order_items)
+
+    # Rendered after the insert so item ids are included; same order as order.items.all()
+    order.items_snapshot = snapshot_items(sorted(order_items, key=lambda item: item.pk, reverse=True))
+    Order.objects.filter(pk=order.pk).update(items_snapshot=order.items_snapshot)
+
+    # Claim service dates last so the booking rows are locked as briefly as possible
+    reserve_dates(order, [
+        (item.service_type, item.service_id, parse_day(item.service_date))
+        for item in order_items if parse_day(item.service_date)
+    ])
+
+    # Vendor inbox rows (see VendorOrder)
+    vendor_ids = sorted({item.vendor_id for item in order_items if item.vendor_id})
+    VendorOrder.objects.bulk_create([
+        VendorOrder(vendor_id=vendor_id, order=order, status=order.order_status, created_at=order.created_at)
+        for vendor_id in vendor_ids
+    ])
+
+    record_event(order, 'created', vendor_ids)
+    vendor_stats.record_order(order, order_items)
+    queue_order_notifications(order, order_items)
+
+    def record_bookings():
+        for item in order_items:
+            popularity.record(item.service_type, item.service_id, 'bookings')
+    transaction.on_commit(record_bookings)
+
+    return order
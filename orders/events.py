@@ -0,0 +1,135 @@
+"""
+Order event log and its SSE stream.
+
+record_event()/record_events() append one OrderEvent row per recipient
+(the customer and every vendor on the order) in the caller's transaction.
+frames() polls the indexed (recipient, id) range after the client's
+Last-Event-ID every ORDER_EVENTS_POLL_INTERVAL seconds, sends a comment line
+as heartbeat, and ends after ORDER_EVENTS_MAX_STREAM seconds so the client
+reconnects (and resumes) through the normal EventSource retry.
+
+OrderEventStreamView serves it through stream_sync() under WSGI and stream()
+under ASGI. Django's WSGI handler drains an async iterator completely before
+sending anything, and its ASGI handler does the same with a sync one, so each
+server needs its own kind of generator to deliver frames as they happen.
+"""
+import asyncio
+import json
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from .models import OrderEvent, VendorOrder
+
+# Events sent per poll; a client far behind catches up over several polls
+BATCH_SIZE = 100
+
+
+def record_events(orders, kind):
+    """Append kind for each order to the streams of its customer and vendors (two queries)"""
+    orders = list(orders)
+    vendor_ids = {}
+    for order_id, vendor_id in VendorOrder.objects.filter(order__in=orders).values_list('order_id', 'vendor_id'):
+        vendor_ids.setdefault(order_id, []).append(vendor_id)
+    OrderEvent.objects.bulk_create([
+        event
+        for order in orders
+        for event in order_events(order, kind, vendor_ids.get(order.pk, []))
+    ])
+
+
+def order_events(order, kind, vendor_ids):
+    return [
+        OrderEvent(
+            recipient_id=recipient_id, order=order, kind=kind,
+            order_status=order.order_status, payment_status=order.payment_status
+        )
+        for recipient_id in sorted({order.customer_id, *vendor_ids})
+    ]
+
+
+def record_event(order, kind, vendor_ids=None):
+    """Append kind for order to the stream of its customer and vendors"""
+    if vendor_ids is None:
+        record_events([order], kind)
+    else:
+        OrderEvent.objects.bulk_create(order_events(order, kind, vendor_ids))
+
+
+def latest_event_id(user):
+    return OrderEvent.objects.filter(recipient=user).order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def events_after(user, last_id):
+    return list(
+        OrderEvent.objects.filter(recipient=user, id__gt=last_id).order_by('id')
+        .values('id', 'order_id', 'kind', 'order_status', 'payment_status', 'created_at')[:BATCH_SIZE]
+    )
+
+
+def format_event(event):
+    data = {
+        'order_id': event['order_id'],
+        'kind': event['kind'],
+        'order_status': event['order_status'],
+        'payment_status': event['payment_status'],
+        'created_at': event['created_at'].isoformat(),
+    }
+    return f"id: {event['id']}\nevent: order\ndata: {json.dumps(data)}\n\n"
+
+
+# Yielded by frames() when the caller should wait one poll interval
+POLL = object()
+
+
+def frames(user, last_id):
+    """
+    SSE frames for user's events after last_id (new events only if None),
+    with POLL between polls. Shared by the sync and async streams.
+    """
+    heartbeat = getattr(settings, 'ORDER_EVENTS_HEARTBEAT', 15)
+    deadline = time.monotonic() + getattr(settings, 'ORDER_EVENTS_MAX_STREAM', 300)
+
+    if last_id is None:
+        last_id = latest_event_id(user)
+    yield f"retry: {int(poll_interval() * 1000)}\n\n"
+
+    last_sent = time.monotonic()
+    while time.monotonic() < deadline:
+        events = events_after(user, last_id)
+        for event in events:
+            last_id = event['id']
+            yield format_event(event)
+        if events:
+            last_sent = time.monotonic()
+            if len(events) == BATCH_SIZE:
+                continue
+        elif time.monotonic() - last_sent >= heartbeat:
+            last_sent = time.monotonic()
+            yield ": keepalive\n\n"
+        yield POLL
+
+
+def poll_interval():
+    return getattr(settings, 'ORDER_EVENTS_POLL_INTERVAL', 2)
+
+
+def stream_sync(user, last_id=None):
+    """Generator for WSGI: each frame is sent as soon as it is yielded"""
+    for frame in frames(user, last_id):
+        if frame is POLL:
+            time.sleep(poll_interval())
+        else:
+            yield frame
+
+
+async def stream(user, last_id=None):
+    """Async generator for ASGI: waiting between polls holds no thread"""
+    pending = frames(user, last_id)
+    while True:
+        frame = await sync_to_async(next)(pending, None)
+        if frame is None:
+            return
+        if frame is POLL:
+            await asyncio.sleep(poll_interval())
+        else:
+            yield frame
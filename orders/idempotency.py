@@ -0,0 +1,114 @@
+"""
+Idempotency-Key support for order-creating endpoints.
+
+Clients retrying a POST send the same Idempotency-Key header. The first
+request claims the key by inserting an IdempotencyKey row inside the view's
+transaction and stores its successful response in the same transaction, so
+the key and the order commit (or roll back) together. A concurrent duplicate
+blocks on the row's unique index until the first request finishes (on SQLite
+the write transaction already serializes them) and then replays the stored
+response. Replays cost one SELECT and never touch orders or mail.
+
+Only 2xx responses are stored; any other outcome releases the key so a
+retry runs again. Reusing a key for a different request body is a 422.
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+
+
+def fingerprint(request):
+    payload = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(f"{request.method} {request.path}\n{payload}".encode()).hexdigest()
+
+
+def expiry_cutoff():
+    return timezone.now() - timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 3600))
+
+
+def replay(record, request_fingerprint):
+    if record.fingerprint != request_fingerprint:
+        return Response(
+            {'error': f'{HEADER} was already used for a different request.'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    if record.status_code is None:
+        return Response(
+            {'error': f'A request with this {HEADER} is still being processed.'},
+            status=status.HTTP_409_CONFLICT
+        )
+    return Response(record.response, status=record.status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+def claim(user, key, request_fingerprint):
+    """
+    Insert the in-progress row for key. Returns (record, None) when claimed,
+    or (None, existing) when another request already holds the key.
+    """
+    for attempt in (1, 2):
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(user=user, key=key, fingerprint=request_fingerprint), None
+        except IntegrityError:
+            existing = IdempotencyKey.objects.filter(user=user, key=key).first()
+            if existing is None or existing.created_at < expiry_cutoff():
+                # Gone or expired in the meantime: take it over
+                IdempotencyKey.objects.filter(user=user, key=key, created_at__lt=expiry_cutoff()).delete()
+                continue
+            return None, existing
+    return None, existing
+
+
+def idempotent(view_func):
+    """
+    Decorator for APIView methods that create orders. Apply it inside the
+    transaction (below serialized_write); requests without the header are
+    passed straight through.
+    """
+
+    @functools.wraps(view_func)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return view_func(view, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response(
+                {'error': f'{HEADER} must be at most 255 characters.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        request_fingerprint = fingerprint(request)
+        existing = IdempotencyKey.objects.filter(
+            user=request.user, key=key, created_at__gte=expiry_cutoff()
+        ).first()
+        if existing is not None:
+            return replay(existing, request_fingerprint)
+
+        record, existing = claim(request.user, key, request_fingerprint)
+        if record is None:
+            return replay(existing, request_fingerprint)
+
+        # An exception rolls the claim back with the rest of the transaction
+        response = view_func(view, request, *args, **kwargs)
+        if transaction.get_rollback():
+            # The claim is rolled back along with everything else
+            return response
+        if status.is_success(response.status_code):
+            record.status_code = response.status_code
+            record.response = response.data
+            record.save(update_fields=['status_code', 'response'])
+        else:
+            record.delete()
+        return response
+
+    return wrapper
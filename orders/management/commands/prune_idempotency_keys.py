@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from orders.idempotency import expiry_cutoff
+from orders.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Delete Idempotency-Key responses older than IDEMPOTENCY_KEY_TTL (run daily from cron)'
+
+    def handle(self, *args, **options):
+        deleted, _ = IdempotencyKey.objects.filter(created_at__lt=expiry_cutoff()).delete()
+        self.stdout.write(f'deleted {deleted} expired keys')
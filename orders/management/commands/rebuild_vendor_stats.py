@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+from services.availability import parse_day
+from orders.vendor_stats import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the vendor dashboard rollups (VendorDailyStats) from order items'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendor', type=int, default=None, help='Only this vendor id')
+        parser.add_argument('--since', default=None, help='Only days from this date (YYYY-MM-DD)')
+
+    def handle(self, *args, vendor=None, since=None, **options):
+        since_day = parse_day(since)
+        if since and not since_day:
+            raise CommandError('--since must be YYYY-MM-DD')
+        rows = rebuild(vendor_id=vendor, since=since_day)
+        self.stdout.write(f'wrote {rows} rollup rows')
@@ -0,0 +1,24 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection
+from orders.notifications import deliver_due
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued order emails from the outbox (run from cron, or with --loop as a worker)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Emails per SMTP connection')
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting when the outbox is empty')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds between polls with --loop')
+
+    def handle(self, *args, batch_size=None, loop=False, interval=5, **options):
+        while True:
+            sent, failed = deliver_due(batch_size)
+            if sent or failed:
+                self.stdout.write(f'sent {sent}, failed {failed}')
+                continue
+            if not loop:
+                break
+            connection.close()
+            time.sleep(interval)
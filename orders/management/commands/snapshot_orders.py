@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from orders.models import Order, prefetch_order_services
+from orders.serializers import snapshot_items
+
+
+class Command(BaseCommand):
+    help = 'Store items_snapshot on orders placed before snapshots existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, batch_size=200, **options):
+        done = 0
+        while True:
+            orders = list(
+                Order.objects.filter(items_snapshot__isnull=True).order_by('pk')
+                .prefetch_related('items')[:batch_size]
+            )
+            if not orders:
+                break
+            prefetch_order_services([item for order in orders for item in order.items.all()])
+            for order in orders:
+                order.items_snapshot = snapshot_items(order.items.all())
+            Order.objects.bulk_update(orders, ['items_snapshot'])
+            done += len(orders)
+            self.stdout.write(f'snapshotted {done} orders')
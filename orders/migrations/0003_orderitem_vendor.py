@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-19 09:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_vendor(apps, schema_editor):
+    """Link existing items to the vendor account with the stored vendor email"""
+    db_alias = schema_editor.connection.alias
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    emails = set(OrderItem.objects.using(db_alias).exclude(vendor_email='').values_list('vendor_email', flat=True))
+    vendor_ids = dict(User.objects.using(db_alias).filter(email__in=emails).values_list('email', 'pk'))
+    for email, vendor_id in vendor_ids.items():
+        OrderItem.objects.using(db_alias).filter(vendor_email=email).update(vendor_id=vendor_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_emailoutbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='vendor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='vendor_order_items', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_vendor, migrations.RunPython.noop),
+    ]
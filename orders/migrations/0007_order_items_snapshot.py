@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-19 10:06
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_order_customer_recent_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='items_snapshot',
+            field=models.JSONField(blank=True, editable=False, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.3 on 2026-10-19 10:08
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_vendor_orders(apps, schema_editor):
+    """One inbox row per vendor of every existing order"""
+    db_alias = schema_editor.connection.alias
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    VendorOrder = apps.get_model('orders', 'VendorOrder')
+    VendorOrderNotification = apps.get_model('orders', 'VendorOrderNotification')
+
+    viewed = set(
+        VendorOrderNotification.objects.using(db_alias).filter(viewed=True).values_list('order_id', 'vendor_id')
+    )
+    pairs = list(
+        OrderItem.objects.using(db_alias).filter(vendor__isnull=False)
+        .order_by().values_list('order_id', 'vendor_id').distinct()
+    )
+    orders = Order.objects.using(db_alias).in_bulk({order_id for order_id, _ in pairs})
+    VendorOrder.objects.using(db_alias).bulk_create([
+        VendorOrder(
+            order_id=order_id, vendor_id=vendor_id, status=orders[order_id].order_status,
+            viewed=(order_id, vendor_id) in viewed, created_at=orders[order_id].created_at
+        )
+        for order_id, vendor_id in pairs
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_order_items_snapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendorOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('in_progress', 'In Progress'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], default='pending', max_length=20)),
+                ('viewed', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vendor_links', to='orders.order')),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vendor_orders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['vendor', '-created_at', '-id'], name='vendor_order_inbox_idx'), models.Index(fields=['vendor', 'status', '-created_at', '-id'], name='vendor_order_status_idx'), models.Index(condition=models.Q(('viewed', False)), fields=['vendor'], name='vendor_order_unread_idx')],
+                'constraints': [models.UniqueConstraint(fields=('vendor', 'order'), name='unique_vendor_order')],
+            },
+        ),
+        migrations.RunPython(backfill_vendor_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.db import migrations
+from django.db.models.functions import Lower
+
+
+def backfill_vendor_from_email(apps, schema_editor):
+    """
+    Link items that still have only a vendor_email (the vendor registered
+    after 0003, or the address differs in case) and give every linked vendor
+    the inbox rows 0008 skipped
+    """
+    db_alias = schema_editor.connection.alias
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    VendorOrder = apps.get_model('orders', 'VendorOrder')
+    VendorOrderNotification = apps.get_model('orders', 'VendorOrderNotification')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+
+    unlinked = OrderItem.objects.using(db_alias).filter(vendor__isnull=True).exclude(vendor_email='')
+    emails = {email.lower() for email in unlinked.values_list('vendor_email', flat=True).distinct()}
+    accounts = {}
+    users = User.objects.using(db_alias).annotate(email_lower=Lower('email')).filter(email_lower__in=emails)
+    for email, user_id in users.values_list('email_lower', 'pk'):
+        accounts.setdefault(email, []).append(user_id)
+    for email, user_ids in accounts.items():
+        # An address shared by several accounts is ambiguous; leave it unlinked
+        if len(user_ids) == 1:
+            unlinked.filter(vendor_email__iexact=email).update(vendor_id=user_ids[0])
+
+    pairs = set(
+        OrderItem.objects.using(db_alias).filter(vendor__isnull=False)
+        .order_by().values_list('order_id', 'vendor_id').distinct()
+    )
+    pairs -= set(VendorOrder.objects.using(db_alias).values_list('order_id', 'vendor_id'))
+    if not pairs:
+        return
+    viewed = set(
+        VendorOrderNotification.objects.using(db_alias).filter(viewed=True).values_list('order_id', 'vendor_id')
+    )
+    orders = Order.objects.using(db_alias).in_bulk({order_id for order_id, _ in pairs})
+    VendorOrder.objects.using(db_alias).bulk_create([
+        VendorOrder(
+            order_id=order_id, vendor_id=vendor_id, status=orders[order_id].order_status,
+            viewed=(order_id, vendor_id) in viewed, created_at=orders[order_id].created_at
+        )
+        for order_id, vendor_id in pairs
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_orderevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_vendor_from_email, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,9 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
-from services.models import (
-    Venue, PlanningAndDecor, Photography, Makeup, BridalWear, GroomWear,
-    Mehandi, WeddingCake, CarRental, DJ, JewelryRental, Catering
-)
+from django.utils import timezone
+from services.resolver import ServiceRef, resolve, resolve_many
 
 User = get_user_model()
 
@@ -46,8 +45,16 @@ class Order(models.Model):
     # Additional Information
     special_instructions = models.TextField(blank=True, null=True)
     
+    # Items as rendered when the order was placed (service details included);
+    # order reads are served from it instead of the live catalog
+    items_snapshot = models.JSONField(encoder=DjangoJSONEncoder, null=True, blank=True, editable=False)
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Customer order history, newest first (cursor pagination)
+            models.Index(fields=['customer', '-created_at', '-id'], name='order_customer_recent_idx'),
+        ]
     
     def __str__(self):
         return f"Order #{self.order_number} - {self.customer_name}"
@@ -58,21 +65,20 @@ class Order(models.Model):
         super().save(*args, **kwargs)
     
     def generate_order_number(self):
-        import random
-        import string
-        from django.utils import timezone
-        
-        timestamp = timezone.now().strftime('%Y%m%d')
-        random_str = ''.join(random.choices(string.digits, k=6))
-        return f"ORD{timestamp}{random_str}"
+        from .numbering import next_order_number
+        return next_order_number()
     
     def get_vendors(self):
         """Get all vendors associated with this order"""
-        vendors = set()
-        for item in self.items.all():
-            if hasattr(item.content_object, 'creator') and item.content_object.creator:
-                vendors.add(item.content_object.creator)
-        return list(vendors)
+        return list(User.objects.filter(vendor_order_items__order=self).distinct())
+
+class OrderNumberSequence(models.Model):
+    """Per-day order number counter; workers reserve blocks of it (see orders/numbering.py)"""
+    day = models.DateField(primary_key=True)
+    last_value = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.day}: {self.last_value}"
 
 class OrderItem(models.Model):
     SERVICE_TYPE_CHOICES = [
@@ -101,6 +107,9 @@ class OrderItem(models.Model):
     service_price = models.DecimalField(max_digits=10, decimal_places=2)
     vendor_name = models.CharField(max_length=255)
     vendor_email = models.EmailField()
+    vendor = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='vendor_order_items'
+    )
     
     # Quantity and Pricing
     quantity = models.PositiveIntegerField(default=1, validators=[MinValueValidator(1)])
@@ -120,35 +129,24 @@ class OrderItem(models.Model):
     
     @property
     def content_object(self):
-        """Get the actual service object"""
-        model_map = {
-            'venue': Venue,
-            'planning_decor': PlanningAndDecor,
-            'photography': Photography,
-            'makeup': Makeup,
-            'bridal_wear': BridalWear,
-            'groom_wear': GroomWear,
-            'mehandi': Mehandi,
-            'wedding_cake': WeddingCake,
-            'car_rental': CarRental,
-            'dj': DJ,
-            'jewelry_rental': JewelryRental,
-            'catering': Catering,
-        }
-        
-        model_class = model_map.get(self.service_type)
-        if model_class:
-            try:
-                return model_class.objects.get(pk=self.service_id)
-            except model_class.DoesNotExist:
-                return None
-        return None
+        """Get the actual service object (from prefetch_order_services when available)"""
+        if not hasattr(self, '_service_cache'):
+            self._service_cache = resolve(self.service_type, self.service_id)
+        return self._service_cache
     
     def save(self, *args, **kwargs):
         # Calculate total price before saving
         self.total_price = self.unit_price * self.quantity
         super().save(*args, **kwargs)
 
+def prefetch_order_services(items):
+    """Resolve the services behind order items with one query per service type"""
+    items = list(items)
+    services = resolve_many((item.service_type, item.service_id) for item in items)
+    for item in items:
+        item._service_cache = services.get(ServiceRef(item.service_type, item.service_id))
+    return items
+
 class VendorOrderNotification(models.Model):
     """Track which vendors have been notified about orders"""
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='notifications')
@@ -164,4 +162,146 @@ class VendorOrderNotification(models.Model):
         unique_together = ['order', 'vendor']
     
     def __str__(self):
-        return f"Notification for {self.vendor.email} - Order #{self.order.order_number}"
\ No newline at end of file
+        return f"Notification for {self.vendor.email} - Order #{self.order.order_number}"
+
+class VendorOrder(models.Model):
+    """
+    One row per (vendor, order), written at checkout: the vendor inbox
+    pages through it by (vendor, -created_at) instead of joining items.
+    status mirrors the order's status (kept in sync by orders/signals.py)
+    and viewed mirrors the vendor's notification.
+    """
+    vendor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='vendor_orders')
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='vendor_links')
+    status = models.CharField(max_length=20, choices=Order.ORDER_STATUS_CHOICES, default='pending')
+    viewed = models.BooleanField(default=False)
+    # Copied from the order so the inbox sorts without a join
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['vendor', 'order'], name='unique_vendor_order'),
+        ]
+        indexes = [
+            models.Index(fields=['vendor', '-created_at', '-id'], name='vendor_order_inbox_idx'),
+            models.Index(fields=['vendor', 'status', '-created_at', '-id'], name='vendor_order_status_idx'),
+            models.Index(fields=['vendor'], condition=models.Q(viewed=False), name='vendor_order_unread_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Order #{self.order.order_number} for {self.vendor.email}"
+
+class OrderEvent(models.Model):
+    """
+    Append-only log of order changes, one row per recipient (the customer and
+    each vendor), streamed by OrderEventStreamView. The id is the SSE event
+    id clients resume from.
+    """
+    KIND_CHOICES = [
+        ('created', 'Order created'),
+        ('status_changed', 'Status changed'),
+    ]
+    
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='events')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    order_status = models.CharField(max_length=20, choices=Order.ORDER_STATUS_CHOICES)
+    payment_status = models.CharField(max_length=20, choices=Order.PAYMENT_STATUS_CHOICES)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['recipient', 'id'], name='order_event_stream_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()}: Order #{self.order_id} for {self.recipient_id}"
+
+class VendorDailyStats(models.Model):
+    """
+    Per-vendor daily rollup of order items by service type and order status,
+    maintained incrementally (see orders/vendor_stats.py). Rows with an empty
+    service_type hold the vendor's totals for the day and status, so orders
+    are counted once however many service types they span.
+    """
+    vendor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    day = models.DateField()
+    service_type = models.CharField(max_length=50, blank=True)
+    status = models.CharField(max_length=20, choices=Order.ORDER_STATUS_CHOICES)
+    orders = models.IntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['vendor', 'day', 'service_type', 'status'],
+                name='unique_vendor_daily_stats'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.vendor_id} {self.day} {self.service_type or 'all'} {self.status}"
+
+class EmailOutbox(models.Model):
+    """
+    Order emails waiting to be sent. Rows are written in the same transaction
+    as the order and delivered by `manage.py send_outbox_emails`; a row whose
+    next_attempt_at has passed is due (claiming a row pushes it forward).
+    """
+    KIND_CHOICES = [
+        ('vendor_order', 'Vendor order notification'),
+        ('customer_order', 'Customer order confirmation'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='outbox_emails')
+    notification = models.ForeignKey(
+        VendorOrderNotification, on_delete=models.CASCADE, null=True, blank=True, related_name='outbox_emails'
+    )
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField()
+    last_error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} to {self.to_email} ({self.status})"
+
+class IdempotencyKey(models.Model):
+    """
+    Stored response for a request sent with an Idempotency-Key header (see
+    orders/idempotency.py). Rows are written in the same transaction as the
+    order they describe and expire after IDEMPOTENCY_KEY_TTL seconds.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(encoder=DjangoJSONEncoder, null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key'),
+        ]
+    
+    def __str__(self):
+        return f"{self.key} ({self.status_code or 'in progress'})"
@@ -0,0 +1,183 @@
+"""
+Order notification emails via a transactional outbox.
+
+queue_order_notifications() runs inside the order's transaction and only
+writes rows, so checkout never waits on SMTP. deliver_due() (driven by
+`manage.py send_outbox_emails`) sends due rows over one SMTP connection per
+batch, retries failures with exponential backoff and marks vendor
+notifications as sent in bulk.
+"""
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import EmailOutbox, VendorOrderNotification
+
+logger = logging.getLogger(__name__)
+
+
+def vendor_message(order, items):
+    subject = f'New Order Received - #{order.order_number}'
+
+    message = f"""
+            New Order Received!
+
+            Order Number: #{order.order_number}
+            Customer: {order.customer_name}
+            Email: {order.customer_email}
+            Phone: {order.customer_phone}
+            Event Date: {order.event_date}
+
+            Services Ordered:
+            """
+
+    for item in items:
+        message += f"\n- {item.service_name}: {item.quantity} x ₹{item.unit_price} = ₹{item.total_price}"
+
+    message += f"\n\nTotal Amount: ₹{order.total_amount}"
+
+    if order.special_instructions:
+        message += f"\n\nSpecial Instructions: {order.special_instructions}"
+
+    return subject, message
+
+
+def customer_message(order):
+    subject = f'Order Confirmation - #{order.order_number}'
+
+    message = f"""
+        Thank you for your order!
+
+        Order Number: #{order.order_number}
+        Order Date: {order.created_at.strftime('%Y-%m-%d %H:%M')}
+        Total Amount: ₹{order.total_amount}
+        Status: {order.get_order_status_display()}
+
+        Your vendors have been notified and will contact you shortly.
+
+        Thank you for choosing our service!
+        """
+
+    return subject, message
+
+
+def queue_order_notifications(order, items=None):
+    """
+    Record a VendorOrderNotification per vendor and queue the vendor and
+    customer emails, grouping items by vendor in memory (two bulk INSERTs).
+    Call inside the transaction that creates the order.
+    """
+    items = list(order.items.all()) if items is None else items
+
+    items_by_vendor = {}
+    for item in items:
+        if item.vendor_id and item.vendor_email:
+            items_by_vendor.setdefault(item.vendor_id, []).append(item)
+
+    notifications = VendorOrderNotification.objects.bulk_create([
+        VendorOrderNotification(order=order, vendor_id=vendor_id) for vendor_id in items_by_vendor
+    ])
+
+    now = timezone.now()
+    emails = []
+    for notification in notifications:
+        vendor_items = items_by_vendor[notification.vendor_id]
+        subject, body = vendor_message(order, vendor_items)
+        emails.append(EmailOutbox(
+            kind='vendor_order', order=order, notification=notification,
+            to_email=vendor_items[0].vendor_email, subject=subject, body=body, next_attempt_at=now
+        ))
+
+    subject, body = customer_message(order)
+    emails.append(EmailOutbox(
+        kind='customer_order', order=order, to_email=order.customer_email,
+        subject=subject, body=body, next_attempt_at=now
+    ))
+    return EmailOutbox.objects.bulk_create(emails)
+
+
+def retry_delay(attempts):
+    """Exponential backoff: base, 2x base, 4x base, ... capped at one day"""
+    base = getattr(settings, 'OUTBOX_RETRY_DELAY', 60)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), 24 * 3600))
+
+
+def claim_due(batch_size):
+    """
+    Lease up to batch_size due rows by pushing next_attempt_at past the send
+    timeout, so a second worker skips them and a crashed worker's rows come
+    back on their own.
+    """
+    now = timezone.now()
+    lease = timedelta(seconds=getattr(settings, 'OUTBOX_LEASE_SECONDS', 300))
+    with transaction.atomic():
+        ids = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        EmailOutbox.objects.filter(pk__in=ids).update(
+            next_attempt_at=now + lease, attempts=F('attempts') + 1
+        )
+    return list(EmailOutbox.objects.filter(pk__in=ids).order_by('id'))
+
+
+def deliver_due(batch_size=None, connection=None):
+    """Send one batch of due emails; returns (sent, failed)"""
+    batch_size = batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', 50)
+    rows = claim_due(batch_size)
+    if not rows:
+        return 0, 0
+
+    max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+    connection = connection or get_connection(fail_silently=False)
+    sent, failed = [], []
+    try:
+        connection.open()
+        for row in rows:
+            message = EmailMessage(
+                row.subject, row.body, settings.DEFAULT_FROM_EMAIL, [row.to_email], connection=connection
+            )
+            try:
+                message.send()
+                sent.append(row)
+            except Exception as e:
+                row.last_error = str(e)
+                failed.append(row)
+                logger.error(f"Failed to send {row.kind} email to {row.to_email}: {str(e)}")
+    except Exception as e:
+        # Could not even connect: the whole batch is retried later
+        for row in rows:
+            if row not in sent and row not in failed:
+                row.last_error = str(e)
+                failed.append(row)
+        logger.error(f"Outbox delivery failed: {str(e)}")
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    now = timezone.now()
+    with transaction.atomic():
+        if sent:
+            EmailOutbox.objects.filter(pk__in=[row.pk for row in sent]).update(
+                status='sent', sent_at=now, last_error=''
+            )
+            VendorOrderNotification.objects.filter(
+                pk__in=[row.notification_id for row in sent if row.notification_id]
+            ).update(email_sent=True, email_sent_at=now)
+
+        for row in failed:
+            if row.attempts >= max_attempts:
+                row.status = 'failed'
+            row.next_attempt_at = now + retry_delay(row.attempts)
+        EmailOutbox.objects.bulk_update(failed, ['status', 'next_attempt_at', 'last_error'])
+
+    return len(sent), len(failed)
@@ -0,0 +1,81 @@
+"""
+Order number allocation.
+
+Order numbers look like ORD20261019-000042: the day plus a per-day sequence.
+Each worker thread reserves a block of ORDER_NUMBER_BLOCK_SIZE numbers with
+one INSERT ... ON CONFLICT DO UPDATE ... RETURNING on OrderNumberSequence and
+hands them out from memory, so most orders cost no query at all and numbers
+can never collide (no retry loop, no SELECT). Numbers are increasing per
+worker and roughly increasing across workers; the unused tail of a block is
+skipped when a worker stops or the day changes.
+
+The reservation runs in the caller's transaction. If that transaction rolls
+back, so does the counter, so the block is dropped and the next order
+reserves a fresh one rather than reusing numbers another worker may now own.
+"""
+import threading
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import OrderNumberSequence
+
+_local = threading.local()
+
+
+class Block:
+    __slots__ = ('day', 'next', 'end', 'pending')
+
+    def __init__(self, day, first, end):
+        self.day = day
+        self.next = first
+        self.end = end
+        # on_commit callback confirming the reservation, None once committed
+        self.pending = None
+
+
+def format_order_number(day, value):
+    return f"ORD{day:%Y%m%d}-{value:06d}"
+
+
+def reserve_block(day, size):
+    """Claim the next size numbers of day's sequence; returns a Block"""
+    qn = connection.ops.quote_name
+    table = qn(OrderNumberSequence._meta.db_table)
+    day_column = qn(OrderNumberSequence._meta.get_field('day').column)
+    value_column = qn(OrderNumberSequence._meta.get_field('last_value').column)
+    sql = (
+        f"INSERT INTO {table} ({day_column}, {value_column}) VALUES (%s, %s) "
+        f"ON CONFLICT ({day_column}) DO UPDATE SET {value_column} = {table}.{value_column} + excluded.{value_column} "
+        f"RETURNING {value_column}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [connection.ops.adapt_datefield_value(day), size])
+        last = cursor.fetchone()[0]
+
+    block = Block(day, last - size + 1, last + 1)
+    if connection.in_atomic_block:
+        def confirm():
+            block.pending = None
+        block.pending = confirm
+        transaction.on_commit(confirm)
+    return block
+
+
+def usable(block, day):
+    if block is None or block.day != day or block.next >= block.end:
+        return False
+    if block.pending is None:
+        return True
+    # Still uncommitted: only usable while its transaction (or savepoint) is alive
+    return any(entry[1] is block.pending for entry in connection.run_on_commit)
+
+
+def next_order_number():
+    """Return a new, unique order number"""
+    day = timezone.now().date()
+    block = getattr(_local, 'block', None)
+    if not usable(block, day):
+        block = _local.block = reserve_block(day, getattr(settings, 'ORDER_NUMBER_BLOCK_SIZE', 20))
+    value = block.next
+    block.next += 1
+    return format_order_number(day, value)
@@ -1,11 +1,15 @@
+import json
+from django.core.serializers.json import DjangoJSONEncoder
 from rest_framework import serializers
-from .models import Order, OrderItem, VendorOrderNotification
-from services.serializers import (
-    VenueSerializer, PlanningAndDecorSerializer, PhotographySerializer, 
-    MakeupSerializer, BridalWearSerializer, GroomWearSerializer,
-    MehandiSerializer, WeddingCakeSerializer, CarRentalSerializer,
-    DJSerializer, JewelryRentalSerializer, CateringSerializer
-)
+from .models import Order, OrderItem, VendorOrderNotification, prefetch_order_services
+from services.serializers import SERVICE_SERIALIZERS
+
+def service_details(item):
+    serializer_class = SERVICE_SERIALIZERS.get(item.service_type)
+    service_obj = item.content_object if serializer_class else None
+    if service_obj:
+        return serializer_class(service_obj).data
+    return None
 
 class OrderItemSerializer(serializers.ModelSerializer):
     service_details = serializers.SerializerMethodField()
@@ -22,28 +26,10 @@ class OrderItemSerializer(serializers.ModelSerializer):
     
     def get_service_details(self, obj):
         """Get detailed service information"""
-        model_serializer_map = {
-            'venue': VenueSerializer,
-            'planning_decor': PlanningAndDecorSerializer,
-            'photography': PhotographySerializer,
-            'makeup': MakeupSerializer,
-            'bridal_wear': BridalWearSerializer,
-            'groom_wear': GroomWearSerializer,
-            'mehandi': MehandiSerializer,
-            'wedding_cake': WeddingCakeSerializer,
-            'car_rental': CarRentalSerializer,
-            'dj': DJSerializer,
-            'jewelry_rental': JewelryRentalSerializer,
-            'catering': CateringSerializer,
-        }
-        
-        serializer_class = model_serializer_map.get(obj.service_type)
-        if serializer_class and obj.content_object:
-            return serializer_class(obj.content_object).data
-        return None
+        return service_details(obj)
 
 class OrderSerializer(serializers.ModelSerializer):
-    items = OrderItemSerializer(many=True, read_only=True)
+    items = serializers.SerializerMethodField()
     customer_details = serializers.SerializerMethodField()
     
     class Meta:
@@ -56,10 +42,84 @@ class OrderSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['order_number', 'created_at', 'updated_at']
     
+    def get_items(self, obj):
+        if obj.items_snapshot is not None:
+            return obj.items_snapshot
+        # Orders placed before snapshots: resolve services with one query per type
+        return OrderItemSerializer(prefetch_order_services(obj.items.all()), many=True).data
+    
     def get_customer_details(self, obj):
         from accounts.serializers import UserSerializer
         return UserSerializer(obj.customer).data
 
+class ExpandableSerializerMixin:
+    """Drops the fields in expandable_fields unless requested via context['expand']"""
+    expandable_fields = {}
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        # Resolved lazily so nested serializers see the root's context
+        expand = self.context.get('expand', ())
+        for name, field in self.expandable_fields.items():
+            if name not in expand:
+                fields.pop(field, None)
+        return fields
+
+class OrderItemSummarySerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
+    """Order item from the fields snapshotted on it; service details only with ?expand=service"""
+    service_details = serializers.SerializerMethodField()
+    expandable_fields = {'service': 'service_details'}
+    
+    class Meta:
+        model = OrderItem
+        fields = [
+            'id', 'service_type', 'service_id', 'service_name', 'vendor_name',
+            'quantity', 'unit_price', 'total_price', 'service_date', 'service_time',
+            'service_details'
+        ]
+        read_only_fields = fields
+    
+    def get_service_details(self, obj):
+        return service_details(obj)
+
+class OrderSummarySerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
+    """
+    Slim order for listings: header fields and item snapshots, no per-row
+    queries. ?expand=service,customer adds service and customer details,
+    which the view loads in batches for the whole page.
+    """
+    items = serializers.SerializerMethodField()
+    customer_details = serializers.SerializerMethodField()
+    expandable_fields = {'customer': 'customer_details'}
+    
+    class Meta:
+        model = Order
+        fields = [
+            'id', 'order_number', 'customer', 'customer_details', 'customer_name',
+            'total_amount', 'order_status', 'payment_status', 'event_date',
+            'items', 'created_at'
+        ]
+        read_only_fields = fields
+    
+    def get_items(self, obj):
+        if obj.items_snapshot is None:
+            return OrderItemSummarySerializer(obj.items.all(), many=True, context=self.context).data
+        fields = OrderItemSummarySerializer.Meta.fields
+        if 'service' not in self.context.get('expand', ()):
+            fields = [name for name in fields if name != 'service_details']
+        return [{name: item.get(name) for name in fields} for item in obj.items_snapshot]
+    
+    def get_customer_details(self, obj):
+        from accounts.serializers import UserSerializer
+        return UserSerializer(obj.customer).data
+
+def snapshot_items(items):
+    """
+    Render order items (with their services already resolved) for
+    Order.items_snapshot
+    """
+    return json.loads(json.dumps(OrderItemSerializer(items, many=True).data, cls=DjangoJSONEncoder))
+
 class CreateOrderItemSerializer(serializers.Serializer):
     service_type = serializers.ChoiceField(choices=OrderItem.SERVICE_TYPE_CHOICES)
     service_id = serializers.IntegerField(min_value=1)
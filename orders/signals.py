@@ -0,0 +1,14 @@
+from django.db.models.signals import post_save
+from .models import Order, VendorOrder
+
+
+def sync_vendor_order_status(sender, instance, created, **kwargs):
+    """Mirror a changed order status onto the vendor inbox rows (one UPDATE)"""
+    if created:
+        return
+    VendorOrder.objects.filter(order=instance).exclude(status=instance.order_status).update(
+        status=instance.order_status
+    )
+
+
+post_save.connect(sync_vendor_order_status, sender=Order, dispatch_uid='sync_vendor_order_status')
@@ -1,3 +1,686 @@
-from django.test import TestCase
+import smtplib
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from knox.models import AuthToken
+from rest_framework.test import APIClient
+from accounts.models import CustomUser
+from services.availability import release_order
+from services.models import Makeup, Photography, ServiceAvailability
+from services.resolver import get_snapshot
+from wedding_backend import mail as mail_pool
+from . import vendor_stats
+from .events import record_event
+from .models import (
+    EmailOutbox, IdempotencyKey, Order, OrderEvent, OrderNumberSequence, VendorDailyStats, VendorOrderNotification
+)
+from .notifications import deliver_due, queue_order_notifications
 
-# Create your tests here.
+
+class OrderTestMixin:
+    """Users, a service and an API client for order tests"""
+
+    def setUp(self):
+        super().setUp()
+        self.vendor = CustomUser.objects.create_user(
+            username='vendor', email='vendor@example.com', password='pass', is_active=True
+        )
+        self.customer = CustomUser.objects.create_user(
+            username='customer', email='customer@example.com', password='pass', is_active=True
+        )
+        self.photography = Photography.objects.create(
+            creator=self.vendor, name='Studio', location='Goa', category='candid', price=100
+        )
+        self.client_api = APIClient()
+        self.client_api.force_authenticate(self.customer)
+
+    def create_order(self, items=None, client=None):
+        items = items or [{'service_type': 'photography', 'service_id': self.photography.pk}]
+        response = (client or self.client_api).post('/orders/orders/create/', {'items': items}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return Order.objects.get(pk=response.data['id'])
+
+    def run_threads(self, target, args_list):
+        """Run target(*args) for each args in parallel threads; returns the results"""
+        results = [None] * len(args_list)
+
+        def run(index, args):
+            try:
+                results[index] = target(*args)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=run, args=(i, args)) for i, args in enumerate(args_list)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def assertRollupsMatchRebuild(self):
+        fields = ('vendor_id', 'day', 'service_type', 'status', 'orders', 'quantity', 'revenue')
+        incremental = sorted(VendorDailyStats.objects.exclude(orders=0).values_list(*fields))
+        vendor_stats.rebuild()
+        self.assertEqual(incremental, sorted(VendorDailyStats.objects.values_list(*fields)))
+
+
+class OrderPricingTests(OrderTestMixin, TestCase):
+
+    def test_prices_come_from_the_database_not_the_snapshot_cache(self):
+        self.assertEqual(get_snapshot('photography', self.photography.pk)['unit_price'], 100)
+        # A price change saved by another worker: this process's cache is not invalidated
+        Photography.objects.filter(pk=self.photography.pk).update(price=150)
+        self.assertEqual(get_snapshot('photography', self.photography.pk)['unit_price'], 100)
+
+        order = self.create_order()
+        item = order.items.get()
+        self.assertEqual(item.unit_price, 150)
+        self.assertEqual(order.total_amount, 150)
+
+
+class OrderAvailabilityTests(OrderTestMixin, TestCase):
+
+    def item(self, day, service=None):
+        return {'service_type': 'photography', 'service_id': (service or self.photography).pk, 'service_date': day}
+
+    def test_booked_date_conflicts(self):
+        self.create_order([self.item('2030-05-01')])
+        other = Photography.objects.create(
+            creator=self.vendor, name='Other', location='Goa', category='candid', price=100
+        )
+
+        response = self.client_api.post('/orders/orders/create/', {
+            'items': [self.item('2030-05-01', other), self.item('2030-05-01')]
+        }, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['conflicts'], [
+            {'service_type': 'photography', 'service_id': self.photography.pk, 'service_date': '2030-05-01'}
+        ])
+        # Nothing from the rejected order is kept, including the free day
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertFalse(ServiceAvailability.objects.filter(object_id=other.pk).exists())
+
+        self.create_order([self.item('2030-05-01', other), self.item('2030-05-02')])
+
+
+class IdempotencyTests(OrderTestMixin, TestCase):
+
+    def post(self, url, data, key, client=None):
+        return (client or self.client_api).post(url, data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def order_data(self, quantity=1):
+        return {'items': [{'service_type': 'photography', 'service_id': self.photography.pk, 'quantity': quantity}]}
+
+    def test_retry_replays_the_first_order(self):
+        first = self.post('/orders/orders/create/', self.order_data(), 'key-1')
+        self.assertEqual(first.status_code, 201)
+        outbox = EmailOutbox.objects.count()
+
+        retry = self.post('/orders/orders/create/', self.order_data(), 'key-1')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.data['id'], first.data['id'])
+        self.assertEqual(retry.data['order_number'], first.data['order_number'])
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(EmailOutbox.objects.count(), outbox)
+
+        # Keys are per user
+        other = CustomUser.objects.create_user(username='other', email='other@example.com', password='pass')
+        client = APIClient()
+        client.force_authenticate(other)
+        self.assertEqual(self.post('/orders/orders/create/', self.order_data(), 'key-1', client).status_code, 201)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_key_reused_for_another_body_is_rejected(self):
+        self.post('/orders/orders/create/', self.order_data(), 'key-1')
+        response = self.post('/orders/orders/create/', self.order_data(quantity=2), 'key-1')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_failed_request_releases_the_key(self):
+        data = {'items': [
+            {'service_type': 'photography', 'service_id': self.photography.pk, 'service_date': '2030-05-01'}
+        ]}
+        booked = self.create_order(data['items'])
+        self.assertEqual(self.post('/orders/orders/create/', data, 'key-1').status_code, 409)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        # Once the date is free again the retry runs instead of replaying the 409
+        release_order(booked)
+        self.assertEqual(self.post('/orders/orders/create/', data, 'key-1').status_code, 201)
+
+    def test_checkout_retry_does_not_find_the_cart_empty(self):
+        response = self.client_api.post('/services/cart/', {
+            'content_type': 'photography', 'object_id': self.photography.pk
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        first = self.post('/services/cart/checkout/', {}, 'checkout-1')
+        self.assertEqual(first.status_code, 201)
+        retry = self.post('/services/cart/checkout/', {}, 'checkout-1')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.data['id'], first.data['id'])
+        self.assertEqual(Order.objects.count(), 1)
+
+class OrderCancellationTests(OrderTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.items = [{
+            'service_type': 'photography', 'service_id': self.photography.pk, 'service_date': '2030-05-01'
+        }]
+
+    def patch_status(self, order, **fields):
+        return self.client_api.patch(f'/orders/orders/{order.pk}/status/', fields, format='json')
+
+    def bulk_patch(self, *updates):
+        return self.client_api.patch('/orders/orders/status/', {'updates': list(updates)}, format='json')
+
+    def test_cancelled_order_cannot_be_reopened(self):
+        order = self.create_order(self.items)
+        self.assertEqual(self.patch_status(order, order_status='cancelled').status_code, 200)
+        # Its date went back and is booked by another order
+        self.create_order(self.items)
+
+        response = self.patch_status(order, order_status='confirmed')
+        self.assertEqual(response.status_code, 409)
+        order.refresh_from_db()
+        self.assertEqual(order.order_status, 'cancelled')
+
+        # Payment changes (e.g. refunds) are still allowed
+        self.assertEqual(self.patch_status(order, payment_status='refunded').status_code, 200)
+
+    def test_bulk_update_cannot_reopen_cancelled_orders(self):
+        cancelled, active = self.create_order(self.items), self.create_order()
+        self.assertEqual(self.bulk_patch({'order_id': cancelled.pk, 'order_status': 'cancelled'}).status_code, 200)
+
+        response = self.bulk_patch(
+            {'order_id': cancelled.pk, 'order_status': 'pending'},
+            {'order_id': active.pk, 'order_status': 'confirmed'},
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['cancelled'], [cancelled.pk])
+        # All-or-nothing: the other order is unchanged too
+        active.refresh_from_db()
+        self.assertEqual(active.order_status, 'pending')
+
+class VendorRollupTests(OrderTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.makeup = Makeup.objects.create(
+            creator=self.vendor, name='Glow', location='Goa', category='bridal', price=50
+        )
+        self.other_vendor = CustomUser.objects.create_user(
+            username='other', email='other@example.com', password='pass', is_active=True
+        )
+        self.other_photography = Photography.objects.create(
+            creator=self.other_vendor, name='Other', location='Goa', category='candid', price=300
+        )
+
+    def place_orders(self):
+        """Orders for both vendors, moved through single, bulk and repeated status changes"""
+        first = self.create_order([
+            {'service_type': 'photography', 'service_id': self.photography.pk, 'quantity': 2},
+            {'service_type': 'makeup', 'service_id': self.makeup.pk},
+        ])
+        second = self.create_order([{'service_type': 'photography', 'service_id': self.other_photography.pk}])
+        third = self.create_order([
+            {'service_type': 'photography', 'service_id': self.photography.pk},
+            {'service_type': 'photography', 'service_id': self.other_photography.pk},
+        ])
+        self.client_api.patch(f'/orders/orders/{first.pk}/status/', {'order_status': 'confirmed'}, format='json')
+        response = self.client_api.patch('/orders/orders/status/', {'updates': [
+            {'order_id': second.pk, 'order_status': 'completed'},
+            {'order_id': third.pk, 'order_status': 'cancelled'},
+            {'order_id': first.pk, 'payment_status': 'paid'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.client_api.patch(f'/orders/orders/{first.pk}/status/', {'order_status': 'completed'}, format='json')
+
+    def test_incremental_rollups_match_rebuild(self):
+        self.place_orders()
+        self.assertTrue(VendorDailyStats.objects.exists())
+        self.assertRollupsMatchRebuild()
+
+    def test_stats_leave_out_cancelled_orders(self):
+        self.place_orders()
+        client = APIClient()
+        client.force_authenticate(self.vendor)
+        data = client.get('/orders/vendor/stats/').data
+
+        self.assertEqual(data['total_orders'], 1)
+        self.assertEqual(data['total_revenue'], '250.00')
+        self.assertEqual(data['by_status'], [
+            {'status': 'cancelled', 'orders': 1, 'revenue': '100.00'},
+            {'status': 'completed', 'orders': 1, 'revenue': '250.00'},
+        ])
+        self.assertEqual(data['top_services'], [
+            {'service_type': 'photography', 'orders': 1, 'quantity': 2, 'revenue': '200.00'},
+            {'service_type': 'makeup', 'orders': 1, 'quantity': 1, 'revenue': '50.00'},
+        ])
+
+class BulkStatusPermissionTests(OrderTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.other_vendor = CustomUser.objects.create_user(
+            username='other', email='other@example.com', password='pass', is_active=True
+        )
+        other_photography = Photography.objects.create(
+            creator=self.other_vendor, name='Other', location='Goa', category='candid', price=300
+        )
+        self.order = self.create_order()
+        self.other_order = self.create_order([{'service_type': 'photography', 'service_id': other_photography.pk}])
+
+    def bulk_patch(self, user, *updates):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.patch('/orders/orders/status/', {'updates': list(updates)}, format='json')
+
+    def statuses(self):
+        return dict(Order.objects.values_list('pk', 'order_status'))
+
+    def test_customer_updates_own_orders(self):
+        response = self.bulk_patch(
+            self.customer,
+            {'order_id': self.order.pk, 'order_status': 'confirmed'},
+            {'order_id': self.other_order.pk, 'order_status': 'pending'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['changed'] for r in response.data['results']], [True, False])
+        self.assertEqual(self.statuses(), {self.order.pk: 'confirmed', self.other_order.pk: 'pending'})
+
+    def test_vendor_is_limited_to_their_orders(self):
+        response = self.bulk_patch(self.vendor, {'order_id': self.order.pk, 'order_status': 'confirmed'})
+        self.assertEqual(response.status_code, 200)
+
+        # One foreign order rejects the whole batch
+        response = self.bulk_patch(
+            self.vendor,
+            {'order_id': self.order.pk, 'order_status': 'completed'},
+            {'order_id': self.other_order.pk, 'order_status': 'completed'},
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.data['forbidden'], [self.other_order.pk])
+        self.assertEqual(self.statuses(), {self.order.pk: 'confirmed', self.other_order.pk: 'pending'})
+
+    def test_staff_updates_any_order(self):
+        staff = CustomUser.objects.create_user(
+            username='staff', email='staff@example.com', password='pass', is_staff=True
+        )
+        response = self.bulk_patch(
+            staff,
+            {'order_id': self.order.pk, 'order_status': 'completed'},
+            {'order_id': self.other_order.pk, 'order_status': 'completed'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(self.statuses().values()), {'completed'})
+
+    def test_missing_and_invalid_updates(self):
+        response = self.bulk_patch(self.customer, {'order_id': 999, 'order_status': 'confirmed'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data['missing'], [999])
+
+        response = self.bulk_patch(
+            self.customer,
+            {'order_id': self.order.pk, 'order_status': 'confirmed'},
+            {'order_id': self.order.pk, 'payment_status': 'paid'},
+            {'order_id': self.other_order.pk, 'order_status': 'shipped'},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([e['index'] for e in response.data['errors']], [1, 2])
+        self.assertEqual(set(self.statuses().values()), {'pending'})
+
+
+@override_settings(ORDER_NUMBER_BLOCK_SIZE=1000)
+class CheckoutQueryCountTests(OrderTestMixin, TestCase):
+
+    def fill_cart(self, count):
+        """count cart lines, one service and vendor each"""
+        self.vendors = []
+        for i in range(count):
+            vendor = CustomUser.objects.create_user(
+                username=f'vendor{count}_{i}', email=f'vendor{count}_{i}@example.com', password='pass'
+            )
+            service = Photography.objects.create(
+                creator=vendor, name=f'Studio {i}', location='Goa', category='candid', price=100
+            )
+            response = self.client_api.post('/services/cart/', {
+                'content_type': 'photography', 'object_id': service.pk, 'quantity': 1
+            }, format='json')
+            self.assertEqual(response.status_code, 201, response.data)
+            self.vendors.append(vendor)
+
+    def test_checkout_and_inbox_queries_do_not_grow_with_the_order(self):
+        # Reserve an order number block first so no checkout below reserves one
+        self.create_order()
+        for count in (2, 10):
+            self.fill_cart(count)
+            # Cart, items, services, then one statement per table written
+            with self.assertNumQueries(14):
+                response = self.client_api.post('/services/cart/checkout/', {}, format='json')
+            self.assertEqual(response.status_code, 201, response.data)
+            self.assertEqual(Order.objects.get(pk=response.data['id']).items.count(), count)
+
+            vendor_client = APIClient()
+            vendor_client.force_authenticate(self.vendors[-1])
+            with self.assertNumQueries(2):
+                response = vendor_client.get('/orders/vendor/orders/')
+            self.assertEqual(len(response.data['results']), 1)
+
+
+class OutboxTests(OrderTestMixin, TestCase):
+
+    def test_emails_are_queued_with_the_order_and_only_sent_by_the_worker(self):
+        order = self.create_order()
+        self.assertEqual(
+            sorted(order.outbox_emails.values_list('kind', 'to_email', 'status')),
+            [('customer_order', 'customer@example.com', 'pending'), ('vendor_order', 'vendor@example.com', 'pending')]
+        )
+        self.assertEqual(mail.outbox, [])
+
+        call_command('send_outbox_emails', stdout=StringIO())
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox), ['customer@example.com', 'vendor@example.com']
+        )
+        self.assertFalse(order.outbox_emails.exclude(status='sent').exists())
+        notification = VendorOrderNotification.objects.get(order=order)
+        self.assertTrue(notification.email_sent)
+        self.assertIsNotNone(notification.email_sent_at)
+        self.assertEqual(deliver_due(), (0, 0))
+
+    def test_nothing_is_queued_when_the_order_rolls_back(self):
+        def queue_then_fail(*args, **kwargs):
+            queue_order_notifications(*args, **kwargs)
+            raise RuntimeError('checkout failed after queueing')
+
+        with mock.patch('orders.checkout.queue_order_notifications', side_effect=queue_then_fail):
+            response = self.client_api.post('/orders/orders/create/', {
+                'items': [{'service_type': 'photography', 'service_id': self.photography.pk}]
+            }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(EmailOutbox.objects.exists())
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2, OUTBOX_RETRY_DELAY=60)
+    def test_failed_sends_back_off_then_give_up(self):
+        order = self.create_order()
+
+        def make_due():
+            EmailOutbox.objects.update(next_attempt_at=timezone.now())
+
+        with mock.patch.object(locmem.EmailBackend, 'send_messages', side_effect=smtplib.SMTPException('server down')):
+            before = timezone.now()
+            self.assertEqual(deliver_due(), (0, 2))
+            for row in order.outbox_emails.all():
+                self.assertEqual((row.status, row.attempts, row.last_error), ('pending', 1, 'server down'))
+                self.assertGreaterEqual(row.next_attempt_at, before + timedelta(seconds=60))
+            # Not due again until the backoff has passed
+            self.assertEqual(deliver_due(), (0, 0))
+
+            make_due()
+            before = timezone.now()
+            self.assertEqual(deliver_due(), (0, 2))
+            for row in order.outbox_emails.all():
+                self.assertEqual((row.status, row.attempts), ('failed', 2))
+                self.assertGreaterEqual(row.next_attempt_at, before + timedelta(seconds=120))
+
+        make_due()
+        self.assertEqual(deliver_due(), (0, 0))
+        self.assertEqual(mail.outbox, [])
+        self.assertFalse(VendorOrderNotification.objects.get(order=order).email_sent)
+
+    def test_a_retry_after_a_failure_delivers(self):
+        order = self.create_order()
+        with mock.patch.object(locmem.EmailBackend, 'send_messages', side_effect=smtplib.SMTPException('server down')):
+            self.assertEqual(deliver_due(), (0, 2))
+        EmailOutbox.objects.update(next_attempt_at=timezone.now())
+
+        self.assertEqual(deliver_due(), (2, 0))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(
+            list(order.outbox_emails.values_list('status', 'attempts', 'last_error').distinct()), [('sent', 2, '')]
+        )
+
+
+@override_settings(EMAIL_POOL_HEALTHCHECK_AFTER=30, EMAIL_POOL_MAX_IDLE=240)
+class PooledSMTPBackendTests(SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        mail_pool.close_pool()
+        self.addCleanup(mail_pool.close_pool)
+        self.connections = []
+        self.send_error = None
+        patcher = mock.patch('smtplib.SMTP', side_effect=self.connect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def connect(self, *args, **kwargs):
+        connection = mock.MagicMock()
+        connection.noop.return_value = (250, b'OK')
+        connection.sendmail.return_value = {}
+        connection.sendmail.side_effect = self.send_error
+        self.connections.append(connection)
+        return connection
+
+    def send(self, count=1, **backend_options):
+        backend = mail_pool.PooledSMTPBackend(**backend_options)
+        messages = [
+            mail.EmailMessage('Subject', 'Body', 'noreply@example.com', [f'to{i}@example.com']) for i in range(count)
+        ]
+        return backend.send_messages(messages)
+
+    def age_pool(self, seconds):
+        for entry in mail_pool._local.pool.values():
+            entry.last_used -= seconds
+
+    def test_connection_is_reused_across_calls(self):
+        self.assertEqual(self.send(2), 2)
+        self.assertEqual(self.send(), 1)
+        self.assertEqual(len(self.connections), 1)
+        self.assertEqual(self.connections[0].sendmail.call_count, 3)
+        self.connections[0].quit.assert_not_called()
+
+    def test_reconnects_once_after_the_server_disconnects(self):
+        self.send()
+        self.connections[0].sendmail.side_effect = smtplib.SMTPServerDisconnected('gone')
+        self.assertEqual(self.send(2), 2)
+        self.assertEqual(len(self.connections), 2)
+        self.assertEqual(self.connections[1].sendmail.call_count, 2)
+
+        # Only one reconnect: a disconnect on the fresh connection is raised
+        self.send_error = smtplib.SMTPServerDisconnected('still gone')
+        self.connections[1].sendmail.side_effect = self.send_error
+        with self.assertRaises(smtplib.SMTPServerDisconnected):
+            self.send()
+        self.assertEqual(len(self.connections), 3)
+
+    def test_idle_connections_are_checked_then_replaced(self):
+        self.send()
+        # Idle past the health check: NOOP answers, so the connection is kept
+        self.age_pool(60)
+        self.send()
+        self.connections[0].noop.assert_called_once()
+        self.assertEqual(len(self.connections), 1)
+
+        # NOOP fails: replaced
+        self.age_pool(60)
+        self.connections[0].noop.return_value = (421, b'closing')
+        self.send()
+        self.assertEqual(len(self.connections), 2)
+        self.connections[0].quit.assert_called_once()
+
+        # Idle past EMAIL_POOL_MAX_IDLE: replaced without asking the server
+        self.age_pool(300)
+        self.send()
+        self.assertEqual(len(self.connections), 3)
+        self.connections[1].noop.assert_not_called()
+        self.connections[1].quit.assert_called_once()
+
+    def test_close_pool_quits_every_connection(self):
+        self.send()
+        self.send(host='smtp.other.example.com')
+        self.assertEqual(len(self.connections), 2)
+
+        mail_pool.close_pool()
+        for connection in self.connections:
+            connection.quit.assert_called_once()
+        self.send()
+        self.assertEqual(len(self.connections), 3)
+
+
+@override_settings(ORDER_EVENTS_POLL_INTERVAL=0.01, ORDER_EVENTS_HEARTBEAT=60, ORDER_EVENTS_MAX_STREAM=1)
+class OrderEventStreamTests(OrderTestMixin, TestCase):
+
+    def open_stream(self, user, last_event_id=None):
+        _, token = AuthToken.objects.create(user)
+        headers = {'HTTP_AUTHORIZATION': f'Token {token}'}
+        if last_event_id is not None:
+            headers['HTTP_LAST_EVENT_ID'] = str(last_event_id)
+        response = self.client.get('/orders/events/', **headers)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return response
+
+    def test_requires_token(self):
+        self.assertEqual(self.client.get('/orders/events/').status_code, 401)
+
+    def test_frames_arrive_while_stream_is_open(self):
+        order = self.create_order()
+        response = self.open_stream(self.vendor)
+        frames = iter(response.streaming_content)
+        started = time.monotonic()
+
+        self.assertTrue(next(frames).startswith(b'retry: 10'))
+        # An event recorded after the stream opened is sent on the next poll,
+        # well before ORDER_EVENTS_MAX_STREAM ends the response
+        order.order_status = 'confirmed'
+        record_event(order, 'status_changed')
+        frame = next(frames).decode()
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertIn('event: order\n', frame)
+        self.assertIn('"kind": "status_changed"', frame)
+        self.assertIn('"order_status": "confirmed"', frame)
+        # Runs the stream to its end (closing the response early would also
+        # close the test's database connection)
+        self.assertNotIn(b'id: ', b''.join(frames))
+
+    def test_resumes_after_last_event_id(self):
+        order = self.create_order()
+        record_event(order, 'status_changed')
+        first, second = OrderEvent.objects.filter(recipient=self.vendor).order_by('id')
+
+        body = b''.join(self.open_stream(self.vendor, last_event_id=first.id).streaming_content).decode()
+        self.assertNotIn(f'id: {first.id}\n', body)
+        self.assertIn(f'id: {second.id}\n', body)
+
+        body = b''.join(self.open_stream(self.vendor, last_event_id=0).streaming_content).decode()
+        self.assertLess(body.index(f'id: {first.id}\n'), body.index(f'id: {second.id}\n'))
+
+        # Without Last-Event-ID only events after the connection are sent
+        body = b''.join(self.open_stream(self.vendor).streaming_content).decode()
+        self.assertNotIn('id: ', body)
+
+    def test_rejects_bad_last_event_id(self):
+        _, token = AuthToken.objects.create(self.vendor)
+        response = self.client.get('/orders/events/', HTTP_AUTHORIZATION=f'Token {token}', HTTP_LAST_EVENT_ID='x')
+        self.assertEqual(response.status_code, 400)
+
+    def test_only_real_status_changes_are_recorded(self):
+        order = self.create_order()
+
+        def status_events():
+            return OrderEvent.objects.filter(order=order, kind='status_changed').count()
+
+        def patch_status(**fields):
+            response = self.client_api.patch(f'/orders/orders/{order.pk}/status/', fields, format='json')
+            self.assertEqual(response.status_code, 200)
+
+        patch_status(order_status='pending', payment_status='pending')
+        self.assertEqual(status_events(), 0)
+        patch_status(order_status='confirmed')
+        recorded = status_events()
+        self.assertGreater(recorded, 0)
+        patch_status(order_status='confirmed')
+        self.assertEqual(status_events(), recorded)
+        patch_status(payment_status='paid')
+        self.assertEqual(status_events(), 2 * recorded)
+
+
+class OrderStatusConcurrencyTests(OrderTestMixin, TransactionTestCase):
+
+    def test_parallel_status_changes_keep_rollups_consistent(self):
+        order = self.create_order()
+        statuses = ['confirmed', 'in_progress', 'completed', 'confirmed', 'in_progress', 'completed'] * 2
+
+        def patch(new_status):
+            client = APIClient()
+            client.force_authenticate(self.vendor)
+            return client.patch(
+                f'/orders/orders/{order.pk}/status/', {'order_status': new_status}, format='json'
+            ).status_code
+
+        self.assertEqual(self.run_threads(patch, [(s,) for s in statuses]), [200] * len(statuses))
+        order.refresh_from_db()
+        # Exactly one order counted, under its final status
+        rows = VendorDailyStats.objects.filter(vendor=self.vendor, service_type='').exclude(orders=0)
+        self.assertEqual(list(rows.values_list('status', 'orders')), [(order.order_status, 1)])
+        self.assertRollupsMatchRebuild()
+
+
+@override_settings(ORDER_NUMBER_BLOCK_SIZE=5)
+class OrderNumberConcurrencyTests(OrderTestMixin, TransactionTestCase):
+
+    THREADS = 30
+    ORDERS_PER_THREAD = 10
+
+    def test_parallel_checkouts_get_unique_gapless_numbers(self):
+        start = threading.Barrier(self.THREADS)
+
+        def place_orders():
+            client = APIClient()
+            client.force_authenticate(self.customer)
+            start.wait()
+            numbers = []
+            for _ in range(self.ORDERS_PER_THREAD):
+                response = client.post('/orders/orders/create/', {
+                    'items': [{'service_type': 'photography', 'service_id': self.photography.pk}]
+                }, format='json')
+                self.assertEqual(response.status_code, 201, response.data)
+                numbers.append(response.data['order_number'])
+            return numbers
+
+        per_thread = self.run_threads(place_orders, [()] * self.THREADS)
+        numbers = [number for thread_numbers in per_thread for number in thread_numbers]
+        self.assertEqual(len(numbers), self.THREADS * self.ORDERS_PER_THREAD)
+        self.assertEqual(len(set(numbers)), len(numbers))
+        self.assertEqual(Order.objects.count(), len(numbers))
+
+        # Blocks are aligned runs of 5. Each is used by one thread, in order,
+        # from its first number on; only a thread's last block may have an
+        # unused tail.
+        size = 5
+        owners = {}
+        for thread, thread_numbers in enumerate(per_thread):
+            values = [int(number.rsplit('-', 1)[1]) for number in thread_numbers]
+            self.assertEqual(values, sorted(values))
+            blocks = {}
+            for value in values:
+                blocks.setdefault((value - 1) // size, []).append(value)
+            for block, used in blocks.items():
+                self.assertNotIn(block, owners)
+                owners[block] = thread
+                self.assertEqual(used, list(range(block * size + 1, block * size + 1 + len(used))))
+            full = sorted(blocks)[:-1]
+            self.assertTrue(all(len(blocks[block]) == size for block in full))
+
+        self.assertEqual(OrderNumberSequence.objects.get().last_value, len(owners) * size)
@@ -0,0 +1,146 @@
+"""
+Vendor dashboard rollups.
+
+VendorDailyStats holds order counts, item quantities and revenue per
+(vendor, day, service_type, status). place_order adds each new order with
+record_order(), and status changes move the order's contribution from the
+old status to the new one with move_order()/move_orders(). Each is one
+batched upsert.
+The stats endpoint reads only these rows, so its cost depends on the date
+range and not on the order history. `manage.py rebuild_vendor_stats`
+recomputes them from the orders (e.g. after statuses were edited in the
+admin).
+"""
+from decimal import Decimal
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import OrderItem, VendorDailyStats
+
+# service_type of the per-vendor totals rows
+ALL_SERVICES = ''
+
+COUNTER_FIELDS = ('orders', 'quantity', 'revenue')
+
+
+def order_deltas(order, items, status, sign=1):
+    """
+    {(vendor_id, day, service_type, status): [orders, quantity, revenue]}
+    for one order; items are (vendor_id, service_type, quantity, total_price)
+    """
+    day = timezone.localdate(order.created_at)
+    deltas = {}
+    for vendor_id, service_type, quantity, total_price in items:
+        if not vendor_id:
+            continue
+        for bucket in (service_type, ALL_SERVICES):
+            key = (vendor_id, day, bucket, status)
+            if key not in deltas:
+                deltas[key] = [sign, 0, Decimal('0')]
+            deltas[key][1] += sign * quantity
+            deltas[key][2] += sign * Decimal(total_price)
+    return deltas
+
+
+def apply(deltas):
+    """Add deltas to the rollup rows with one batched upsert"""
+    if not deltas:
+        return
+    qn = connection.ops.quote_name
+    table = qn(VendorDailyStats._meta.db_table)
+    columns = [
+        VendorDailyStats._meta.get_field(name).column
+        for name in ('vendor', 'day', 'service_type', 'status') + COUNTER_FIELDS
+    ]
+    key_columns = ', '.join(qn(column) for column in columns[:4])
+    sql = (
+        f"INSERT INTO {table} ({', '.join(qn(c) for c in columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON CONFLICT ({key_columns}) DO UPDATE SET "
+        + ', '.join(f"{qn(c)} = {table}.{qn(c)} + excluded.{qn(c)}" for c in columns[4:])
+    )
+    params = [
+        (vendor_id, connection.ops.adapt_datefield_value(day), service_type, status, orders, quantity,
+         connection.ops.adapt_decimalfield_value(revenue, 14, 2))
+        for (vendor_id, day, service_type, status), (orders, quantity, revenue) in sorted(deltas.items())
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def record_order(order, items):
+    """Add a new order (and its OrderItem instances) to the rollups"""
+    apply(order_deltas(
+        order,
+        [(item.vendor_id, item.service_type, item.quantity, item.total_price) for item in items],
+        order.order_status
+    ))
+
+
+def move_orders(changes):
+    """
+    Move each order's contribution from its old to its new status; changes
+    are (order, old_status, new_status). One items query, one upsert.
+    """
+    changes = [(order, old, new) for order, old, new in changes if old != new]
+    if not changes:
+        return
+    items_by_order = {}
+    for order_id, *item in (
+        OrderItem.objects.filter(order__in=[order for order, _, _ in changes], vendor__isnull=False).order_by()
+        .values_list('order_id', 'vendor_id', 'service_type', 'quantity', 'total_price')
+    ):
+        items_by_order.setdefault(order_id, []).append(item)
+
+    deltas = {}
+    for order, old_status, new_status in changes:
+        items = items_by_order.get(order.pk, [])
+        for sign, status in ((-1, old_status), (1, new_status)):
+            for key, (orders, quantity, revenue) in order_deltas(order, items, status, sign).items():
+                row = deltas.setdefault(key, [0, 0, Decimal('0')])
+                row[0] += orders
+                row[1] += quantity
+                row[2] += revenue
+    apply(deltas)
+
+
+def move_order(order, old_status, new_status):
+    """Move an order's contribution from old_status to new_status"""
+    move_orders([(order, old_status, new_status)])
+
+
+def rebuild(vendor_id=None, since=None):
+    """Recompute the rollups from order items; returns the number of rows written"""
+    items = OrderItem.objects.filter(vendor__isnull=False).order_by()
+    rows = VendorDailyStats.objects.all()
+    if vendor_id:
+        items = items.filter(vendor_id=vendor_id)
+        rows = rows.filter(vendor_id=vendor_id)
+    if since:
+        items = items.filter(order__created_at__date__gte=since)
+        rows = rows.filter(day__gte=since)
+
+    items = items.annotate(day=TruncDate('order__created_at'))
+    aggregates = {
+        'orders': Count('order', distinct=True),
+        'total_quantity': Sum('quantity'),
+        'revenue': Sum('total_price'),
+    }
+    group = ('vendor_id', 'day', 'order__order_status')
+    per_service = items.values(*group, 'service_type').annotate(**aggregates)
+    totals = items.values(*group).annotate(**aggregates)
+
+    stats = [
+        VendorDailyStats(
+            vendor_id=row['vendor_id'], day=row['day'], service_type=row.get('service_type', ALL_SERVICES),
+            status=row['order__order_status'], orders=row['orders'], quantity=row['total_quantity'],
+            revenue=row['revenue']
+        )
+        for row in [*per_service, *totals]
+    ]
+
+    with transaction.atomic():
+        rows.delete()
+        VendorDailyStats.objects.bulk_create(stats, batch_size=500)
+    return len(stats)
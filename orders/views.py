@@ -3,220 +3,132 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.pagination import CursorPagination
 from django.shortcuts import get_object_or_404
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
+from knox.auth import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
 from django.contrib.auth import get_user_model
-from .models import Order, OrderItem, VendorOrderNotification
-from .serializers import OrderSerializer, CreateOrderSerializer, OrderItemSerializer, VendorOrderNotificationSerializer
+from .models import (
+    Order, OrderItem, VendorOrder, VendorOrderNotification, VendorDailyStats, prefetch_order_services
+)
+from .checkout import place_order
+from .idempotency import idempotent
+from . import vendor_stats
+from .events import record_event, record_events, stream, stream_sync
+from .serializers import (
+    OrderSerializer, OrderSummarySerializer, CreateOrderSerializer, OrderItemSerializer,
+    VendorOrderNotificationSerializer
+)
 from services.models import *
+from services.availability import BookingConflict, parse_day, release_order, release_orders
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Sum, prefetch_related_objects
+from django.db.models.functions import TruncMonth
 from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from wedding_backend.db_router import ReplicaReadMixin
+from wedding_backend.db_writes import serialized_write
 
 User = get_user_model()
 
-class OrderListView(APIView):
-    """List all orders for the authenticated user"""
+class OrderCursorPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+EXPANSIONS = {'service', 'customer'}
+
+class OrderPageMixin:
+    """
+    Cursor-paginated, slim order listing served from each order's
+    items_snapshot. ?expand=service,customer adds the snapshotted service
+    details and joins in customers.
+    """
+    
+    def get_expand(self, request):
+        return {
+            name.strip() for name in request.query_params.get('expand', '').split(',')
+        } & EXPANSIONS
+    
+    def serialize_orders(self, orders, expand):
+        # Orders render from their items_snapshot; only older orders need their items loaded
+        legacy = [order for order in orders if order.items_snapshot is None]
+        if legacy:
+            prefetch_related_objects(legacy, 'items')
+            if 'service' in expand:
+                prefetch_order_services([item for order in legacy for item in order.items.all()])
+        return OrderSummarySerializer(orders, many=True, context={'expand': expand}).data
+    
+    def paginated_orders(self, request, orders):
+        expand = self.get_expand(request)
+        if 'customer' in expand:
+            orders = orders.select_related('customer')
+        
+        paginator = OrderCursorPagination()
+        page = paginator.paginate_queryset(orders, request, view=self)
+        return paginator.get_paginated_response(self.serialize_orders(page, expand))
+
+class OrderListView(OrderPageMixin, ReplicaReadMixin, APIView):
+    """List the authenticated user's orders, newest first (cursor-paginated)"""
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        orders = Order.objects.filter(customer=request.user).order_by('-created_at')
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        orders = Order.objects.filter(customer=request.user)
+        return self.paginated_orders(request, orders)
 
 class CreateOrderView(APIView):
     """Create a new order"""
     permission_classes = [IsAuthenticated]
     
+    @serialized_write
+    @idempotent
     def post(self, request):
         serializer = CreateOrderSerializer(data=request.data)
         if serializer.is_valid():
             try:
-                # Create the order
-                order = Order.objects.create(
-                    customer=request.user,
-                    customer_name=f"{request.user.first_name} {request.user.last_name}".strip() or request.user.username,
-                    customer_email=request.user.email,
-                    customer_phone=request.user.phone_number or '',
-                    event_date=serializer.validated_data.get('event_date'),
-                    special_instructions=serializer.validated_data.get('special_instructions', ''),
-                    total_amount=0  # Will be calculated
-                )
-                
-                total_amount = 0
-                order_items = []
-                
-                # Create order items
-                for item_data in serializer.validated_data['items']:
-                    service_type = item_data['service_type']
-                    service_id = item_data['service_id']
-                    quantity = item_data.get('quantity', 1)
-                    
-                    # Get the service object
-                    model_map = {
-                        'venue': Venue,
-                        'planning_decor': PlanningAndDecor,
-                        'photography': Photography,
-                        'makeup': Makeup,
-                        'bridal_wear': BridalWear,
-                        'groom_wear': GroomWear,
-                        'mehandi': Mehandi,
-                        'wedding_cake': WeddingCake,
-                        'car_rental': CarRental,
-                        'dj': DJ,
-                        'jewelry_rental': JewelryRental,
-                        'catering': Catering,
-                    }
-                    
-                    model_class = model_map.get(service_type)
-                    if not model_class:
-                        continue
-                    
-                    try:
-                        service_obj = model_class.objects.get(pk=service_id)
-                        
-                        # Calculate prices
-                        if hasattr(service_obj, 'price'):
-                            unit_price = service_obj.price
-                        elif hasattr(service_obj, 'price_range_min'):
-                            unit_price = service_obj.price_range_min
-                        elif hasattr(service_obj, 'price_per_plate'):
-                            unit_price = service_obj.price_per_plate
-                        else:
-                            unit_price = 0
-                        
-                        item_total = unit_price * quantity
-                        total_amount += item_total
-                        
-                        # Create order item
-                        order_item = OrderItem(
-                            order=order,
-                            service_type=service_type,
-                            service_id=service_id,
-                            service_name=service_obj.name,
-                            service_price=unit_price,
-                            vendor_name=service_obj.creator.get_full_name() if service_obj.creator else 'Unknown Vendor',
-                            vendor_email=service_obj.creator.email if service_obj.creator else '',
-                            quantity=quantity,
-                            unit_price=unit_price,
-                            total_price=item_total,
-                            service_date=item_data.get('service_date'),
-                            service_time=item_data.get('service_time'),
-                            notes=item_data.get('notes', '')
-                        )
-                        order_items.append(order_item)
-                        
-                    except model_class.DoesNotExist:
-                        continue
-                
-                # Save all order items
-                OrderItem.objects.bulk_create(order_items)
-                
-                # Update order total
-                order.total_amount = total_amount
-                order.save()
-                
-                # Send vendor notifications
-                self.send_vendor_notifications(order)
-                self.send_customer_confirmation(order)
-                
-                response_serializer = OrderSerializer(order)
-                return Response(response_serializer.data, status=status.HTTP_201_CREATED)
-                
+                with transaction.atomic():
+                    order = self.create_order(request, serializer.validated_data)
+            except BookingConflict as e:
+                return Response({
+                    'error': 'Some services are not available on the selected dates.',
+                    'conflicts': [
+                        {'service_type': t, 'service_id': i, 'service_date': d.isoformat()}
+                        for t, i, d in e.conflicts
+                    ]
+                }, status=status.HTTP_409_CONFLICT)
             except Exception as e:
                 return Response(
                     {'error': f'Failed to create order: {str(e)}'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            
+            response_serializer = OrderSerializer(order)
+            return Response(response_serializer.data, status=status.HTTP_201_CREATED)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
-    def send_vendor_notifications(self, order):
-        """Send email notifications to vendors"""
-        from django.core.mail import send_mail
-        from django.conf import settings
-        from django.utils import timezone
-        
-        vendors = order.get_vendors()
-        
-        for vendor in vendors:
-            notification, created = VendorOrderNotification.objects.get_or_create(
-                order=order,
-                vendor=vendor
-            )
-            
-            vendor_items = order.items.filter(vendor_email=vendor.email)
-            
-            subject = f'New Order Received - #{order.order_number}'
-            
-            message = f"""
-            New Order Received!
-            
-            Order Number: #{order.order_number}
-            Customer: {order.customer_name}
-            Email: {order.customer_email}
-            Phone: {order.customer_phone}
-            Event Date: {order.event_date}
-            
-            Services Ordered:
-            """
-            
-            for item in vendor_items:
-                message += f"\n- {item.service_name}: {item.quantity} x ₹{item.unit_price} = ₹{item.total_price}"
-            
-            message += f"\n\nTotal Amount: ₹{order.total_amount}"
-            
-            if order.special_instructions:
-                message += f"\n\nSpecial Instructions: {order.special_instructions}"
-            
-            try:
-                send_mail(
-                    subject,
-                    message,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [vendor.email],
-                    fail_silently=False,
-                )
-                notification.email_sent = True
-                notification.email_sent_at = timezone.now()
-                notification.save()
-            except Exception as e:
-                print(f"Failed to send email to vendor {vendor.email}: {str(e)}")
-    
-    def send_customer_confirmation(self, order):
-        """Send order confirmation to customer"""
-        from django.core.mail import send_mail
-        from django.conf import settings
-        
-        subject = f'Order Confirmation - #{order.order_number}'
-        
-        message = f"""
-        Thank you for your order!
-        
-        Order Number: #{order.order_number}
-        Order Date: {order.created_at.strftime('%Y-%m-%d %H:%M')}
-        Total Amount: ₹{order.total_amount}
-        Status: {order.get_order_status_display()}
-        
-        Your vendors have been notified and will contact you shortly.
-        
-        Thank you for choosing our service!
-        """
-        
-        try:
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [order.customer_email],
-                fail_silently=False,
-            )
-        except Exception as e:
-            print(f"Failed to send confirmation email to customer: {str(e)}")
+    def create_order(self, request, validated_data):
+        """Create the order, its items, service date bookings and queued emails"""
+        return place_order(
+            request.user,
+            validated_data['items'],
+            event_date=validated_data.get('event_date'),
+            special_instructions=validated_data.get('special_instructions', '')
+        )
 
 class OrderDetailView(APIView):
     """Retrieve, update or delete an order instance"""
     permission_classes = [IsAuthenticated]
     
     def get(self, request, pk):
-        order = get_object_or_404(Order, pk=pk, customer=request.user)
+        # Items come from the order's snapshot, so this is a single row fetch
+        order = get_object_or_404(Order.objects.select_related('customer'), pk=pk, customer=request.user)
         serializer = OrderSerializer(order)
         return Response(serializer.data)
 
@@ -224,12 +136,15 @@ class UpdateOrderStatusView(APIView):
     """Update order status and payment status"""
     permission_classes = [IsAuthenticated]
     
+    @serialized_write
     def patch(self, request, pk):
-        order = get_object_or_404(Order, pk=pk)
+        # Read inside the write transaction (locked on backends with
+        # SELECT ... FOR UPDATE) so previous_status is the one being replaced
+        order = get_object_or_404(Order.objects.select_for_update(), pk=pk)
         
         # Check if user is customer or vendor associated with the order
         is_customer = order.customer == request.user
-        is_vendor = order.items.filter(vendor_email=request.user.email).exists()
+        is_vendor = VendorOrder.objects.filter(order=order, vendor=request.user).exists()
         
         if not (is_customer or is_vendor or request.user.is_staff):
             return Response(
@@ -253,11 +168,27 @@ class UpdateOrderStatusView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Update the order
-        for field, value in updates.items():
-            setattr(order, field, value)
+        # Cancelling gave the service dates back and others may have booked
+        # them since, so a cancelled order stays cancelled
+        if order.order_status == 'cancelled' and updates.get('order_status', 'cancelled') != 'cancelled':
+            return Response(
+                {'error': 'Cancelled orders cannot be reopened'},
+                status=status.HTTP_409_CONFLICT
+            )
         
-        order.save()
+        # Update the order; repeating the current statuses writes nothing
+        if any(getattr(order, field) != value for field, value in updates.items()):
+            previous_status = order.order_status
+            for field, value in updates.items():
+                setattr(order, field, value)
+            
+            order.save()
+            vendor_stats.move_order(order, previous_status, order.order_status)
+            record_event(order, 'status_changed')
+            
+            # Cancelled orders give their service dates back
+            if order.order_status == 'cancelled' and previous_status != 'cancelled':
+                release_order(order)
         
         serializer = OrderSerializer(order)
         return Response({
@@ -265,18 +196,252 @@ class UpdateOrderStatusView(APIView):
             'order': serializer.data
         })
 
-class VendorOrdersView(APIView):
-    """Get all orders for a vendor"""
+class BulkUpdateOrderStatusView(APIView):
+    """
+    Update order and/or payment status of several orders in one request:
+    {"updates": [{"order_id": 1, "order_status": "confirmed"}, ...]}.
+    Permissions for the whole set are checked in one query and the batch is
+    applied all-or-nothing; inbox rows, rollups and events are written in
+    batch. Cancelled orders cannot be reopened (409). Returns a compact
+    result per order.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    MAX_UPDATES = 100
+    
+    def parse_updates(self, data):
+        """Normalize the update list; returns ({order_id: fields}, errors)"""
+        order_statuses = dict(Order.ORDER_STATUS_CHOICES)
+        payment_statuses = dict(Order.PAYMENT_STATUS_CHOICES)
+        updates = {}
+        errors = []
+        for index, raw in enumerate(data):
+            if not isinstance(raw, dict):
+                errors.append({'index': index, 'error': 'Update must be an object'})
+                continue
+            try:
+                order_id = int(raw.get('order_id'))
+            except (TypeError, ValueError):
+                errors.append({'index': index, 'error': 'order_id must be an integer'})
+                continue
+            if order_id in updates:
+                errors.append({'index': index, 'error': 'Duplicate order_id'})
+                continue
+            
+            fields = {}
+            if raw.get('order_status'):
+                if raw['order_status'] not in order_statuses:
+                    errors.append({'index': index, 'error': 'Invalid order_status'})
+                    continue
+                fields['order_status'] = raw['order_status']
+            if raw.get('payment_status'):
+                if raw['payment_status'] not in payment_statuses:
+                    errors.append({'index': index, 'error': 'Invalid payment_status'})
+                    continue
+                fields['payment_status'] = raw['payment_status']
+            if not fields:
+                errors.append({'index': index, 'error': 'No valid status updates provided'})
+                continue
+            updates[order_id] = fields
+        return updates, errors
+    
+    @serialized_write
+    def patch(self, request):
+        data = request.data.get('updates')
+        if not isinstance(data, list) or not data:
+            return Response(
+                {'error': 'updates must be a non-empty list'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(data) > self.MAX_UPDATES:
+            return Response(
+                {'error': f'At most {self.MAX_UPDATES} updates per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        updates, errors = self.parse_updates(data)
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Orders and the caller's vendor membership in one query
+        orders = Order.objects.select_for_update().filter(pk__in=updates).annotate(
+            is_vendor=Exists(VendorOrder.objects.filter(order=OuterRef('pk'), vendor=request.user))
+        ).in_bulk()
+        missing = [order_id for order_id in updates if order_id not in orders]
+        if missing:
+            return Response({'error': 'Order not found', 'missing': missing}, status=status.HTTP_404_NOT_FOUND)
+        if not request.user.is_staff:
+            forbidden = [
+                order_id for order_id, order in orders.items()
+                if not (order.customer_id == request.user.pk or order.is_vendor)
+            ]
+            if forbidden:
+                return Response(
+                    {'error': 'You do not have permission to update these orders', 'forbidden': forbidden},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+        # Cancelled orders have released their dates and stay cancelled
+        reopened = [
+            order_id for order_id, fields in updates.items()
+            if orders[order_id].order_status == 'cancelled'
+            and fields.get('order_status', 'cancelled') != 'cancelled'
+        ]
+        if reopened:
+            return Response(
+                {'error': 'Cancelled orders cannot be reopened', 'cancelled': reopened},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        now = timezone.now()
+        changed = []
+        status_changes = []
+        for order_id, fields in updates.items():
+            order = orders[order_id]
+            if all(getattr(order, field) == value for field, value in fields.items()):
+                continue
+            previous_status = order.order_status
+            for field, value in fields.items():
+                setattr(order, field, value)
+            order.updated_at = now
+            changed.append(order)
+            if order.order_status != previous_status:
+                status_changes.append((order, previous_status, order.order_status))
+        
+        if changed:
+            Order.objects.bulk_update(changed, ['order_status', 'payment_status', 'updated_at'])
+            
+            # bulk_update sends no post_save, so mirror the status onto inbox rows here
+            orders_by_status = {}
+            for order, _, new_status in status_changes:
+                orders_by_status.setdefault(new_status, []).append(order)
+            for new_status, status_orders in orders_by_status.items():
+                VendorOrder.objects.filter(order__in=status_orders).update(status=new_status)
+            
+            # Cancelled orders give their service dates back
+            if orders_by_status.get('cancelled'):
+                release_orders(orders_by_status['cancelled'])
+            
+            vendor_stats.move_orders(status_changes)
+            record_events(changed, 'status_changed')
+        
+        changed_ids = {order.pk for order in changed}
+        return Response({
+            'results': [
+                {
+                    'order_id': order_id,
+                    'order_number': orders[order_id].order_number,
+                    'order_status': orders[order_id].order_status,
+                    'payment_status': orders[order_id].payment_status,
+                    'changed': order_id in changed_ids,
+                }
+                for order_id in updates
+            ]
+        })
+
+class VendorOrdersView(OrderPageMixin, ReplicaReadMixin, APIView):
+    """
+    Vendor order inbox, newest first (cursor-paginated), from the VendorOrder
+    rows: ?status= and ?unread=true filter it, and unread_count is included.
+    """
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        # Get orders where vendor email matches current user's email
-        orders = Order.objects.filter(
-            items__vendor_email=request.user.email
-        ).distinct().order_by('-created_at')
+        links = VendorOrder.objects.filter(vendor=request.user)
         
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        order_status = request.query_params.get('status')
+        if order_status:
+            if order_status not in dict(Order.ORDER_STATUS_CHOICES):
+                return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
+            links = links.filter(status=order_status)
+        if request.query_params.get('unread') in ('1', 'true'):
+            links = links.filter(viewed=False)
+        
+        expand = self.get_expand(request)
+        links = links.select_related('order__customer' if 'customer' in expand else 'order')
+        
+        paginator = OrderCursorPagination()
+        page = paginator.paginate_queryset(links, request, view=self)
+        results = self.serialize_orders([link.order for link in page], expand)
+        for row, link in zip(results, page):
+            row['viewed'] = link.viewed
+        
+        response = paginator.get_paginated_response(results)
+        response.data['unread_count'] = VendorOrder.objects.filter(vendor=request.user, viewed=False).count()
+        return response
+
+def money(value):
+    return str((value or Decimal('0')).quantize(Decimal('0.01')))
+
+class VendorStatsView(ReplicaReadMixin, APIView):
+    """
+    Vendor dashboard from the VendorDailyStats rollups: revenue and orders
+    per day or month (?group=day|month), orders by status and top service
+    types for ?start=&end= (YYYY-MM-DD, default the last 30 days). Cancelled
+    orders are left out of revenue and top services.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        today = timezone.localdate()
+        start = parse_day(request.query_params.get('start'))
+        end = parse_day(request.query_params.get('end'))
+        if (request.query_params.get('start') and not start) or (request.query_params.get('end') and not end):
+            return Response({'error': 'Dates must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        end = end or today
+        start = start or end - timedelta(days=29)
+        if start > end:
+            return Response({'error': 'start must not be after end'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        group = request.query_params.get('group', 'day')
+        if group not in ('day', 'month'):
+            return Response({'error': 'group must be day or month'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Status changes leave emptied rows behind; skip them so the output
+        # matches freshly rebuilt rollups
+        rows = VendorDailyStats.objects.filter(vendor=request.user, day__range=(start, end)).exclude(orders=0)
+        totals = rows.filter(service_type=vendor_stats.ALL_SERVICES)
+        
+        revenue = list(
+            totals.exclude(status='cancelled')
+            .annotate(period=TruncMonth('day') if group == 'month' else F('day'))
+            .values('period')
+            .annotate(total_orders=Sum('orders'), total_revenue=Sum('revenue'))
+            .order_by('period')
+        )
+        by_status = (
+            totals.values('status')
+            .annotate(total_orders=Sum('orders'), total_revenue=Sum('revenue'))
+            .order_by('status')
+        )
+        top_services = (
+            rows.exclude(service_type=vendor_stats.ALL_SERVICES).exclude(status='cancelled')
+            .values('service_type')
+            .annotate(total_orders=Sum('orders'), total_quantity=Sum('quantity'), total_revenue=Sum('revenue'))
+            .order_by('-total_revenue', 'service_type')[:5]
+        )
+        
+        return Response({
+            'start': start,
+            'end': end,
+            'group': group,
+            'total_orders': sum(row['total_orders'] for row in revenue),
+            'total_revenue': money(sum((row['total_revenue'] for row in revenue), Decimal('0'))),
+            'revenue': [
+                {'period': row['period'], 'orders': row['total_orders'], 'revenue': money(row['total_revenue'])}
+                for row in revenue
+            ],
+            'by_status': [
+                {'status': row['status'], 'orders': row['total_orders'], 'revenue': money(row['total_revenue'])}
+                for row in by_status
+            ],
+            'top_services': [
+                {
+                    'service_type': row['service_type'], 'orders': row['total_orders'],
+                    'quantity': row['total_quantity'], 'revenue': money(row['total_revenue'])
+                }
+                for row in top_services
+            ],
+        })
 
 class MarkNotificationViewedView(APIView):
     """Mark vendor notification as viewed"""
@@ -293,9 +458,46 @@ class MarkNotificationViewedView(APIView):
             notification.viewed = True
             notification.viewed_at = timezone.now()
             notification.save()
+            VendorOrder.objects.filter(order_id=notification.order_id, vendor=request.user).update(viewed=True)
         
         serializer = VendorOrderNotificationSerializer(notification)
         return Response({
             'message': 'Notification marked as viewed',
             'notification': serializer.data
-        })
\ No newline at end of file
+        })
+
+class OrderEventStreamView(View):
+    """
+    Server-sent events for the user's orders (new orders, status changes);
+    resumes after the Last-Event-ID header (or ?last_event_id=). A plain
+    async Django view, since DRF views are sync: under ASGI each stream
+    costs no worker thread while it waits. Under WSGI (the current gunicorn
+    deployment) frames still arrive as they happen, but each open stream
+    holds a worker thread for up to ORDER_EVENTS_MAX_STREAM seconds.
+    Authenticates with the knox token in the Authorization header.
+    """
+    
+    async def get(self, request):
+        user = await sync_to_async(self.authenticate)(request)
+        if user is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+        
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        try:
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            return JsonResponse({'error': 'Last-Event-ID must be an integer'}, status=400)
+        
+        generator = stream if isinstance(request, ASGIRequest) else stream_sync
+        response = StreamingHttpResponse(generator(user, last_event_id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Keep proxies (nginx) from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
+    def authenticate(self, request):
+        try:
+            result = TokenAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return None
+        return result[0] if result else None
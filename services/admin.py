@@ -99,12 +99,33 @@ class CartAdmin(admin.ModelAdmin):
 @admin.register(CartItem)
 class CartItemAdmin(admin.ModelAdmin):
     list_display = ['user', 'content_type', 'object_id', 'quantity', 'total_price', 'added_at']
+    list_select_related = ['cart__user']
     list_filter = ['content_type', 'added_at']
     readonly_fields = ['added_at']
     
     def user(self, obj):
-        return obj.cart_set.first().user if obj.cart_set.exists() else 'No user'
+        return obj.cart.user
     
     def total_price(self, obj):
         return f"₹{obj.total_price()}"
-    total_price.short_description = 'Total Price'
\ No newline at end of file
+    total_price.short_description = 'Total Price'
+
+@admin.register(ServiceAvailability)
+class ServiceAvailabilityAdmin(admin.ModelAdmin):
+    list_display = ['service_type', 'object_id', 'date', 'status', 'order', 'created_at']
+    list_filter = ['service_type', 'status', 'date']
+    search_fields = ['object_id', 'order__order_number']
+    readonly_fields = ['created_at']
+
+@admin.register(ServiceDailyStats)
+class ServiceDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ['service_type', 'object_id', 'date', 'views', 'cart_adds', 'wishlist_adds', 'bookings']
+    list_filter = ['service_type', 'date']
+    search_fields = ['object_id']
+
+@admin.register(SimilarServices)
+class SimilarServicesAdmin(admin.ModelAdmin):
+    list_display = ['service_type', 'object_id', 'computed_at']
+    list_filter = ['service_type']
+    search_fields = ['object_id']
+    readonly_fields = ['neighbours', 'scores', 'computed_at']
@@ -0,0 +1,139 @@
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Subquery
+from django.utils.dateparse import parse_date
+from .models import ServiceAvailability
+
+
+class BookingConflict(Exception):
+    """Raised when one or more requested service days are already taken"""
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        super().__init__(f"{len(conflicts)} service date(s) unavailable")
+
+
+def parse_day(value):
+    """Parse a YYYY-MM-DD value, return None if missing or invalid"""
+    if not value:
+        return None
+    try:
+        return parse_date(str(value))
+    except ValueError:
+        return None
+
+
+def filter_available(queryset, service_type, day):
+    """Exclude services of the given type that are booked or blocked on day"""
+    taken = ServiceAvailability.objects.filter(
+        service_type=service_type,
+        date=day
+    ).values('object_id')
+    return queryset.exclude(pk__in=Subquery(taken))
+
+
+def find_conflicts(keys):
+    """Return the subset of (service_type, object_id, date) keys already taken"""
+    keys = set(keys)
+    if not keys:
+        return []
+    taken = ServiceAvailability.objects.filter(
+        service_type__in={k[0] for k in keys},
+        object_id__in={k[1] for k in keys},
+        date__in={k[2] for k in keys},
+    ).values_list('service_type', 'object_id', 'date')
+    return sorted(set(taken) & keys, key=lambda k: (k[2], k[0], k[1]))
+
+
+def is_available(service_type, object_id, day):
+    return not ServiceAvailability.objects.filter(
+        service_type=service_type,
+        object_id=object_id,
+        date=day
+    ).exists()
+
+
+def reserve_dates(order, keys):
+    """
+    Claim (service_type, object_id, date) days for an order.
+
+    All rows go in with one INSERT inside a savepoint; the unique constraint
+    rejects concurrent claims, so no lock is held beyond the insert itself.
+    Must be called inside a transaction. Raises BookingConflict.
+    """
+    keys = sorted(set(keys), key=lambda k: (k[0], k[1], k[2]))
+    if not keys:
+        return []
+
+    rows = [
+        ServiceAvailability(
+            service_type=service_type,
+            object_id=object_id,
+            date=day,
+            status='booked',
+            order=order
+        )
+        for service_type, object_id, day in keys
+    ]
+    try:
+        with transaction.atomic():
+            return ServiceAvailability.objects.bulk_create(rows)
+    except IntegrityError:
+        raise BookingConflict(find_conflicts(keys) or keys)
+
+
+def release_order(order):
+    """Free every day booked by an order (e.g. on cancellation)"""
+    return release_orders([order])
+
+
+def release_orders(orders):
+    """Free every day booked by any of the orders (one DELETE)"""
+    return ServiceAvailability.objects.filter(order__in=orders, status='booked').delete()[0]
+
+
+def block_dates(service_type, object_id, start_date, end_date):
+    """Mark a date range unavailable, skipping days that are already taken"""
+    days = []
+    day = start_date
+    while day <= end_date:
+        days.append(day)
+        day += timedelta(days=1)
+
+    rows = [
+        ServiceAvailability(
+            service_type=service_type,
+            object_id=object_id,
+            date=day,
+            status='blocked'
+        )
+        for day in days
+    ]
+    ServiceAvailability.objects.bulk_create(rows, ignore_conflicts=True)
+    return len(rows)
+
+
+def unblock_dates(service_type, object_id, start_date, end_date):
+    """Remove vendor blocks in a date range; bookings are left untouched"""
+    return ServiceAvailability.objects.filter(
+        service_type=service_type,
+        object_id=object_id,
+        status='blocked',
+        date__gte=start_date,
+        date__lte=end_date
+    ).delete()[0]
+
+
+def get_calendar(service_type, object_id, start_date, end_date):
+    """Booked and blocked days for a service within a date range"""
+    entries = ServiceAvailability.objects.filter(
+        service_type=service_type,
+        object_id=object_id,
+        date__gte=start_date,
+        date__lte=end_date
+    ).values_list('date', 'status')
+
+    calendar = {'booked': [], 'blocked': []}
+    for day, entry_status in entries:
+        calendar[entry_status].append(day.isoformat())
+    return calendar
@@ -0,0 +1,579 @@
+"""
+Cart storage: single-statement DB helpers (upsert_item, persist_state) and
+the write-behind cache backend, enabled with CART_BACKEND = 'cache'.
+
+The live cart is a small dict kept in the shared cache:
+
+    {'cart_id', 'created_at', 'updated_at', 'dirty',
+     'items': [{'id', 'content_type', 'object_id', 'quantity', 'service_date',
+                'service_time', 'notes', 'added_at', 'service_name',
+                'unit_price', 'vendor_id', 'snapshot_version'}, ...]}
+
+Adds, updates and removes only rewrite that dict. Carts changed in this
+process are written to the DB by a background flusher every
+CART_FLUSH_INTERVAL seconds, at exit, and always before checkout; a cache
+miss rebuilds the dict from the DB. New items get their primary key up
+front from a cache counter (next_item_id), so they can be updated or removed
+by id before they are flushed.
+
+Reads never touch the DB on a warm cache: lines are priced from the
+snapshot stored with them (like CartItem.unit_price in DB mode) and item
+details come from the resolver's versioned cache. A service saved since a
+line was snapshotted shows its new values, as the save signal does for DB
+rows.
+"""
+import atexit
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import Cart, CartItem, fill_cart_snapshots, prefetch_cart_services
+from .resolver import ServiceRef, get_details, get_snapshots
+
+logger = logging.getLogger(__name__)
+
+ITEM_FIELDS = ('content_type', 'object_id', 'quantity', 'service_date', 'service_time', 'notes')
+SNAPSHOT_FIELDS = ('service_name', 'unit_price', 'vendor_id', 'snapshot_version')
+
+ITEM_ID_KEY = 'cart_item_id'
+
+# User ids whose cached cart changed in this process and is not yet in the DB
+_dirty = set()
+_lock = threading.Lock()
+_flusher = None
+
+
+def enabled():
+    return getattr(settings, 'CART_BACKEND', 'db') == 'cache'
+
+
+def state_key(user_id):
+    # v2: items carry their snapshot fields
+    return f"cart_state_v2_{user_id}"
+
+
+class CartBusy(Exception):
+    """The user's cart lock could not be taken in time; nothing was changed"""
+
+
+@contextmanager
+def locked(user_id):
+    """
+    Per-user mutex in the shared cache so concurrent requests don't lose
+    updates. Waits up to CART_LOCK_TIMEOUT seconds, then raises CartBusy
+    rather than going ahead unlocked.
+    """
+    timeout = getattr(settings, 'CART_LOCK_TIMEOUT', 5)
+    key = f"cart_lock_{user_id}"
+    deadline = time.monotonic() + timeout
+    acquired = cache.add(key, 1, timeout)
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(0.01)
+        acquired = cache.add(key, 1, timeout)
+    if not acquired:
+        logger.warning(f"Cart lock for user {user_id} timed out")
+        raise CartBusy(f"Cart of user {user_id} is locked by another request")
+    try:
+        yield
+    finally:
+        cache.delete(key)
+
+
+def _as_text(value):
+    return None if value in (None, '') else str(value)
+
+
+def load_from_db(user):
+    """Build the cart dict from the Cart/CartItem tables"""
+    cart, created = Cart.objects.get_or_create(user=user)
+    items = [
+        {
+            'id': row['id'],
+            'content_type': row['content_type'],
+            'object_id': row['object_id'],
+            'quantity': row['quantity'],
+            'service_date': _as_text(row['service_date']),
+            'service_time': _as_text(row['service_time']),
+            'notes': row['notes'],
+            'added_at': row['added_at'],
+            **{field: row[field] for field in SNAPSHOT_FIELDS},
+        }
+        for row in cart.items.order_by('added_at', 'id').values('id', 'added_at', *ITEM_FIELDS, *SNAPSHOT_FIELDS)
+    ]
+    return {
+        'cart_id': cart.pk,
+        'created_at': cart.created_at,
+        'updated_at': cart.updated_at,
+        'dirty': False,
+        'items': items,
+    }
+
+
+def get_state(user):
+    state = cache.get(state_key(user.pk))
+    if state is None:
+        state = load_from_db(user)
+        save_state(user.pk, state)
+    return state
+
+
+def save_state(user_id, state):
+    cache.set(state_key(user_id), state, getattr(settings, 'CART_CACHE_TIMEOUT', 7 * 24 * 3600))
+
+
+def _changed(user_id, state):
+    state['dirty'] = True
+    state['updated_at'] = timezone.now()
+    save_state(user_id, state)
+    with _lock:
+        _dirty.add(user_id)
+    _ensure_flusher()
+    cart_changed(user_id)
+
+
+def _version_key(user_id):
+    return f"cart_version_{user_id}"
+
+
+def _summary_key(user_id):
+    return f"cart_summary_{user_id}"
+
+
+def bump_version(user_id):
+    key = _version_key(user_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Start past any version a client may have seen before eviction
+        cache.add(key, time.time_ns() // 1000, None)
+        return cache.incr(key)
+
+
+def next_item_id():
+    """
+    Primary key for an item added to a cached cart, used as its id when it is
+    flushed. The counter starts past the highest stored id and any id handed
+    out before an eviction (microseconds since the epoch).
+    """
+    try:
+        return cache.incr(ITEM_ID_KEY)
+    except ValueError:
+        highest = CartItem.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        cache.add(ITEM_ID_KEY, max(highest, time.time_ns() // 1000), None)
+        return cache.incr(ITEM_ID_KEY)
+
+
+def cart_changed(user_id):
+    """
+    Call after every cart mutation: bumps the cart version once the current
+    transaction commits, which makes the cached summary stale.
+    """
+    transaction.on_commit(lambda: bump_version(user_id))
+
+
+def compute_summary(user):
+    """Item count and total: one aggregate query, or the cached lines in cache mode"""
+    if enabled():
+        items = get_state(user)['items']
+        snapshots = get_snapshots((item['content_type'], item['object_id']) for item in items)
+        total = Decimal('0')
+        for item in items:
+            snapshot = current_snapshot(item, snapshots.get(ServiceRef(item['content_type'], item['object_id'])))
+            total += snapshot['unit_price'] * item['quantity']
+        return {'count': len(items), 'total': total}
+
+    return CartItem.objects.filter(cart__user=user).aggregate(
+        count=Count('id'),
+        total=Coalesce(
+            Sum(F('unit_price') * F('quantity'), output_field=DecimalField(max_digits=12, decimal_places=2)),
+            Value(0), output_field=DecimalField(max_digits=12, decimal_places=2)
+        )
+    )
+
+
+def get_summary(user):
+    """
+    {count, total, version} for the cart badge. Served from the cache while
+    the stored version matches the current one; otherwise recomputed without
+    loading any service rows. In cache mode the cart and prices are already
+    cached, so it is computed on every call (still no SQL when warm).
+    """
+    version_key, summary_key = _version_key(user.pk), _summary_key(user.pk)
+    cached = cache.get_many([version_key, summary_key])
+    version = cached.get(version_key)
+    if version is None:
+        version = bump_version(user.pk)
+    if enabled():
+        return {**compute_summary(user), 'version': version}
+
+    summary = cached.get(summary_key)
+    if summary is None or summary['version'] != version:
+        summary = {**compute_summary(user), 'version': version}
+        cache.set(summary_key, summary, getattr(settings, 'CART_CACHE_TIMEOUT', 7 * 24 * 3600))
+    return summary
+
+
+def current_snapshot(item, snapshot):
+    """
+    The line's stored snapshot fields, or the service's cached snapshot if the
+    service was saved since (name, price or vendor differ). DB rows get the
+    same refresh from services/signals.py.
+    """
+    stored = {field: item[field] for field in SNAPSHOT_FIELDS}
+    if snapshot is None:
+        return stored
+    current = {
+        'service_name': snapshot['name'], 'unit_price': snapshot['unit_price'], 'vendor_id': snapshot['creator_id']
+    }
+    if all(stored[field] == value for field, value in current.items()):
+        return stored
+    return {**current, 'snapshot_version': stored['snapshot_version'] + 1}
+
+
+def build_cart(user, state):
+    """
+    Unsaved Cart/CartItem instances from the cart dict, ready for
+    CartSerializer. Lines are priced from their snapshot; in cache mode the
+    services come from the resolver cache, otherwise from one query per type.
+    """
+    cart = Cart(pk=state['cart_id'], user=user, created_at=state['created_at'], updated_at=state['updated_at'])
+    items = [
+        CartItem(
+            pk=item['id'], added_at=item['added_at'],
+            **{f: item[f] for f in ITEM_FIELDS}, **{f: item[f] for f in SNAPSHOT_FIELDS}
+        )
+        for item in state['items']
+    ]
+    if enabled():
+        refs = [(item.content_type, item.object_id) for item in items]
+        snapshots, details = get_snapshots(refs), get_details(refs)
+        for obj, item in zip(items, state['items']):
+            ref = ServiceRef(obj.content_type, obj.object_id)
+            snapshot = snapshots.get(ref)
+            for field, value in current_snapshot(item, snapshot).items():
+                setattr(obj, field, value)
+            obj.set_cached_service(details.get(ref), snapshot['unit_price'] if snapshot else None)
+    else:
+        prefetch_cart_services(items)
+    # Fill the cached_property so totals and serializers use these items
+    cart.__dict__['resolved_items'] = items
+    return cart
+
+
+def get_cart(user):
+    return build_cart(user, get_state(user))
+
+
+def find_item(state, item_id=None, content_type=None, object_id=None):
+    for item in state['items']:
+        if item_id is not None and item['id'] == item_id:
+            return item
+        if item_id is None and item['content_type'] == content_type and item['object_id'] == int(object_id):
+            return item
+    return None
+
+
+class CartOperationError(Exception):
+    """A batch operation refers to an item that is not in the cart"""
+
+    def __init__(self, index, message):
+        self.index = index
+        super().__init__(message)
+
+
+def _merge_add(state, content_type, object_id, quantity=1, service_date=None, service_time=None, notes='',
+               snapshot=None, item_id=None):
+    item = find_item(state, content_type=content_type, object_id=object_id)
+    if item:
+        item['quantity'] += int(quantity)
+        if service_date:
+            item['service_date'] = _as_text(service_date)
+        if service_time:
+            item['service_time'] = _as_text(service_time)
+        if notes:
+            item['notes'] = notes
+    else:
+        snapshot = snapshot or {}
+        state['items'].append({
+            'id': item_id() if item_id else None,
+            'content_type': content_type,
+            'object_id': int(object_id),
+            'quantity': int(quantity),
+            'service_date': _as_text(service_date),
+            'service_time': _as_text(service_time),
+            'notes': notes,
+            'added_at': timezone.now(),
+            'service_name': snapshot.get('name', ''),
+            'unit_price': snapshot.get('unit_price', Decimal('0')),
+            'vendor_id': snapshot.get('creator_id'),
+            'snapshot_version': 0,
+        })
+
+
+def _set_fields(item, fields):
+    for field, value in fields.items():
+        if value is None:
+            continue
+        if field == 'quantity':
+            value = int(value)
+        elif field in ('service_date', 'service_time'):
+            value = _as_text(value)
+        item[field] = value
+
+
+def apply_operations(state, operations, snapshots=None, item_id=None):
+    """
+    Apply add/update/remove operations (dicts with op, content_type,
+    object_id and optional quantity, service_date, service_time, notes) to a
+    cart dict in place. New lines take their snapshot from snapshots
+    ({ServiceRef: snapshot}) and their id from item_id() when given. Raises
+    CartOperationError before touching anything if an update/remove targets
+    a service that is not in the cart.
+    """
+    snapshots = snapshots or {}
+    items = [dict(item) for item in state['items']]
+    working = {**state, 'items': items}
+    for index, operation in enumerate(operations):
+        op = operation['op']
+        fields = {f: operation.get(f) for f in ('quantity', 'service_date', 'service_time', 'notes')}
+        if op == 'add':
+            _merge_add(
+                working, operation['content_type'], operation['object_id'],
+                quantity=fields['quantity'] or 1, service_date=fields['service_date'],
+                service_time=fields['service_time'], notes=fields['notes'] or '',
+                snapshot=snapshots.get(ServiceRef(operation['content_type'], int(operation['object_id']))),
+                item_id=item_id
+            )
+            continue
+
+        item = find_item(working, content_type=operation['content_type'], object_id=operation['object_id'])
+        if not item:
+            raise CartOperationError(index, 'Item not found in cart')
+        if op == 'update':
+            _set_fields(item, fields)
+        else:
+            items.remove(item)
+    state['items'] = items
+
+
+def add_item(user, content_type, object_id, quantity=1, service_date=None, service_time=None, notes='',
+             snapshot=None):
+    """Add a service (priced from snapshot), or bump its quantity if it is already in the cart"""
+    with locked(user.pk):
+        state = get_state(user)
+        _merge_add(
+            state, content_type, object_id, quantity, service_date, service_time, notes,
+            snapshot=snapshot, item_id=next_item_id
+        )
+        _changed(user.pk, state)
+    return build_cart(user, state)
+
+
+def apply_batch(user, operations, snapshots=None):
+    """Apply a list of operations to the cached cart in one step"""
+    with locked(user.pk):
+        state = get_state(user)
+        apply_operations(state, operations, snapshots=snapshots, item_id=next_item_id)
+        _changed(user.pk, state)
+    return build_cart(user, state)
+
+
+def update_item(user, item_id, **fields):
+    """Update a persisted item by id; returns the updated CartItem or None"""
+    with locked(user.pk):
+        state = get_state(user)
+        item = find_item(state, item_id=item_id)
+        if not item:
+            return None
+        _set_fields(item, fields)
+        _changed(user.pk, state)
+    return build_cart(user, {**state, 'items': [item]}).resolved_items[0]
+
+
+def remove_item(user, item_id=None, content_type=None, object_id=None):
+    """Remove an item by id or by content_type/object_id; returns False if absent"""
+    with locked(user.pk):
+        state = get_state(user)
+        item = find_item(state, item_id=item_id, content_type=content_type, object_id=object_id)
+        if not item:
+            return False
+        state['items'].remove(item)
+        _changed(user.pk, state)
+    return True
+
+
+def discard(user_id):
+    """Forget the cached cart (e.g. after checkout emptied it in the DB)"""
+    cache.delete(state_key(user_id))
+    with _lock:
+        _dirty.discard(user_id)
+    bump_version(user_id)
+
+
+def persist_state(user_id, state):
+    """
+    Make the Cart/CartItem rows match a cart dict: one DELETE for removed
+    items, one bulk UPDATE for changed ones and one bulk INSERT for new ones.
+    New items keep an id allocated by next_item_id (or get one filled in) and
+    are snapshotted from the service rows, as in DB mode.
+    """
+    with transaction.atomic():
+        cart, created = Cart.objects.get_or_create(user_id=user_id)
+        existing = {item.pk: item for item in cart.items.all()}
+        kept = {item['id'] for item in state['items'] if item['id'] is not None}
+
+        stale = [pk for pk in existing if pk not in kept]
+        if stale:
+            CartItem.objects.filter(pk__in=stale).delete()
+
+        to_update = []
+        for item in state['items']:
+            obj = existing.get(item['id'])
+            if obj is None:
+                continue
+            changed = False
+            for field in ITEM_FIELDS:
+                if _as_text(getattr(obj, field)) != _as_text(item[field]):
+                    setattr(obj, field, item[field])
+                    changed = True
+            if changed:
+                to_update.append(obj)
+        if to_update:
+            CartItem.objects.bulk_update(to_update, ITEM_FIELDS)
+
+        new_items = [item for item in state['items'] if item['id'] not in existing]
+        created_items = CartItem.objects.bulk_create(
+            fill_cart_snapshots([
+                CartItem(pk=item['id'], cart=cart, **{f: item[f] for f in ITEM_FIELDS}) for item in new_items
+            ]),
+            update_conflicts=True,
+            unique_fields=['cart', 'content_type', 'object_id'],
+            update_fields=list(ITEM_FIELDS) + ['service_name', 'unit_price', 'vendor'],
+        )
+        for item, obj in zip(new_items, created_items):
+            item['id'] = obj.pk
+            item['added_at'] = obj.added_at
+            item.update({field: getattr(obj, field) for field in SNAPSHOT_FIELDS})
+        if stale or to_update or created_items:
+            Cart.objects.filter(pk=cart.pk).update(updated_at=state['updated_at'])
+
+    state['cart_id'] = cart.pk
+    return cart
+
+
+def upsert_item(cart_id, content_type, object_id, quantity=1, service_date=None, service_time=None,
+                notes='', snapshot=None):
+    """
+    Add a service to a cart, or bump the quantity of its existing line, with a
+    single INSERT ... ON CONFLICT DO UPDATE. Dates, time and notes are only
+    overwritten when given. Returns the item id.
+    """
+    snapshot = snapshot or {}
+    values = {
+        'cart': cart_id,
+        'content_type': content_type,
+        'object_id': int(object_id),
+        'quantity': int(quantity),
+        'added_at': timezone.now(),
+        'service_date': service_date or None,
+        'service_time': service_time or None,
+        'notes': notes or '',
+        'service_name': snapshot.get('name', ''),
+        'unit_price': snapshot.get('unit_price', 0),
+        'vendor': snapshot.get('creator_id'),
+        'snapshot_version': 0,
+    }
+    fields = [CartItem._meta.get_field(name) for name in values]
+    params = [field.get_db_prep_save(value, connection) for field, value in zip(fields, values.values())]
+
+    qn = connection.ops.quote_name
+    table = qn(CartItem._meta.db_table)
+    column = {field.name: qn(field.column) for field in fields}
+    sql = (
+        f"INSERT INTO {table} ({', '.join(column.values())}) "
+        f"VALUES ({', '.join(['%s'] * len(fields))}) "
+        f"ON CONFLICT ({column['cart']}, {column['content_type']}, {column['object_id']}) DO UPDATE SET "
+        f"{column['quantity']} = {table}.{column['quantity']} + excluded.{column['quantity']}, "
+        + ''.join(
+            f"{column[name]} = COALESCE(excluded.{column[name]}, {table}.{column[name]}), "
+            for name in ('service_date', 'service_time')
+        )
+        + f"{column['notes']} = COALESCE(NULLIF(excluded.{column['notes']}, ''), {table}.{column['notes']}), "
+        + ', '.join(
+            f"{column[name]} = excluded.{column[name]}"
+            for name in ('service_name', 'unit_price', 'vendor')
+        )
+        + f" RETURNING {qn(CartItem._meta.pk.column)}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchone()[0]
+
+
+def flush_user(user_id):
+    """Write a user's cached cart to the DB if it has unsaved changes"""
+    with locked(user_id):
+        state = cache.get(state_key(user_id))
+        if not state or not state['dirty']:
+            with _lock:
+                _dirty.discard(user_id)
+            return False
+
+        persist_state(user_id, state)
+        state['dirty'] = False
+        save_state(user_id, state)
+        with _lock:
+            _dirty.discard(user_id)
+    return True
+
+
+def flush():
+    """Persist every cart this process has changed since the last flush"""
+    with _lock:
+        pending = list(_dirty)
+    flushed = 0
+    for user_id in pending:
+        try:
+            flushed += flush_user(user_id)
+        except Exception as e:
+            logger.error(f"Failed to flush cart for user {user_id}: {str(e)}")
+    return flushed
+
+
+def _flush_loop(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            flush()
+        finally:
+            connection.close()
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None:
+        return
+    interval = getattr(settings, 'CART_FLUSH_INTERVAL', 5)
+    if not interval:
+        return
+    with _lock:
+        if _flusher is None:
+            _flusher = threading.Thread(
+                target=_flush_loop, args=(interval,), name='cart-flusher', daemon=True
+            )
+            _flusher.start()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        flush()
+    except Exception:
+        pass
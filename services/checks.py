@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+PER_PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Service snapshots and their invalidations must be visible to every worker"""
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend in PER_PROCESS_CACHES:
+        return [Warning(
+            f'The default cache ({backend}) is per process.',
+            hint=(
+                'Service snapshots, cart summaries and replica pins are invalidated only in the '
+                'worker that saved the change. Set CACHE_BACKEND/CACHE_LOCATION to a shared '
+                'backend such as django.core.cache.backends.redis.RedisCache.'
+            ),
+            id='services.W001',
+        )]
+    return []
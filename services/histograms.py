@@ -0,0 +1,93 @@
+import threading
+import time
+import numpy as np
+from django.conf import settings
+from django.db import models
+from .models import SERVICE_MODELS
+from .utils import get_generation
+
+NUMERIC_FIELD_TYPES = (models.DecimalField, models.FloatField, models.IntegerField)
+PERCENTILES = (10, 25, 50, 75, 90)
+
+# service_type -> (generation, loaded_at, {field: ndarray, 'category': ndarray})
+_arrays = {}
+_lock = threading.Lock()
+
+
+def numeric_fields(model_class):
+    """Numeric, non-key fields of a service model (price, capacity, rating, ...)"""
+    return [
+        field.name for field in model_class._meta.concrete_fields
+        if isinstance(field, NUMERIC_FIELD_TYPES) and not field.primary_key and not field.is_relation
+    ]
+
+
+def load_arrays(service_type):
+    """One query per type: every numeric column as a float64 array, plus category"""
+    model_class = SERVICE_MODELS[service_type]
+    fields = numeric_fields(model_class)
+    rows = list(model_class.objects.values_list('category', *fields))
+
+    arrays = {'category': np.array([row[0] for row in rows], dtype=object)}
+    for i, field in enumerate(fields, start=1):
+        arrays[field] = np.array(
+            [np.nan if row[i] is None else float(row[i]) for row in rows],
+            dtype=np.float64
+        )
+    return arrays
+
+
+def get_arrays(service_type):
+    """
+    Numeric arrays for a type, rebuilt only when its generation counter moves
+    (or after HISTOGRAM_MAX_AGE seconds, for changes made by other workers
+    when the cache is not shared).
+    """
+    generation = get_generation(service_type)
+    max_age = getattr(settings, 'HISTOGRAM_MAX_AGE', 300)
+    entry = _arrays.get(service_type)
+    if entry and entry[0] == generation and time.monotonic() - entry[1] < max_age:
+        return entry[2]
+
+    with _lock:
+        entry = _arrays.get(service_type)
+        if entry and entry[0] == generation and time.monotonic() - entry[1] < max_age:
+            return entry[2]
+        arrays = load_arrays(service_type)
+        _arrays[service_type] = (generation, time.monotonic(), arrays)
+        return arrays
+
+
+def histogram(service_type, field, bins=20, category=None):
+    """Histogram, summary statistics and percentiles of one numeric field"""
+    arrays = get_arrays(service_type)
+    values = arrays[field]
+    if category:
+        values = values[arrays['category'] == category]
+    values = values[~np.isnan(values)]
+
+    if not len(values):
+        return {
+            'field': field,
+            'count': 0,
+            'min': None,
+            'max': None,
+            'mean': None,
+            'percentiles': {},
+            'bins': [],
+        }
+
+    counts, edges = np.histogram(values, bins=bins)
+    percentiles = np.percentile(values, PERCENTILES)
+    return {
+        'field': field,
+        'count': int(len(values)),
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'mean': round(float(values.mean()), 2),
+        'percentiles': {f'p{p}': round(float(v), 2) for p, v in zip(PERCENTILES, percentiles)},
+        'bins': [
+            {'min': round(float(edges[i]), 2), 'max': round(float(edges[i + 1]), 2), 'count': int(count)}
+            for i, count in enumerate(counts)
+        ],
+    }
@@ -0,0 +1,62 @@
+import asyncio
+import time
+from django.core.mail import EmailMessage
+from django.core.mail.backends.smtp import EmailBackend
+from django.core.management.base import BaseCommand, CommandError
+from wedding_backend.mail import PooledSMTPBackend, close_pool
+
+
+class CountingHandler:
+    """aiosmtpd handler that accepts everything; EHLO is delayed to stand in for a TLS handshake"""
+
+    def __init__(self, handshake_ms):
+        self.handshake = handshake_ms / 1000
+        self.received = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        await asyncio.sleep(self.handshake)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return '250 OK'
+
+
+class Command(BaseCommand):
+    help = 'Email throughput: a new SMTP connection per message vs the pooled backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200)
+        parser.add_argument('--host', help='SMTP server to use instead of the built-in aiosmtpd stand-in')
+        parser.add_argument('--port', type=int, default=8025)
+        parser.add_argument('--handshake-ms', type=float, default=20, help='Simulated connection setup cost of the stand-in')
+
+    def handle(self, *args, messages=200, host=None, port=8025, handshake_ms=20, **options):
+        controller = None
+        handler = None
+        if not host:
+            try:
+                from aiosmtpd.controller import Controller
+            except ImportError:
+                raise CommandError('Install aiosmtpd for the local stand-in (pip install aiosmtpd) or pass --host')
+            handler = CountingHandler(handshake_ms)
+            controller = Controller(handler, hostname='127.0.0.1', port=port)
+            controller.start()
+            host = '127.0.0.1'
+
+        try:
+            for name, backend_class in (('per-message', EmailBackend), ('pooled', PooledSMTPBackend)):
+                started = time.perf_counter()
+                for i in range(messages):
+                    # A new backend per message, like send_mail() without a connection argument
+                    connection = backend_class(host=host, port=port, username='', password='', use_tls=False, use_ssl=False)
+                    EmailMessage(f'Bench {i}', 'body', 'bench@example.com', ['to@example.com'], connection=connection).send()
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'{name:>12}: {messages} messages in {elapsed:.2f}s, {messages / elapsed:.0f} msg/s')
+                close_pool()
+        finally:
+            if controller:
+                controller.stop()
+        if handler:
+            self.stdout.write(f'stand-in received {handler.received} messages')
@@ -0,0 +1,107 @@
+import os
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from rest_framework.test import APIRequestFactory, force_authenticate
+from services import popularity
+from services.models import Photography
+from services.views import CartView
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Multi-threaded cart adds through CartView.post (and so serialized_write) '
+        'on a scratch SQLite file: default SQLite settings vs the production profile'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--ops', type=int, default=50, help='Requests per thread')
+
+    def handle(self, *args, threads=16, ops=50, **options):
+        if not settings.SQLITE_OPTIONS:
+            raise CommandError('SQLITE_PRODUCTION_MODE is off; there is no production profile to compare.')
+        database = connections['default'].settings_dict
+        original = (database['NAME'], database['OPTIONS'])
+        try:
+            for profile, db_options in (('default', {}), ('production', settings.SQLITE_OPTIONS)):
+                with tempfile.TemporaryDirectory() as tmp:
+                    self.use_database(os.path.join(tmp, 'bench.sqlite3'), db_options)
+                    users, services = self.setup(threads)
+                    elapsed, done, errors = self.run(users, services, ops)
+                    # Counters recorded by the view belong to the scratch database
+                    popularity.drain()
+                    connections.close_all()
+                self.stdout.write(
+                    f'{profile:>10}: {done} commits, {errors} failed requests, '
+                    f'{elapsed:.2f}s, {done / elapsed:.0f} req/s'
+                )
+        finally:
+            self.use_database(*original)
+
+    def use_database(self, name, db_options):
+        # Threads open their own connections from this same settings dict
+        connections.close_all()
+        database = connections['default'].settings_dict
+        database['NAME'] = name
+        database['OPTIONS'] = db_options
+        cache.clear()
+
+    def setup(self, threads):
+        call_command('migrate', verbosity=0)
+        vendor = User.objects.create_user(username='bench-vendor', email='vendor@bench.local', password='x')
+        services = [
+            Photography.objects.create(
+                creator=vendor, name=f'Bench {n}', location='Bench', category='other', price=100 + n
+            )
+            for n in range(20)
+        ]
+        users = [
+            User.objects.create_user(username=f'bench-{n}', email=f'bench-{n}@bench.local', password='x')
+            for n in range(threads)
+        ]
+        connections.close_all()
+        return users, services
+
+    def run(self, users, services, ops):
+        factory = APIRequestFactory()
+        view = CartView.as_view()
+        counts = {'done': 0, 'errors': 0}
+        counts_lock = threading.Lock()
+
+        def worker(user):
+            done = errors = 0
+            for i in range(ops):
+                service = services[i % len(services)]
+                request = factory.post(
+                    '/services/cart/', {'content_type': 'photography', 'object_id': service.pk}, format='json'
+                )
+                force_authenticate(request, user=user)
+                try:
+                    response = view(request)
+                    if response.status_code == 201:
+                        done += 1
+                    else:
+                        errors += 1
+                except Exception:
+                    errors += 1
+            connections.close_all()
+            with counts_lock:
+                counts['done'] += done
+                counts['errors'] += errors
+
+        workers = [threading.Thread(target=worker, args=(user,)) for user in users]
+        started = time.perf_counter()
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        return time.perf_counter() - started, counts['done'], counts['errors']
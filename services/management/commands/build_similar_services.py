@@ -0,0 +1,41 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from services.models import SERVICE_MODELS
+from services.recommendations import DEFAULT_K, rebuild, rebuild_dirty
+
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed "similar services" neighbour lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', dest='service_type', help='Only rebuild one service type (e.g. venue)')
+        parser.add_argument('--k', type=int, default=DEFAULT_K, help='Neighbours to keep per service')
+        parser.add_argument('--dirty', action='store_true', help='Only rebuild types changed since their last rebuild')
+        parser.add_argument('--loop', action='store_true', help='With --dirty: keep polling as a worker')
+        parser.add_argument('--interval', type=float, default=60, help='Seconds between polls with --loop')
+
+    def handle(self, *args, service_type=None, k=DEFAULT_K, dirty=False, loop=False, interval=60, **options):
+        if dirty:
+            return self.rebuild_dirty(k, loop, interval)
+        if service_type and service_type not in SERVICE_MODELS:
+            raise CommandError(f'Unknown service type "{service_type}". Valid types: {list(SERVICE_MODELS)}')
+
+        for key in [service_type] if service_type else SERVICE_MODELS:
+            started = time.perf_counter()
+            count = rebuild(key, k)
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stdout.write(f'{key}: {count} services in {elapsed:.0f} ms')
+
+    def rebuild_dirty(self, k, loop, interval):
+        while True:
+            started = time.perf_counter()
+            rebuilt = rebuild_dirty(k)
+            if rebuilt:
+                elapsed = (time.perf_counter() - started) * 1000
+                summary = ', '.join(f'{key}: {count}' for key, count in rebuilt.items())
+                self.stdout.write(f'{summary} services in {elapsed:.0f} ms')
+            if not loop:
+                break
+            connection.close()
+            time.sleep(interval)
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.3 on 2026-10-19 09:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+        ('services', '0002_cartitem_notes_cartitem_service_date_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('service_type', models.CharField(choices=[('venue', 'Venue'), ('planning_decor', 'Planning & Decor'), ('photography', 'Photography'), ('makeup', 'Makeup'), ('bridal_wear', 'Bridal Wear'), ('groom_wear', 'Groom Wear'), ('mehandi', 'Mehandi'), ('wedding_cake', 'Wedding Cake'), ('car_rental', 'Car Rental'), ('dj', 'DJ'), ('jewelry_rental', 'Jewelry Rental'), ('catering', 'Catering')], max_length=50)),
+                ('object_id', models.PositiveIntegerField()),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('booked', 'Booked'), ('blocked', 'Blocked')], default='blocked', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='orders.order')),
+            ],
+            options={
+                'ordering': ['date'],
+                'indexes': [models.Index(fields=['service_type', 'date'], name='availability_type_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('service_type', 'object_id', 'date'), name='unique_service_availability_day')],
+            },
+        ),
+    ]
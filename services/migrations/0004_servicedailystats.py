@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-19 09:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0003_serviceavailability'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('service_type', models.CharField(choices=[('venue', 'Venue'), ('planning_decor', 'Planning & Decor'), ('photography', 'Photography'), ('makeup', 'Makeup'), ('bridal_wear', 'Bridal Wear'), ('groom_wear', 'Groom Wear'), ('mehandi', 'Mehandi'), ('wedding_cake', 'Wedding Cake'), ('car_rental', 'Car Rental'), ('dj', 'DJ'), ('jewelry_rental', 'Jewelry Rental'), ('catering', 'Catering')], max_length=50)),
+                ('object_id', models.PositiveIntegerField()),
+                ('date', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('cart_adds', models.PositiveIntegerField(default=0)),
+                ('wishlist_adds', models.PositiveIntegerField(default=0)),
+                ('bookings', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['service_type', 'date'], name='daily_stats_type_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('service_type', 'object_id', 'date'), name='unique_service_daily_stats')],
+            },
+        ),
+    ]
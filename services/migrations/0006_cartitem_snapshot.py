@@ -0,0 +1,82 @@
+# Generated by Django 5.2.3 on 2026-10-19 09:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+SERVICE_MODEL_NAMES = {
+    'venue': 'Venue',
+    'planning_decor': 'PlanningAndDecor',
+    'photography': 'Photography',
+    'makeup': 'Makeup',
+    'bridal_wear': 'BridalWear',
+    'groom_wear': 'GroomWear',
+    'mehandi': 'Mehandi',
+    'wedding_cake': 'WeddingCake',
+    'car_rental': 'CarRental',
+    'dj': 'DJ',
+    'jewelry_rental': 'JewelryRental',
+    'catering': 'Catering',
+}
+
+
+def backfill_snapshots(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    CartItem = apps.get_model('services', 'CartItem')
+    items = list(CartItem.objects.using(db_alias).all())
+    ids_by_type = {}
+    for item in items:
+        ids_by_type.setdefault(item.content_type, set()).add(item.object_id)
+
+    services = {}
+    for content_type, ids in ids_by_type.items():
+        model_name = SERVICE_MODEL_NAMES.get(content_type)
+        if model_name:
+            services[content_type] = apps.get_model('services', model_name).objects.using(db_alias).in_bulk(ids)
+
+    to_update = []
+    for item in items:
+        service = services.get(item.content_type, {}).get(item.object_id)
+        if not service:
+            continue
+        for price_field in ('price', 'price_range_min', 'price_per_plate'):
+            if hasattr(service, price_field):
+                item.unit_price = getattr(service, price_field)
+                break
+        item.service_name = service.name
+        item.vendor_id = service.creator_id
+        to_update.append(item)
+    CartItem.objects.using(db_alias).bulk_update(to_update, ['unit_price', 'service_name', 'vendor'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0005_similarservices'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cartitem',
+            name='service_name',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='cartitem',
+            name='snapshot_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cartitem',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='cartitem',
+            name='vendor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def move_items_to_fk(apps, schema_editor):
+    """Point each item at its cart, merging duplicate lines and dropping orphans"""
+    db_alias = schema_editor.connection.alias
+    Cart = apps.get_model('services', 'Cart')
+    CartItem = apps.get_model('services', 'CartItem')
+    Through = Cart.items.through
+
+    lines = {}
+    to_update = []
+    to_delete = set(CartItem.objects.using(db_alias).values_list('pk', flat=True))
+    links = Through.objects.using(db_alias).order_by('cart_id', 'cartitem_id').values_list('cart_id', 'cartitem_id')
+    items = CartItem.objects.using(db_alias).in_bulk()
+
+    for cart_id, item_id in links:
+        item = items[item_id]
+        if item.cart_id is not None:
+            # Item shared between carts; it stays with the first one
+            continue
+        key = (cart_id, item.content_type, item.object_id)
+        first = lines.get(key)
+        if first:
+            first.quantity += item.quantity
+            continue
+        item.cart_id = cart_id
+        lines[key] = item
+        to_update.append(item)
+        to_delete.discard(item_id)
+
+    CartItem.objects.using(db_alias).bulk_update(to_update, ['cart', 'quantity'], batch_size=500)
+    CartItem.objects.using(db_alias).filter(pk__in=to_delete).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0006_cartitem_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cartitem',
+            name='cart',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='services.cart'),
+        ),
+        migrations.RunPython(move_items_to_fk, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='cart',
+            name='items',
+        ),
+        migrations.AlterField(
+            model_name='cartitem',
+            name='cart',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='services.cart'),
+        ),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'content_type', 'object_id'), name='unique_cart_item_service'),
+        ),
+    ]
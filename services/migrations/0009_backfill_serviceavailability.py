@@ -0,0 +1,43 @@
+from django.db import migrations
+
+
+def backfill_bookings(apps, schema_editor):
+    """
+    Book the service dates of orders placed before 0003, so the calendar and
+    conflict checks see them. Cancelled orders are skipped; when two orders
+    share a day the older one keeps it, and days already taken are left as
+    they are.
+    """
+    db_alias = schema_editor.connection.alias
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    ServiceAvailability = apps.get_model('services', 'ServiceAvailability')
+
+    items = (
+        OrderItem.objects.using(db_alias)
+        .filter(service_date__isnull=False)
+        .exclude(order__order_status='cancelled')
+        .order_by('order__created_at', 'order_id', 'pk')
+        .values_list('service_type', 'service_id', 'service_date', 'order_id')
+    )
+    bookings = {}
+    for service_type, service_id, day, order_id in items:
+        bookings.setdefault((service_type, service_id, day), order_id)
+
+    ServiceAvailability.objects.using(db_alias).bulk_create([
+        ServiceAvailability(
+            service_type=service_type, object_id=service_id, date=day, status='booked', order_id=order_id
+        )
+        for (service_type, service_id, day), order_id in bookings.items()
+    ], batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+        ('services', '0008_similarservicesdirty'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_bookings, migrations.RunPython.noop),
+    ]
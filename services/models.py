@@ -1,6 +1,9 @@
 from django.db import models
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils.functional import cached_property
 
 User = get_user_model()
 
@@ -282,6 +285,36 @@ class Catering(BaseServiceModel):
     def __str__(self):
         return f"{self.name} - {self.get_category_display()}"
 
+# Service type key (as used by cart items, orders and search) -> model
+SERVICE_MODELS = {
+    'venue': Venue,
+    'planning_decor': PlanningAndDecor,
+    'photography': Photography,
+    'makeup': Makeup,
+    'bridal_wear': BridalWear,
+    'groom_wear': GroomWear,
+    'mehandi': Mehandi,
+    'wedding_cake': WeddingCake,
+    'car_rental': CarRental,
+    'dj': DJ,
+    'jewelry_rental': JewelryRental,
+    'catering': Catering,
+}
+
+def get_service_type(model_class):
+    """Reverse lookup of SERVICE_MODELS"""
+    for service_type, service_model in SERVICE_MODELS.items():
+        if service_model is model_class:
+            return service_type
+    return None
+
+def get_price_field(model_class):
+    """Name of the field holding a service's base (unit) price"""
+    for field in ('price', 'price_range_min', 'price_per_plate'):
+        if hasattr(model_class, field):
+            return field
+    return None
+
 # Wishlist and Cart models remain the same as your original
 class Wishlist(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -304,15 +337,26 @@ class Wishlist(models.Model):
 
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
-    items = models.ManyToManyField('CartItem')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Cart for {self.user.email}"
     
+    @cached_property
+    def resolved_items(self):
+        """Cart items with their services loaded in one query per content type"""
+        return prefetch_cart_services(self.items.all())
+    
     def total_price(self):
-        return sum(item.total_price() for item in self.items.all())
+        if 'resolved_items' in self.__dict__:
+            return sum((item.total_price() for item in self.resolved_items), 0)
+        return self.items.aggregate(
+            total=Coalesce(
+                Sum(F('unit_price') * F('quantity'), output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+                Value(0), output_field=models.DecimalField(max_digits=12, decimal_places=2)
+            )
+        )['total']
     
     def item_count(self):
         return self.items.count()
@@ -324,7 +368,7 @@ class Cart(models.Model):
     def get_items_grouped_by_vendor(self):
         """Group cart items by vendor for order processing"""
         vendor_items = {}
-        for item in self.items.all():
+        for item in self.resolved_items:
             service_obj = item.get_service_object()
             if service_obj and service_obj.creator:
                 vendor_email = service_obj.creator.email
@@ -356,6 +400,7 @@ class CartItem(models.Model):
         ('catering', 'Catering'),
     ]
     
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
     content_type = models.CharField(max_length=50, choices=CONTENT_TYPE_CHOICES)
     object_id = models.PositiveIntegerField()
     quantity = models.PositiveIntegerField(default=1)
@@ -365,65 +410,44 @@ class CartItem(models.Model):
     service_time = models.TimeField(null=True, blank=True)
     notes = models.TextField(blank=True, null=True)
     
+    # Denormalized from the service; refreshed by a single UPDATE whenever the
+    # service is saved (services/signals.py), with snapshot_version bumped
+    service_name = models.CharField(max_length=200, blank=True)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    vendor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    snapshot_version = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            # One line per service per cart; adding again bumps the quantity
+            models.UniqueConstraint(
+                fields=['cart', 'content_type', 'object_id'],
+                name='unique_cart_item_service'
+            ),
+        ]
+    
     def __str__(self):
         return f"{self.quantity} x {self.content_type} (ID: {self.object_id})"
     
     def total_price(self):
-        model_map = {
-            'venue': Venue,
-            'planning_decor': PlanningAndDecor,
-            'photography': Photography,
-            'makeup': Makeup,
-            'bridal_wear': BridalWear,
-            'groom_wear': GroomWear,
-            'mehandi': Mehandi,
-            'wedding_cake': WeddingCake,
-            'car_rental': CarRental,
-            'dj': DJ,
-            'jewelry_rental': JewelryRental,
-            'catering': Catering,
-        }
-        
-        model_class = model_map.get(self.content_type)
-        if not model_class:
-            return 0
-        
-        try:
-            obj = model_class.objects.get(pk=self.object_id)
-            if hasattr(obj, 'price'):
-                return obj.price * self.quantity
-            elif hasattr(obj, 'price_range_min'):
-                return obj.price_range_min * self.quantity
-            elif hasattr(obj, 'price_per_plate'):
-                return obj.price_per_plate * self.quantity
-            return 0
-        except model_class.DoesNotExist:
-            return 0
+        return self.get_unit_price() * self.quantity
+    
+    def set_snapshot(self, service_name, unit_price, vendor_id):
+        self.service_name = service_name
+        self.unit_price = unit_price
+        self.vendor_id = vendor_id
+    
+    def set_cached_service(self, details, live_unit_price):
+        """Use service data from the snapshot cache (cache backend) instead of loading the row"""
+        self._service_details = details
+        self._live_unit_price = live_unit_price
     
     def get_service_object(self):
-        """Get the actual service object"""
-        model_map = {
-            'venue': Venue,
-            'planning_decor': PlanningAndDecor,
-            'photography': Photography,
-            'makeup': Makeup,
-            'bridal_wear': BridalWear,
-            'groom_wear': GroomWear,
-            'mehandi': Mehandi,
-            'wedding_cake': WeddingCake,
-            'car_rental': CarRental,
-            'dj': DJ,
-            'jewelry_rental': JewelryRental,
-            'catering': Catering,
-        }
-        
-        model_class = model_map.get(self.content_type)
-        if model_class:
-            try:
-                return model_class.objects.get(pk=self.object_id)
-            except model_class.DoesNotExist:
-                return None
-        return None
+        """Get the actual service object (from the prefetched identity map when available)"""
+        if not hasattr(self, '_service_cache'):
+            from .resolver import resolve
+            self._service_cache = resolve(self.content_type, self.object_id)
+        return self._service_cache
     
     def get_service_details(self):
         """Get service details for display"""
@@ -438,13 +462,135 @@ class CartItem(models.Model):
         return None
     
     def get_unit_price(self):
-        """Get unit price of the service"""
+        """Get unit price of the service (snapshot taken when added or last refreshed)"""
+        return self.unit_price
+    
+    def get_live_unit_price(self):
+        """Current price of the service (None if it no longer exists)"""
+        if hasattr(self, '_live_unit_price'):
+            return self._live_unit_price
+        from .resolver import unit_price
         service_obj = self.get_service_object()
-        if service_obj:
-            if hasattr(service_obj, 'price'):
-                return service_obj.price
-            elif hasattr(service_obj, 'price_range_min'):
-                return service_obj.price_range_min
-            elif hasattr(service_obj, 'price_per_plate'):
-                return service_obj.price_per_plate
-        return 0
\ No newline at end of file
+        return unit_price(service_obj) if service_obj else None
+
+def prefetch_cart_services(items):
+    """
+    Resolve the services behind a list of cart items with one query per
+    content type (creator joined in). Every item referencing the same service
+    shares one instance. Returns the items as a list.
+    """
+    from .resolver import ServiceRef, resolve_many
+    items = list(items)
+    services = resolve_many((item.content_type, item.object_id) for item in items)
+    for item in items:
+        item._service_cache = services.get(ServiceRef(item.content_type, item.object_id))
+    return items
+
+
+def fill_cart_snapshots(items):
+    """Copy name, unit price and vendor onto new cart items from the service rows"""
+    from .resolver import ServiceRef, load_snapshots
+    snapshots = load_snapshots((item.content_type, item.object_id) for item in items)
+    for item in items:
+        snapshot = snapshots.get(ServiceRef(item.content_type, int(item.object_id)))
+        if snapshot:
+            item.set_snapshot(snapshot['name'], snapshot['unit_price'], snapshot['creator_id'])
+    return items
+
+
+class ServiceAvailability(models.Model):
+    """
+    One row per service per unavailable day. The unique constraint doubles as
+    the booking lock: claiming a day is a plain INSERT that fails on conflict.
+    """
+    STATUS_CHOICES = [
+        ('booked', 'Booked'),
+        ('blocked', 'Blocked'),
+    ]
+
+    service_type = models.CharField(max_length=50, choices=CartItem.CONTENT_TYPE_CHOICES)
+    object_id = models.PositiveIntegerField()
+    date = models.DateField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='blocked')
+    order = models.ForeignKey(
+        'orders.Order',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='bookings'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['service_type', 'object_id', 'date'],
+                name='unique_service_availability_day'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['service_type', 'date'], name='availability_type_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.service_type} #{self.object_id} {self.status} on {self.date}"
+
+
+class ServiceDailyStats(models.Model):
+    """Per-service daily engagement counters, merged in from the popularity buffer"""
+    service_type = models.CharField(max_length=50, choices=CartItem.CONTENT_TYPE_CHOICES)
+    object_id = models.PositiveIntegerField()
+    date = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+    cart_adds = models.PositiveIntegerField(default=0)
+    wishlist_adds = models.PositiveIntegerField(default=0)
+    bookings = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['service_type', 'object_id', 'date'],
+                name='unique_service_daily_stats'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['service_type', 'date'], name='daily_stats_type_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.service_type} #{self.object_id} stats for {self.date}"
+
+
+class SimilarServices(models.Model):
+    """Precomputed nearest neighbours of a service within its own type"""
+    service_type = models.CharField(max_length=50, choices=CartItem.CONTENT_TYPE_CHOICES)
+    object_id = models.PositiveIntegerField()
+    neighbours = models.JSONField(default=list)
+    scores = models.JSONField(default=list)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'similar services'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['service_type', 'object_id'],
+                name='unique_similar_services'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Similar to {self.service_type} #{self.object_id}"
+
+
+class SimilarServicesDirty(models.Model):
+    """
+    A service type whose neighbour lists are out of date. Saves and deletes
+    only (re)mark the type; `build_similar_services --dirty` rebuilds it in
+    one batch.
+    """
+    service_type = models.CharField(max_length=50, choices=CartItem.CONTENT_TYPE_CHOICES, unique=True)
+    marked_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.service_type} marked at {self.marked_at}"
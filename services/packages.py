@@ -0,0 +1,214 @@
+import heapq
+import time
+from decimal import Decimal
+from django.conf import settings
+from .models import SERVICE_MODELS, get_price_field
+
+# Candidates kept per service type, by rating and by price
+CANDIDATE_CAP = 25
+MAX_RESULTS = 20
+# Largest budget accepted: what an order total (12 digits, 2 decimals) can hold
+MAX_BUDGET = Decimal('9999999999.99')
+
+# Rating sums are compared rounded to this many places, so float noise from
+# the addition order can't turn a tie (broken by cost) into a win
+RATING_PLACES = 9
+# Nodes visited between clock checks
+CLOCK_EVERY = 256
+
+
+class Candidate:
+    __slots__ = ('service_type', 'object_id', 'name', 'rating', 'cost', 'unit_price', 'quantity')
+
+    def __init__(self, service_type, object_id, name, rating, unit_price, quantity):
+        self.service_type = service_type
+        self.object_id = object_id
+        self.name = name
+        self.rating = rating or 0.0
+        self.unit_price = unit_price or Decimal('0')
+        self.quantity = quantity
+        self.cost = self.unit_price * quantity
+
+    def as_dict(self):
+        return {
+            'content_type': self.service_type,
+            'object_id': self.object_id,
+            'name': self.name,
+            'rating': self.rating,
+            'unit_price': self.unit_price,
+            'quantity': self.quantity,
+            'cost': self.cost,
+        }
+
+
+def load_candidates(service_type, budget, guests=None, location=None, category=None, cap=CANDIDATE_CAP):
+    """
+    Fetch the best-rated and the cheapest services of a type that fit the
+    budget on their own (two LIMIT queries), so the search space stays small
+    whatever the catalogue size.
+    """
+    model_class = SERVICE_MODELS[service_type]
+    price_field = get_price_field(model_class)
+    queryset = model_class.objects.all()
+
+    if location:
+        queryset = queryset.filter(location__icontains=location)
+    if category:
+        queryset = queryset.filter(category=category)
+
+    quantity = 1
+    if guests:
+        if service_type == 'venue':
+            queryset = queryset.filter(capacity__gte=guests)
+        elif service_type == 'catering':
+            queryset = queryset.filter(min_guests__lte=guests)
+            quantity = guests
+
+    queryset = queryset.filter(**{f'{price_field}__lte': Decimal(budget) / quantity})
+    columns = ('pk', 'name', 'rating', price_field)
+
+    rows = {}
+    for ordering in (('-rating', price_field), (price_field, '-rating')):
+        for row in queryset.order_by(*ordering).values_list(*columns)[:cap]:
+            rows[row[0]] = row
+
+    return [
+        Candidate(service_type, pk, name, rating, price, quantity)
+        for pk, name, rating, price in rows.values()
+    ]
+
+
+def prune_dominated(candidates, top_n):
+    """
+    Drop candidates that at least top_n others beat on both rating and cost:
+    swapping in any of those dominators gives a better package, so they can
+    never appear in the top_n results.
+    """
+    candidates = sorted(candidates, key=lambda c: (-c.rating, c.cost))
+    kept = []
+    for i, candidate in enumerate(candidates):
+        dominators = 0
+        for other in candidates[:i]:
+            if other.cost <= candidate.cost:
+                dominators += 1
+                if dominators >= top_n:
+                    break
+        if dominators < top_n:
+            kept.append(candidate)
+    return kept
+
+
+class SearchBudgetExceeded(Exception):
+    """Stops search_packages once its node or time budget is spent"""
+
+
+def search_packages(candidate_lists, budget, top_n, max_nodes=None, time_budget=None):
+    """
+    Branch-and-bound over one candidate per type. A branch is cut when even
+    the cheapest completion busts the budget, or when even the best-rated
+    completion cannot beat the current top_n (on rating, or on cost when the
+    ratings tie).
+
+    Returns (packages, complete): (rating, cost, items) tuples, best first.
+    Heavily tied ratings can still leave an exponential tree, so the search
+    stops after max_nodes visits or time_budget seconds; complete is then
+    False and packages are the best found so far.
+    """
+    budget = Decimal(budget)
+    # Fewest candidates first keeps the tree narrow near the root
+    lists = sorted(
+        (sorted(c, key=lambda c: (-c.rating, c.cost)) for c in candidate_lists),
+        key=len
+    )
+    depth = len(lists)
+
+    # Bounds for the remaining levels: cheapest cost and best rating
+    min_cost_after = [Decimal('0')] * (depth + 1)
+    max_rating_after = [0.0] * (depth + 1)
+    for level in range(depth - 1, -1, -1):
+        min_cost_after[level] = min_cost_after[level + 1] + min(c.cost for c in lists[level])
+        max_rating_after[level] = max_rating_after[level + 1] + lists[level][0].rating
+
+    # Min-heap of (rating, -cost, counter, items) holding the current best top_n
+    best = []
+    counter = 0
+    nodes = 0
+    deadline = time.monotonic() + time_budget if time_budget else None
+
+    def visit(level, rating, cost, chosen):
+        nonlocal counter, nodes
+        nodes += 1
+        if max_nodes and nodes > max_nodes:
+            raise SearchBudgetExceeded
+        if deadline and nodes % CLOCK_EVERY == 0 and time.monotonic() > deadline:
+            raise SearchBudgetExceeded
+
+        if level == depth:
+            entry = (round(rating, RATING_PLACES), -cost, counter, list(chosen))
+            counter += 1
+            if len(best) < top_n:
+                heapq.heappush(best, entry)
+            elif (rating, -cost) > best[0][:2]:
+                heapq.heapreplace(best, entry)
+            return
+
+        for candidate in lists[level]:
+            new_cost = cost + candidate.cost
+            cheapest = new_cost + min_cost_after[level + 1]
+            if cheapest > budget:
+                continue
+            if len(best) == top_n:
+                bound = round(rating + candidate.rating + max_rating_after[level + 1], RATING_PLACES)
+                worst_rating, worst_neg_cost = best[0][:2]
+                if bound < worst_rating:
+                    # Candidates are sorted by rating, so the rest can only be worse
+                    break
+                if bound == worst_rating and cheapest >= -worst_neg_cost:
+                    # At best a tie on rating, and not cheaper
+                    continue
+            chosen.append(candidate)
+            visit(level + 1, rating + candidate.rating, new_cost, chosen)
+            chosen.pop()
+
+    try:
+        visit(0, 0.0, Decimal('0'), [])
+        complete = True
+    except SearchBudgetExceeded:
+        complete = False
+    packages = [(rating, -neg_cost, items) for rating, neg_cost, _, items in sorted(best, reverse=True)]
+    return packages, complete
+
+
+def build_packages(service_types, budget, guests=None, location=None, categories=None, top_n=5):
+    """
+    Top-N combinations (one service per type) by rating within budget.
+    Returns (packages, complete); see search_packages for complete.
+    """
+    categories = categories or {}
+    top_n = max(1, min(top_n, MAX_RESULTS))
+
+    candidate_lists = []
+    for service_type in service_types:
+        candidates = load_candidates(
+            service_type, budget, guests=guests, location=location,
+            category=categories.get(service_type)
+        )
+        if not candidates:
+            return [], True
+        candidate_lists.append(prune_dominated(candidates, top_n))
+
+    results, complete = search_packages(
+        candidate_lists, budget, top_n,
+        max_nodes=getattr(settings, 'PACKAGE_SEARCH_MAX_NODES', 200_000),
+        time_budget=getattr(settings, 'PACKAGE_SEARCH_TIME_BUDGET', 0.2),
+    )
+    order = {service_type: i for i, service_type in enumerate(service_types)}
+    packages = []
+    for rating, cost, items in results:
+        items = sorted(items, key=lambda c: order[c.service_type])
+        packages.append({
+            'total_cost': cost,
+            'average_rating': round(rating / len(items), 2),
+            'items': [item.as_dict() for item in items],
+        })
+    return packages, complete
@@ -0,0 +1,135 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import ServiceDailyStats
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ('views', 'cart_adds', 'wishlist_adds', 'bookings')
+
+# Relative weight of each signal in the popularity score
+SCORE_WEIGHTS = {
+    'views': 1,
+    'wishlist_adds': 3,
+    'cart_adds': 5,
+    'bookings': 10,
+}
+
+# (service_type, object_id, date, field) -> pending increment
+_buffer = Counter()
+_lock = threading.Lock()
+_flusher = None
+
+
+def record(service_type, object_id, field, amount=1):
+    """
+    Count an engagement event. This only touches an in-process counter; the
+    background flusher merges it into ServiceDailyStats.
+    """
+    key = (service_type, int(object_id), timezone.now().date(), field)
+    with _lock:
+        _buffer[key] += amount
+    _ensure_flusher()
+
+
+def drain():
+    """Swap out the buffer and return its contents"""
+    global _buffer
+    with _lock:
+        pending, _buffer = _buffer, Counter()
+    return pending
+
+
+def flush():
+    """Merge buffered counts into ServiceDailyStats with one batched upsert"""
+    pending = drain()
+    if not pending:
+        return 0
+
+    rows = {}
+    for (service_type, object_id, day, field), amount in pending.items():
+        row = rows.setdefault((service_type, object_id, day), dict.fromkeys(COUNTER_FIELDS, 0))
+        row[field] += amount
+
+    qn = connection.ops.quote_name
+    table = qn(ServiceDailyStats._meta.db_table)
+    columns = ('service_type', 'object_id', 'date') + COUNTER_FIELDS
+    sql = (
+        f"INSERT INTO {table} ({', '.join(qn(c) for c in columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON CONFLICT ({qn('service_type')}, {qn('object_id')}, {qn('date')}) DO UPDATE SET "
+        + ', '.join(f"{qn(c)} = {table}.{qn(c)} + excluded.{qn(c)}" for c in COUNTER_FIELDS)
+    )
+    params = [
+        (service_type, object_id, day) + tuple(counts[f] for f in COUNTER_FIELDS)
+        for (service_type, object_id, day), counts in rows.items()
+    ]
+
+    try:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.executemany(sql, params)
+    except Exception as e:
+        # Put the counts back so the next flush retries them
+        with _lock:
+            _buffer.update(pending)
+        logger.error(f"Failed to flush popularity counters: {str(e)}")
+        return 0
+    return len(params)
+
+
+def _flush_loop(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            flush()
+        finally:
+            connection.close()
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None:
+        return
+    interval = getattr(settings, 'POPULARITY_FLUSH_INTERVAL', 30)
+    if not interval:
+        return
+    with _lock:
+        if _flusher is None:
+            _flusher = threading.Thread(
+                target=_flush_loop, args=(interval,), name='popularity-flusher', daemon=True
+            )
+            _flusher.start()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        flush()
+    except Exception:
+        pass
+
+
+def annotate_popularity(queryset, service_type, days=None):
+    """Annotate a service queryset with its weighted engagement over the last N days"""
+    days = days or getattr(settings, 'POPULARITY_WINDOW_DAYS', 30)
+    since = timezone.now().date() - timedelta(days=days)
+
+    score = sum(F(field) * Value(weight) for field, weight in SCORE_WEIGHTS.items())
+    scores = ServiceDailyStats.objects.filter(
+        service_type=service_type,
+        object_id=OuterRef('pk'),
+        date__gte=since
+    ).values('object_id').annotate(score=Sum(score)).values('score')
+
+    return queryset.annotate(
+        popularity=Coalesce(Subquery(scores, output_field=IntegerField()), Value(0))
+    )
@@ -0,0 +1,147 @@
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+from .models import SERVICE_MODELS, SimilarServices, SimilarServicesDirty, get_price_field
+
+DEFAULT_K = 10
+BATCH_SIZE = 1024
+
+# Relative weight of each feature group in the distance metric
+FEATURE_WEIGHTS = {
+    'category': 1.0,
+    'location': 1.0,
+    'price': 0.75,
+    'rating': 0.5,
+}
+
+
+def location_tokens(location):
+    """'Andheri West, Mumbai' -> {'andheri west', 'mumbai'}"""
+    return {part.strip().lower() for part in (location or '').split(',') if part.strip()}
+
+
+def build_features(service_type):
+    """
+    Load every service of a type in one query and encode it as a row of a
+    float32 matrix: one-hot category, multi-hot location tokens, standardized
+    log price and scaled rating. Returns (ids, matrix).
+    """
+    model_class = SERVICE_MODELS[service_type]
+    price_field = get_price_field(model_class)
+    rows = list(model_class.objects.values_list('pk', 'category', 'location', price_field, 'rating'))
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+
+    ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+
+    categories = {key: i for i, (key, _) in enumerate(model_class.CATEGORY_CHOICES)}
+    category = np.zeros((len(rows), len(categories)), dtype=np.float32)
+    category[np.arange(len(rows)), [categories.get(r[1], len(categories) - 1) for r in rows]] = 1.0
+
+    tokens = [location_tokens(r[2]) for r in rows]
+    vocabulary = {t: i for i, t in enumerate(sorted(set().union(*tokens)))}
+    location = np.zeros((len(rows), max(len(vocabulary), 1)), dtype=np.float32)
+    for i, row_tokens in enumerate(tokens):
+        if row_tokens:
+            location[i, [vocabulary[t] for t in row_tokens]] = 1.0 / np.sqrt(len(row_tokens))
+
+    price = np.log1p(np.array([float(r[3] or 0) for r in rows], dtype=np.float32))
+    price = (price - price.mean()) / (price.std() or 1.0)
+    rating = np.array([r[4] or 0.0 for r in rows], dtype=np.float32) / 5.0
+
+    matrix = np.hstack([
+        category * FEATURE_WEIGHTS['category'],
+        location * FEATURE_WEIGHTS['location'],
+        price[:, None] * FEATURE_WEIGHTS['price'],
+        rating[:, None] * FEATURE_WEIGHTS['rating'],
+    ])
+    return ids, matrix
+
+
+def nearest_neighbours(matrix, rows, k=DEFAULT_K, batch_size=BATCH_SIZE):
+    """
+    Top-k neighbours (by squared euclidean distance) for the given row
+    indices, computed in batches of matrix products. Returns (indices, scores)
+    arrays of shape (len(rows), k'), best first; scores are 1 / (1 + distance).
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    n = matrix.shape[0]
+    k = min(k, n - 1)
+    if k <= 0 or not len(rows):
+        return np.empty((len(rows), 0), dtype=np.int64), np.empty((len(rows), 0), dtype=np.float32)
+
+    norms = np.einsum('ij,ij->i', matrix, matrix)
+    all_indices = np.empty((len(rows), k), dtype=np.int64)
+    all_scores = np.empty((len(rows), k), dtype=np.float32)
+
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        distances = norms[batch, None] + norms[None, :] - 2.0 * (matrix[batch] @ matrix.T)
+        np.maximum(distances, 0.0, out=distances)
+        distances[np.arange(len(batch)), batch] = np.inf
+
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        top_distances = np.take_along_axis(distances, top, axis=1)
+        order = np.argsort(top_distances, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        top_distances = np.take_along_axis(top_distances, order, axis=1)
+
+        all_indices[start:start + len(batch)] = top
+        all_scores[start:start + len(batch)] = 1.0 / (1.0 + top_distances)
+
+    return all_indices, all_scores
+
+
+def _save(service_type, ids, rows, indices, scores):
+    """Upsert neighbour lists for the given row indices"""
+    SimilarServices.objects.bulk_create(
+        [
+            SimilarServices(
+                service_type=service_type,
+                object_id=int(ids[row]),
+                neighbours=ids[indices[i]].tolist(),
+                scores=[round(float(s), 4) for s in scores[i]],
+            )
+            for i, row in enumerate(rows)
+        ],
+        update_conflicts=True,
+        unique_fields=['service_type', 'object_id'],
+        update_fields=['neighbours', 'scores', 'computed_at'],
+        batch_size=500,
+    )
+
+
+def rebuild(service_type, k=DEFAULT_K):
+    """Recompute neighbour lists for every service of a type"""
+    ids, matrix = build_features(service_type)
+    rows = np.arange(len(ids))
+    indices, scores = nearest_neighbours(matrix, rows, k)
+
+    with transaction.atomic():
+        SimilarServices.objects.filter(service_type=service_type).exclude(object_id__in=ids.tolist()).delete()
+        if len(ids):
+            _save(service_type, ids, rows, indices, scores)
+    return len(ids)
+
+
+def mark_dirty(service_type):
+    """Queue a type for the next batch rebuild (one upsert; safe to call on every save)"""
+    SimilarServicesDirty.objects.bulk_create(
+        [SimilarServicesDirty(service_type=service_type, marked_at=timezone.now())],
+        update_conflicts=True,
+        unique_fields=['service_type'],
+        update_fields=['marked_at'],
+    )
+
+
+def rebuild_dirty(k=DEFAULT_K):
+    """
+    Rebuild every marked type in full, which also re-standardizes prices for
+    all of its services. Returns {service_type: services rebuilt}.
+    """
+    rebuilt = {}
+    for service_type, marked_at in SimilarServicesDirty.objects.values_list('service_type', 'marked_at'):
+        rebuilt[service_type] = rebuild(service_type, k)
+        # A save during the rebuild moved marked_at forward; that mark stays
+        SimilarServicesDirty.objects.filter(service_type=service_type, marked_at__lte=marked_at).delete()
+    return rebuilt
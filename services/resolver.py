@@ -0,0 +1,171 @@
+"""
+Single place to turn a (service_type, object_id) reference into a service.
+
+resolve()/resolve_many() return model instances (creator joined in).
+get_snapshot()/get_snapshots() return compact dicts (name, unit price,
+creator id/email/name) and get_details() the serialized service from the
+shared cache, keyed by a per-object version
+that is bumped whenever the service is saved or deleted, so every worker
+drops stale entries at once without a delete fan-out.
+
+That only holds with a cache shared by all workers (CACHE_BACKEND); with the
+per-process LocMemCache default another worker keeps serving its copy for up
+to SERVICE_SNAPSHOT_TTL (`check --deploy` warns about it). Cached snapshots
+are therefore never used to price orders: place_order reads the service rows
+(resolve_many()/load_snapshots()).
+"""
+import time
+from collections import namedtuple
+from django.conf import settings
+from django.core.cache import cache
+from .models import SERVICE_MODELS, get_price_field
+
+ServiceRef = namedtuple('ServiceRef', ['service_type', 'object_id'])
+
+# Cached marker for references that don't exist (distinct from a cache miss)
+MISSING = 'missing'
+
+
+def get_model(service_type):
+    return SERVICE_MODELS.get(service_type)
+
+
+def resolve(service_type, object_id):
+    """One service instance, or None"""
+    model_class = get_model(service_type)
+    if not model_class:
+        return None
+    return model_class.objects.select_related('creator').filter(pk=object_id).first()
+
+
+def resolve_many(refs):
+    """{ServiceRef: instance} for every ref that exists, one query per type"""
+    ids_by_type = {}
+    for service_type, object_id in refs:
+        ids_by_type.setdefault(service_type, set()).add(int(object_id))
+
+    resolved = {}
+    for service_type, ids in ids_by_type.items():
+        model_class = get_model(service_type)
+        if not model_class:
+            continue
+        for pk, obj in model_class.objects.select_related('creator').in_bulk(ids).items():
+            resolved[ServiceRef(service_type, pk)] = obj
+    return resolved
+
+
+def unit_price(service_obj):
+    """Base price of a service instance (price, price_range_min or price_per_plate)"""
+    price_field = get_price_field(type(service_obj))
+    return getattr(service_obj, price_field) if price_field else 0
+
+
+def make_snapshot(service_type, service_obj):
+    creator = service_obj.creator
+    return {
+        'service_type': service_type,
+        'object_id': service_obj.pk,
+        'name': service_obj.name,
+        'unit_price': unit_price(service_obj),
+        'creator_id': creator.pk if creator else None,
+        'creator_email': creator.email if creator else '',
+        'creator_name': creator.get_full_name() if creator else '',
+    }
+
+
+def load_snapshots(refs):
+    """{ServiceRef: snapshot} read from the database (one query per type), bypassing the cache"""
+    return {
+        ref: make_snapshot(ref.service_type, obj)
+        for ref, obj in resolve_many(refs).items()
+    }
+
+
+def _version_key(ref):
+    return f"service_version_{ref.service_type}_{ref.object_id}"
+
+
+def _versioned_key(prefix, ref, version):
+    return f"{prefix}_{ref.service_type}_{ref.object_id}_{version}"
+
+
+def get_versions(refs):
+    """Current version per ref; missing keys start at a timestamp so an
+    evicted counter never comes back at a previously used value"""
+    keys = {ref: _version_key(ref) for ref in refs}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for ref, key in keys.items():
+        if key not in found:
+            cache.add(key, time.time_ns() // 1000, None)
+            found[key] = cache.get(key)
+        versions[ref] = found[key]
+    return versions
+
+
+def invalidate(service_type, object_id):
+    """Bump a service's version; every cached snapshot of it becomes unreachable"""
+    key = _version_key(ServiceRef(service_type, int(object_id)))
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns() // 1000, None)
+
+
+def _get_versioned(refs, prefix, load):
+    """
+    {ServiceRef: value or None} cached under each ref's current version. Two
+    cache round trips on a warm cache; misses are loaded with load(refs)
+    (one query per type) and written back.
+    """
+    refs = {ServiceRef(service_type, int(object_id)) for service_type, object_id in refs}
+    if not refs:
+        return {}
+
+    versions = get_versions(refs)
+    keys = {ref: _versioned_key(prefix, ref, versions[ref]) for ref in refs}
+    cached = cache.get_many(keys.values())
+
+    values = {}
+    misses = []
+    for ref, key in keys.items():
+        if key in cached:
+            values[ref] = None if cached[key] == MISSING else cached[key]
+        else:
+            misses.append(ref)
+
+    if misses:
+        loaded = load(misses)
+        to_cache = {}
+        for ref in misses:
+            values[ref] = loaded.get(ref)
+            to_cache[keys[ref]] = values[ref] or MISSING
+        cache.set_many(to_cache, getattr(settings, 'SERVICE_SNAPSHOT_TTL', 3600))
+
+    return values
+
+
+def get_snapshots(refs):
+    """{ServiceRef: snapshot or None}"""
+    return _get_versioned(refs, 'service_snapshot', load_snapshots)
+
+
+def load_details(refs):
+    """{ServiceRef: service serialized with its SERVICE_SERIALIZERS entry}, read from the database"""
+    from .serializers import SERVICE_SERIALIZERS
+    return {
+        ref: dict(SERVICE_SERIALIZERS[ref.service_type](obj).data)
+        for ref, obj in resolve_many(refs).items()
+        if ref.service_type in SERVICE_SERIALIZERS
+    }
+
+
+def get_details(refs):
+    """{ServiceRef: serialized service or None} (e.g. cart item_details), cached like snapshots"""
+    return _get_versioned(refs, 'service_details', load_details)
+
+
+def get_snapshot(service_type, object_id):
+    if not get_model(service_type):
+        return None
+    return get_snapshots([(service_type, object_id)]).get(ServiceRef(service_type, int(object_id)))
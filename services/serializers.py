@@ -75,45 +75,57 @@ class CateringSerializer(BaseServiceSerializer):
     class Meta(BaseServiceSerializer.Meta):
         model = Catering
 
+# Service type key -> serializer, mirrors SERVICE_MODELS
+SERVICE_SERIALIZERS = {
+    'venue': VenueSerializer,
+    'planning_decor': PlanningAndDecorSerializer,
+    'photography': PhotographySerializer,
+    'makeup': MakeupSerializer,
+    'bridal_wear': BridalWearSerializer,
+    'groom_wear': GroomWearSerializer,
+    'mehandi': MehandiSerializer,
+    'wedding_cake': WeddingCakeSerializer,
+    'car_rental': CarRentalSerializer,
+    'dj': DJSerializer,
+    'jewelry_rental': JewelryRentalSerializer,
+    'catering': CateringSerializer,
+}
+
 class CartItemSerializer(serializers.ModelSerializer):
     item_details = serializers.SerializerMethodField()
     total_price = serializers.SerializerMethodField()
+    live_unit_price = serializers.SerializerMethodField()
+    price_difference = serializers.SerializerMethodField()
     
     class Meta:
         model = CartItem
-        fields = ['id', 'content_type', 'object_id', 'quantity', 'added_at', 'item_details', 'total_price']
+        fields = [
+            'id', 'content_type', 'object_id', 'quantity', 'added_at', 'service_name', 'unit_price',
+            'snapshot_version', 'live_unit_price', 'price_difference', 'item_details', 'total_price'
+        ]
     
     def get_item_details(self, obj):
-        model_map = {
-            'venue': (Venue, VenueSerializer),
-            'planning_decor': (PlanningAndDecor, PlanningAndDecorSerializer),
-            'photography': (Photography, PhotographySerializer),
-            'makeup': (Makeup, MakeupSerializer),
-            'bridal_wear': (BridalWear, BridalWearSerializer),
-            'groom_wear': (GroomWear, GroomWearSerializer),
-            'mehandi': (Mehandi, MehandiSerializer),
-            'wedding_cake': (WeddingCake, WeddingCakeSerializer),
-            'car_rental': (CarRental, CarRentalSerializer),
-            'dj': (DJ, DJSerializer),
-            'jewelry_rental': (JewelryRental, JewelryRentalSerializer),
-            'catering': (Catering, CateringSerializer),
-        }
-        
-        model_class, serializer_class = model_map.get(obj.content_type, (None, None))
-        if not model_class:
-            return None
-        
-        try:
-            item = model_class.objects.get(pk=obj.object_id)
-            return serializer_class(item).data
-        except model_class.DoesNotExist:
+        if hasattr(obj, '_service_details'):
+            return obj._service_details
+        serializer_class = SERVICE_SERIALIZERS.get(obj.content_type)
+        service_obj = obj.get_service_object()
+        if not serializer_class or not service_obj:
             return None
+        return serializer_class(service_obj).data
     
     def get_total_price(self, obj):
         return obj.total_price()
+    
+    def get_live_unit_price(self, obj):
+        return obj.get_live_unit_price()
+    
+    def get_price_difference(self, obj):
+        """Live minus snapshot unit price; non-zero until the line is refreshed"""
+        live = obj.get_live_unit_price()
+        return None if live is None else live - obj.unit_price
 
 class CartSerializer(serializers.ModelSerializer):
-    items = CartItemSerializer(many=True, read_only=True)
+    items = serializers.SerializerMethodField()
     user = CreatorSerializer(read_only=True)
     total_price = serializers.SerializerMethodField()
     
@@ -121,6 +133,10 @@ class CartSerializer(serializers.ModelSerializer):
         model = Cart
         fields = ['id', 'user', 'items', 'created_at', 'updated_at', 'total_price']
     
+    def get_items(self, obj):
+        # Items share the cart's prefetched services, so totals don't re-query
+        return CartItemSerializer(obj.resolved_items, many=True).data
+    
     def get_total_price(self, obj):
         return obj.total_price()
 
@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.db.models import F
+from .models import SERVICE_MODELS, CartItem, get_service_type
+from .utils import bump_generation
+
+
+def refresh_similar_services(sender, instance, **kwargs):
+    """Mark the type's "similar services" stale; the batch job recomputes it"""
+    if not getattr(settings, 'SIMILAR_SERVICES_AUTO_REFRESH', True):
+        return
+
+    from .recommendations import mark_dirty
+    mark_dirty(get_service_type(sender))
+
+
+def bump_service_generation(sender, instance, **kwargs):
+    """Invalidate per-type caches (e.g. histogram arrays) after a change is committed"""
+    service_type = get_service_type(sender)
+    transaction.on_commit(lambda: bump_generation(service_type))
+
+
+def refresh_cart_snapshots(sender, instance, **kwargs):
+    """Copy the new name, price and vendor onto every cart item for this service (one UPDATE)"""
+    from .resolver import unit_price
+    from .cart_store import cart_changed
+    items = CartItem.objects.filter(content_type=get_service_type(sender), object_id=instance.pk)
+    updated = items.update(
+        service_name=instance.name,
+        unit_price=unit_price(instance),
+        vendor_id=instance.creator_id,
+        snapshot_version=F('snapshot_version') + 1
+    )
+    if updated:
+        # Totals changed, so cached cart summaries of those users are stale
+        for user_id in set(items.values_list('cart__user_id', flat=True)):
+            cart_changed(user_id)
+
+
+def invalidate_service_snapshot(sender, instance, **kwargs):
+    """Drop the cached snapshot of this service (all workers) after commit"""
+    from .resolver import invalidate
+    service_type = get_service_type(sender)
+    object_id = instance.pk
+    transaction.on_commit(lambda: invalidate(service_type, object_id))
+
+
+for model_class in SERVICE_MODELS.values():
+    post_save.connect(bump_service_generation, sender=model_class, dispatch_uid=f'generation_save_{model_class.__name__}')
+    post_delete.connect(bump_service_generation, sender=model_class, dispatch_uid=f'generation_delete_{model_class.__name__}')
+    post_save.connect(refresh_similar_services, sender=model_class, dispatch_uid=f'similar_save_{model_class.__name__}')
+    post_delete.connect(refresh_similar_services, sender=model_class, dispatch_uid=f'similar_delete_{model_class.__name__}')
+    post_save.connect(invalidate_service_snapshot, sender=model_class, dispatch_uid=f'snapshot_save_{model_class.__name__}')
+    post_delete.connect(invalidate_service_snapshot, sender=model_class, dispatch_uid=f'snapshot_delete_{model_class.__name__}')
+    post_save.connect(refresh_cart_snapshots, sender=model_class, dispatch_uid=f'cart_snapshot_{model_class.__name__}')
@@ -1,3 +1,640 @@
-from django.test import TestCase
+import itertools
+import os
+import random
+import tempfile
+import time
+from decimal import Decimal
+from importlib import import_module
+from unittest import mock
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from accounts.models import CustomUser
+from orders.models import Order, OrderItem
+from wedding_backend import db_router
+from . import cart_store, popularity, recommendations
+from .availability import BookingConflict, block_dates, parse_day, reserve_dates
+from .checks import check_shared_cache
+from .packages import Candidate, search_packages
+from .models import (
+    CartItem, Makeup, Photography, ServiceAvailability, ServiceDailyStats, SimilarServices, SimilarServicesDirty
+)
+from .resolver import get_snapshot
 
-# Create your tests here.
+
+class ServiceTestMixin:
+    """A vendor, a customer with an API client, and one service"""
+
+    def setUp(self):
+        super().setUp()
+        self.vendor = CustomUser.objects.create_user(username='vendor', email='vendor@example.com', password='pass')
+        self.customer = CustomUser.objects.create_user(
+            username='customer', email='customer@example.com', password='pass'
+        )
+        self.photography = Photography.objects.create(
+            creator=self.vendor, name='Studio', location='Goa', category='candid', price=100
+        )
+        self.client_api = APIClient()
+        self.client_api.force_authenticate(self.customer)
+
+    def add_to_cart(self, service, quantity=1, **fields):
+        response = self.client_api.post('/services/cart/', {
+            'content_type': 'photography', 'object_id': service.pk, 'quantity': quantity, **fields
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_warns_about_per_process_cache(self):
+        self.assertEqual([w.id for w in check_shared_cache(None)], ['services.W001'])
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost:6379',
+    }})
+    def test_shared_cache_passes(self):
+        self.assertEqual(check_shared_cache(None), [])
+
+
+class AvailabilityTests(ServiceTestMixin, TestCase):
+
+    def availability_url(self, service=None):
+        return f'/services/photography/{(service or self.photography).pk}/availability/'
+
+    def test_staff_blocks_dates_and_listings_skip_them(self):
+        other = Photography.objects.create(
+            creator=self.vendor, name='Other', location='Goa', category='candid', price=100
+        )
+        staff = CustomUser.objects.create_user(
+            username='staff', email='staff@example.com', password='pass', is_staff=True
+        )
+        staff_client = APIClient()
+        staff_client.force_authenticate(staff)
+        response = staff_client.post(self.availability_url(), {
+            'start_date': '2030-05-01', 'end_date': '2030-05-03'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['blocked'], ['2030-05-01', '2030-05-02', '2030-05-03'])
+
+        listed = self.client_api.get('/services/photography/', {'available_on': '2030-05-02'}).data
+        self.assertEqual([row['name'] for row in listed], ['Other'])
+        listed = self.client_api.get('/services/photography/', {'available_on': '2030-05-04'}).data
+        self.assertEqual(len(listed), 2)
+
+        # Writes are staff-only, like the service detail views
+        response = self.client_api.post(self.availability_url(other), {'start_date': '2030-05-01'}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_reserve_reports_taken_days_and_claims_none(self):
+        day = parse_day('2030-05-01')
+        next_day = parse_day('2030-05-02')
+        reserve_dates(None, [('photography', self.photography.pk, day)])
+
+        with self.assertRaises(BookingConflict) as raised:
+            reserve_dates(None, [
+                ('photography', self.photography.pk, day), ('photography', self.photography.pk, next_day)
+            ])
+        self.assertEqual(raised.exception.conflicts, [('photography', self.photography.pk, day)])
+        # The free day was not claimed either
+        calendar = self.client_api.get(self.availability_url(), {'start_date': '2030-05-01'}).data
+        self.assertEqual(calendar['booked'], ['2030-05-01'])
+
+    def test_calendar_rejects_an_inverted_range(self):
+        response = self.client_api.get(self.availability_url(), {'start_date': '2030-05-02', 'end_date': '2030-05-01'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client_api.get(self.availability_url(), {'start_date': '2030-05-01', 'end_date': '2030-05-01'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_backfill_books_dates_of_existing_orders(self):
+        def place_order(day):
+            response = self.client_api.post('/orders/orders/create/', {'items': [{
+                'service_type': 'photography', 'service_id': self.photography.pk, 'service_date': day
+            }]}, format='json')
+            self.assertEqual(response.status_code, 201, response.data)
+            return response.data['id']
+
+        first, second, cancelled, _ = (place_order(f'2030-05-0{day}') for day in range(1, 5))
+        Order.objects.filter(pk=cancelled).update(order_status='cancelled')
+        # Orders from before the calendar existed: no rows, and two share a day
+        ServiceAvailability.objects.all().delete()
+        OrderItem.objects.filter(order_id=second).update(service_date='2030-05-01')
+        # A day blocked since then stays blocked
+        block_dates('photography', self.photography.pk, parse_day('2030-05-04'), parse_day('2030-05-04'))
+
+        backfill = import_module('services.migrations.0009_backfill_serviceavailability').backfill_bookings
+        backfill(apps, mock.Mock(connection=connection))
+        self.assertEqual(
+            list(ServiceAvailability.objects.values_list('date', 'status', 'order_id')),
+            [(parse_day('2030-05-01'), 'booked', first), (parse_day('2030-05-04'), 'blocked', None)]
+        )
+
+
+class CartPriceSnapshotTests(ServiceTestMixin, TestCase):
+
+    def cart_line(self):
+        return self.client_api.get('/services/cart/').data['items'][0]
+
+    def test_new_line_is_priced_from_the_service_row(self):
+        get_snapshot('photography', self.photography.pk)
+        # Saved by another worker: this process's cached snapshot is stale
+        Photography.objects.filter(pk=self.photography.pk).update(price=150)
+        self.add_to_cart(self.photography)
+        self.assertEqual(CartItem.objects.get().unit_price, 150)
+
+    def test_cart_reports_version_and_live_price_difference(self):
+        self.add_to_cart(self.photography)
+        line = self.cart_line()
+        self.assertEqual(line['snapshot_version'], 0)
+        self.assertEqual(Decimal(str(line['price_difference'])), 0)
+
+        # Changed without the save signals: the line keeps its snapshot price
+        Photography.objects.filter(pk=self.photography.pk).update(price=130)
+        line = self.cart_line()
+        self.assertEqual(Decimal(line['unit_price']), 100)
+        self.assertEqual(Decimal(str(line['live_unit_price'])), 130)
+        self.assertEqual(Decimal(str(line['price_difference'])), 30)
+
+        # A normal save refreshes the snapshot and bumps its version
+        self.photography.refresh_from_db()
+        self.photography.save()
+        line = self.cart_line()
+        self.assertEqual(line['snapshot_version'], 1)
+        self.assertEqual(Decimal(line['unit_price']), 130)
+        self.assertEqual(Decimal(str(line['price_difference'])), 0)
+
+
+class CartUpsertTests(ServiceTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.other = Photography.objects.create(
+            creator=self.vendor, name='Other', location='Goa', category='candid', price=200
+        )
+
+    def lines(self):
+        return sorted(CartItem.objects.values_list('object_id', 'quantity', 'service_date', 'notes'))
+
+    def batch(self, *operations):
+        return self.client_api.patch('/services/cart/batch/', {'operations': list(operations)}, format='json')
+
+    def test_adding_again_merges_into_one_line(self):
+        self.add_to_cart(self.photography, service_date='2030-05-01', notes='Morning')
+        self.add_to_cart(self.photography, quantity=2)
+        # Quantities add up; date and notes are only replaced when given
+        self.assertEqual(self.lines(), [(self.photography.pk, 3, parse_day('2030-05-01'), 'Morning')])
+
+        self.add_to_cart(self.photography, notes='Evening')
+        self.assertEqual(self.lines(), [(self.photography.pk, 4, parse_day('2030-05-01'), 'Evening')])
+
+    def test_batch_merges_with_existing_lines(self):
+        self.add_to_cart(self.photography)
+        response = self.batch(
+            {'content_type': 'photography', 'object_id': self.photography.pk, 'quantity': 2},
+            {'content_type': 'photography', 'object_id': self.other.pk},
+            {'content_type': 'photography', 'object_id': self.other.pk},
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.lines(), [(self.photography.pk, 3, None, ''), (self.other.pk, 2, None, '')])
+
+        response = self.batch(
+            {'op': 'update', 'content_type': 'photography', 'object_id': self.other.pk, 'quantity': 5},
+            {'op': 'remove', 'content_type': 'photography', 'object_id': self.photography.pk},
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.lines(), [(self.other.pk, 5, None, '')])
+
+    def test_failed_batch_changes_nothing(self):
+        self.add_to_cart(self.photography)
+        response = self.batch(
+            {'content_type': 'photography', 'object_id': self.other.pk},
+            {'op': 'remove', 'content_type': 'photography', 'object_id': 999},
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data['errors'][0]['index'], 1)
+        self.assertEqual(self.lines(), [(self.photography.pk, 1, None, '')])
+
+    @override_settings(CART_BACKEND='cache', CART_FLUSH_INTERVAL=0)
+    def test_cached_adds_flush_into_one_line(self):
+        cache.clear()
+        self.addCleanup(cart_store._dirty.clear)
+        self.add_to_cart(self.photography)
+        self.add_to_cart(self.photography)
+        cart_store.flush_user(self.customer.pk)
+        self.assertEqual(self.lines(), [(self.photography.pk, 2, None, '')])
+
+        self.add_to_cart(self.photography)
+        cart_store.flush_user(self.customer.pk)
+        self.assertEqual(self.lines(), [(self.photography.pk, 3, None, '')])
+
+
+@override_settings(CART_FLUSH_INTERVAL=0, CART_LOCK_TIMEOUT=0.05)
+class CartBackendTests(ServiceTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cart_store._dirty.clear)
+
+    def add_counting_write_transactions(self):
+        with mock.patch('wedding_backend.db_writes.transaction') as write_transaction:
+            self.add_to_cart(self.photography)
+        return write_transaction.atomic.call_count
+
+    def test_db_backend_add_is_a_serialized_write(self):
+        self.assertEqual(self.add_counting_write_transactions(), 1)
+        self.assertEqual(CartItem.objects.get().quantity, 1)
+
+    @override_settings(CART_BACKEND='cache')
+    def test_cache_backend_add_skips_the_write_transaction(self):
+        self.assertEqual(self.add_counting_write_transactions(), 0)
+        self.assertEqual(len(cart_store.get_state(self.customer)['items']), 1)
+        self.assertFalse(CartItem.objects.exists())
+
+    @override_settings(CART_BACKEND='cache')
+    def test_cache_backend_fails_instead_of_writing_unlocked(self):
+        self.add_to_cart(self.photography)
+        cache.add(f'cart_lock_{self.customer.pk}', 1, 60)
+
+        response = self.client_api.post('/services/cart/', {
+            'content_type': 'photography', 'object_id': self.photography.pk
+        }, format='json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(cart_store.get_state(self.customer)['items'][0]['quantity'], 1)
+
+        # The background flusher keeps the cart dirty and retries later
+        self.assertEqual(cart_store.flush(), 0)
+        self.assertIn(self.customer.pk, cart_store._dirty)
+
+        cache.delete(f'cart_lock_{self.customer.pk}')
+        self.add_to_cart(self.photography)
+        self.assertEqual(cart_store.get_state(self.customer)['items'][0]['quantity'], 2)
+
+
+@override_settings(CART_BACKEND='cache', CART_FLUSH_INTERVAL=0)
+class CacheCartTests(ServiceTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cart_store._dirty.clear)
+
+    def test_warm_reads_and_adds_make_no_queries(self):
+        self.add_to_cart(self.photography)
+        self.client_api.get('/services/cart/')
+        with self.assertNumQueries(0):
+            data = self.client_api.get('/services/cart/').data
+        self.assertEqual(data['items'][0]['item_details']['name'], 'Studio')
+        with self.assertNumQueries(0):
+            self.add_to_cart(self.photography)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client_api.get('/services/cart/summary/').data['total'], 200)
+
+    def test_items_are_addressable_by_id_before_the_flush(self):
+        item_id = self.add_to_cart(self.photography).data['items'][0]['id']
+        self.assertIsNotNone(item_id)
+        response = self.client_api.patch(f'/services/cart/items/{item_id}/', {'quantity': 3}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], item_id)
+
+        other = Photography.objects.create(
+            creator=self.vendor, name='Other', location='Goa', category='candid', price=200
+        )
+        other_id = self.add_to_cart(other).data['items'][1]['id']
+        self.assertNotEqual(other_id, item_id)
+        self.assertEqual(self.client_api.delete(f'/services/cart/items/{other_id}/').status_code, 204)
+        self.assertFalse(CartItem.objects.exists())
+
+        # The flush keeps the ids clients already have
+        cart_store.flush_user(self.customer.pk)
+        self.assertEqual(list(CartItem.objects.values_list('pk', 'quantity')), [(item_id, 3)])
+        self.assertEqual(self.client_api.get('/services/cart/').data['items'][0]['id'], item_id)
+
+    def test_invalid_ids_and_quantities_are_rejected(self):
+        self.add_to_cart(self.photography)
+        item_id = self.client_api.get('/services/cart/').data['items'][0]['id']
+        line = {'content_type': 'photography', 'object_id': self.photography.pk}
+        requests = [
+            ('post', '/services/cart/', {**line, 'object_id': 'abc'}),
+            ('post', '/services/cart/', {**line, 'quantity': 'x'}),
+            ('post', '/services/cart/', {**line, 'quantity': 0}),
+            ('delete', '/services/cart/', {'content_type': 'photography', 'object_id': 'abc'}),
+            ('patch', f'/services/cart/items/{item_id}/', {'quantity': 'abc'}),
+        ]
+        for method, url, data in requests:
+            with self.subTest(method=method, data=data):
+                response = getattr(self.client_api, method)(url, data, format='json')
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(cart_store.get_state(self.customer)['items'][0]['quantity'], 1)
+
+
+class CartBackendParityTests(ServiceTestMixin, TestCase):
+    """Both backends price lines from their snapshot, so they return the same totals"""
+
+    def prices(self):
+        data = self.client_api.get('/services/cart/').data
+        line = data['items'][0]
+        return Decimal(str(data['total_price'])), Decimal(str(line['unit_price'])), line['snapshot_version']
+
+    def run_scenario(self):
+        cache.clear()
+        CartItem.objects.all().delete()
+        Photography.objects.filter(pk=self.photography.pk).update(price=100)
+        self.photography.refresh_from_db()
+        self.add_to_cart(self.photography, quantity=2)
+        seen = [self.prices()]
+        # Changed without the save signals: the snapshot price stays
+        Photography.objects.filter(pk=self.photography.pk).update(price=130)
+        seen.append(self.prices())
+        # A normal save refreshes the line
+        self.photography.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.photography.save()
+        seen.append(self.prices())
+        return seen
+
+    def test_db_and_cache_backends_agree(self):
+        db_prices = self.run_scenario()
+        with self.settings(CART_BACKEND='cache', CART_FLUSH_INTERVAL=0):
+            self.addCleanup(cart_store._dirty.clear)
+            cache_prices = self.run_scenario()
+        self.assertEqual(db_prices, [(200, 100, 0), (200, 100, 0), (260, 130, 1)])
+        self.assertEqual(cache_prices, db_prices)
+
+class PopularityTests(ServiceTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        popularity.drain()
+        self.addCleanup(popularity.drain)
+
+    def stats(self, service):
+        return ServiceDailyStats.objects.values_list('views', 'cart_adds', 'wishlist_adds', 'bookings').get(
+            service_type='photography', object_id=service.pk
+        )
+
+    def test_record_buffers_until_flush_merges_into_daily_stats(self):
+        self.assertEqual(self.client_api.get(f'/services/photography/{self.photography.pk}/').status_code, 200)
+        popularity.record('photography', self.photography.pk, 'views')
+        popularity.record('photography', str(self.photography.pk), 'cart_adds', 3)
+        self.assertFalse(ServiceDailyStats.objects.exists())
+
+        self.assertEqual(popularity.flush(), 1)
+        self.assertEqual(self.stats(self.photography), (2, 3, 0, 0))
+        self.assertEqual(popularity.flush(), 0)
+
+        # A second flush on the same day adds to the existing row
+        popularity.record('photography', self.photography.pk, 'bookings')
+        popularity.record('photography', self.photography.pk, 'views')
+        self.assertEqual(popularity.flush(), 1)
+        self.assertEqual(self.stats(self.photography), (3, 3, 0, 1))
+
+    def test_ordering_by_popularity(self):
+        booked = Photography.objects.create(
+            creator=self.vendor, name='Booked', location='Goa', category='candid', price=100
+        )
+        quiet = Photography.objects.create(
+            creator=self.vendor, name='Quiet', location='Goa', category='candid', price=100
+        )
+        popularity.record('photography', booked.pk, 'bookings')
+        for _ in range(3):
+            popularity.record('photography', self.photography.pk, 'views')
+        popularity.flush()
+
+        def names(ordering):
+            response = self.client_api.get('/services/photography/', {'ordering': ordering})
+            self.assertEqual(response.status_code, 200)
+            return [row['name'] for row in response.data]
+
+        self.assertEqual(names('-popularity'), ['Booked', 'Studio', 'Quiet'])
+        self.assertEqual(names('popularity'), ['Quiet', 'Studio', 'Booked'])
+
+
+class ReplicaRoutingTests(ServiceTestMixin, TestCase):
+    """Runs against a second SQLite file as the replica, so a read that went to
+    the wrong database returns different rows"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.replica_dir = tempfile.TemporaryDirectory()
+        replica = dict(connections['default'].settings_dict)
+        replica['NAME'] = os.path.join(cls.replica_dir.name, 'replica.sqlite3')
+        replica['TEST'] = {**replica['TEST'], 'NAME': replica['NAME']}
+        # connections.settings is settings.DATABASES, so replica_alias() sees it too
+        connections.settings['replica'] = replica
+        call_command('migrate', database='replica', verbosity=0)
+        # Declared only now: the runner checks the declared aliases exist before setUpClass
+        cls.databases = {'default', 'replica'}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        cls.replica_dir.cleanup()
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        # Only on the replica; the primary has 'Studio'
+        Photography.objects.using('replica').create(name='Replica Studio', location='Goa', category='candid', price=100)
+
+    def listed_names(self):
+        return [row['name'] for row in self.client_api.get('/services/photography/').data]
+
+    def test_router_sends_reads_to_the_replica_until_a_write(self):
+        router = db_router.PrimaryReplicaRouter()
+        state = db_router.RoutingState()
+        token = db_router._state.set(state)
+        self.addCleanup(db_router._state.reset, token)
+
+        self.assertIsNone(router.db_for_read(Photography))
+        state.use_replica = True
+        self.assertEqual(router.db_for_read(Photography), 'replica')
+        self.assertEqual(router.db_for_write(Photography), 'default')
+        self.assertIsNone(router.db_for_read(Photography))
+
+    def test_list_reads_from_the_replica(self):
+        self.assertEqual(self.listed_names(), ['Replica Studio'])
+        # Views without ReplicaReadMixin keep reading the primary
+        self.assertEqual(self.client_api.get('/services/cart/').status_code, 200)
+        self.assertEqual(Photography.objects.get().name, 'Studio')
+
+    def test_writes_go_to_the_primary_and_pin_the_user(self):
+        self.add_to_cart(self.photography)
+        self.assertEqual(CartItem.objects.using('default').count(), 1)
+        self.assertEqual(CartItem.objects.using('replica').count(), 0)
+
+        # Pinned: the writer reads their own writes from the primary
+        self.assertTrue(db_router.is_pinned(self.customer))
+        self.assertEqual(self.listed_names(), ['Studio'])
+
+        # Other users still read the replica
+        self.client_api.force_authenticate(self.vendor)
+        self.assertEqual(self.listed_names(), ['Replica Studio'])
+
+        # Once the pin expires the writer is back on the replica
+        cache.delete(db_router.pin_key(self.customer.pk))
+        self.client_api.force_authenticate(self.customer)
+        self.assertEqual(self.listed_names(), ['Replica Studio'])
+
+class CartQueryCountTests(ServiceTestMixin, TestCase):
+
+    def fill_cart(self, count):
+        """Replace the cart with count lines, alternating two service types and one vendor per line"""
+        CartItem.objects.all().delete()
+        for i in range(count):
+            vendor = CustomUser.objects.create_user(
+                username=f'vendor{count}_{i}', email=f'vendor{count}_{i}@example.com', password='pass'
+            )
+            model, content_type = (Makeup, 'makeup') if i % 2 else (Photography, 'photography')
+            service = model.objects.create(
+                creator=vendor, name=f'Service {i}', location='Goa', price=100,
+                category='bridal' if i % 2 else 'candid'
+            )
+            response = self.client_api.post('/services/cart/', {
+                'content_type': content_type, 'object_id': service.pk, 'quantity': 1
+            }, format='json')
+            self.assertEqual(response.status_code, 201, response.data)
+
+    def test_cart_queries_do_not_grow_with_the_cart(self):
+        # Cart, user, items, then one query per service type
+        for count in (2, 10):
+            self.fill_cart(count)
+            cache.clear()
+            with self.assertNumQueries(5):
+                response = self.client_api.get('/services/cart/')
+            self.assertEqual(len(response.data['items']), count)
+
+
+class SimilarServicesBatchTests(ServiceTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        for n in range(3):
+            Photography.objects.create(
+                creator=self.vendor, name=f'Other {n}', location='Goa', category='candid', price=120 + n
+            )
+        recommendations.rebuild_dirty()
+
+    def test_save_only_marks_the_type(self):
+        before = list(SimilarServices.objects.values_list('object_id', 'neighbours', 'computed_at'))
+        self.photography.price = 5000
+        self.photography.save()
+        self.assertEqual(list(SimilarServices.objects.values_list('object_id', 'neighbours', 'computed_at')), before)
+        self.assertEqual(list(SimilarServicesDirty.objects.values_list('service_type', flat=True)), ['photography'])
+
+    def test_batch_rebuilds_marked_types(self):
+        Photography.objects.create(creator=self.vendor, name='New', location='Goa', category='candid', price=110)
+        self.assertEqual(recommendations.rebuild_dirty(), {'photography': 5})
+        self.assertEqual(SimilarServices.objects.filter(service_type='photography').count(), 5)
+        self.assertFalse(SimilarServicesDirty.objects.exists())
+        self.assertEqual(recommendations.rebuild_dirty(), {})
+
+    def test_change_during_rebuild_stays_marked(self):
+        self.photography.save()
+        rebuild = recommendations.rebuild
+
+        def rebuild_while_saving(service_type, k):
+            self.photography.save()
+            return rebuild(service_type, k)
+
+        with mock.patch.object(recommendations, 'rebuild', side_effect=rebuild_while_saving):
+            recommendations.rebuild_dirty()
+        self.assertTrue(SimilarServicesDirty.objects.filter(service_type='photography').exists())
+
+
+class PackageSearchTests(SimpleTestCase):
+
+    def candidates(self, service_type, ratings_and_prices):
+        return [
+            Candidate(service_type, i, f'{service_type} {i}', rating, Decimal(price), 1)
+            for i, (rating, price) in enumerate(ratings_and_prices, start=1)
+        ]
+
+    def brute_force(self, candidate_lists, budget, top_n):
+        packages = [
+            (round(sum(c.rating for c in combo), 6), sum(c.cost for c in combo))
+            for combo in itertools.product(*candidate_lists)
+            if sum(c.cost for c in combo) <= budget
+        ]
+        return sorted(packages, key=lambda p: (-p[0], p[1]))[:top_n]
+
+    def test_matches_brute_force_with_tied_ratings(self):
+        rng = random.Random(7)
+        for _ in range(20):
+            lists = [
+                self.candidates(t, [(rng.choice([4.0, 4.5, 5.0]), rng.randint(10, 60)) for _ in range(6)])
+                for t in ('venue', 'dj', 'catering')
+            ]
+            packages, complete = search_packages(lists, 120, 5)
+            self.assertTrue(complete)
+            self.assertEqual(
+                [(round(r, 6), c) for r, c, _ in packages],
+                self.brute_force(lists, 120, 5)
+            )
+
+    def test_fully_tied_ratings_are_pruned_on_cost(self):
+        lists = [self.candidates(t, [(4.0, 100 + i) for i in range(50)]) for t in ('venue', 'dj', 'catering', 'makeup')]
+        packages, complete = search_packages(lists, 10_000, 5, max_nodes=200_000)
+        self.assertTrue(complete)
+        self.assertEqual([cost for _, cost, _ in packages], [400, 401, 401, 401, 401])
+
+    def test_adversarial_input_stops_at_the_search_budget(self):
+        # Near-tied ratings that rise with price under a tight budget: the
+        # best-rated completions are never affordable, so the rating bound
+        # barely cuts and the full search takes seconds
+        rng = random.Random(3)
+        lists = []
+        for t in ('venue', 'dj', 'catering', 'makeup', 'mehandi'):
+            spread = [rng.random() for _ in range(50)]
+            lists.append(self.candidates(t, [(4.0 + r, 100 + int(r * 100) + rng.randint(0, 3)) for r in spread]))
+
+        started = time.monotonic()
+        packages, complete = search_packages(lists, 750, 5, max_nodes=10_000_000, time_budget=0.05)
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertFalse(complete)
+        self.assertEqual(len(packages), 5)
+        self.assertTrue(all(cost <= 750 and len(items) == 5 for _, cost, items in packages))
+        self.assertEqual(packages, sorted(packages, key=lambda p: (-p[0], p[1])))
+
+        packages, complete = search_packages(lists, 750, 5, max_nodes=1_000)
+        self.assertFalse(complete)
+        self.assertEqual(len(packages), 5)
+
+
+class PackageBuilderViewTests(ServiceTestMixin, TestCase):
+
+    def build(self, budget):
+        return self.client_api.post('/services/packages/', {
+            'budget': budget, 'service_types': ['photography']
+        }, format='json')
+
+    def test_rejects_invalid_budgets(self):
+        for budget in ('nan', 'NaN', 'inf', '-inf', 'Infinity', '1e400', '1e10', '0', '-5', 'abc', '', None, True):
+            with self.subTest(budget=budget):
+                response = self.build(budget)
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.data['success'])
+
+        # JSON number literals that parse to non-finite floats
+        for literal in ('1e400', 'NaN', 'Infinity'):
+            with self.subTest(literal=literal):
+                response = self.client_api.post(
+                    '/services/packages/', f'{{"budget": {literal}, "service_types": ["photography"]}}',
+                    content_type='application/json'
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_accepts_decimal_budget(self):
+        response = self.build('150.50')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['complete'])
+        self.assertEqual([p['total_cost'] for p in response.data['data']], [Decimal('100.00')])
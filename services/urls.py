@@ -65,6 +65,8 @@ urlpatterns = [
     # Cart URLs
     path('cart/', CartView.as_view(), name='cart'),
     path('cart/items/<int:item_id>/', CartItemView.as_view(), name='cart-item-detail'),
+    path('cart/batch/', CartBatchView.as_view(), name='cart-batch'),
+    path('cart/summary/', CartSummaryView.as_view(), name='cart-summary'),
     path('cart/checkout/', CartCheckoutView.as_view(), name='cart-checkout'),
     
     # Wishlist URLs
@@ -72,4 +74,16 @@ urlpatterns = [
 
     # Global Search:
     path('search/', GlobalSearchView.as_view(), name='global-search'),
+
+    # Budget-constrained package builder
+    path('packages/', PackageBuilderView.as_view(), name='package-builder'),
+
+    # Availability calendar (service_type is the cart/order content type key, e.g. "venue")
+    path('<str:service_type>/<int:pk>/availability/', ServiceAvailabilityView.as_view(), name='service-availability'),
+
+    # Numeric field distributions
+    path('<str:service_type>/histogram/', ServiceHistogramView.as_view(), name='service-histogram'),
+
+    # Precomputed similar services
+    path('<str:service_type>/<int:pk>/similar/', SimilarServicesView.as_view(), name='similar-services'),
 ]
\ No newline at end of file
@@ -1,18 +1,53 @@
+from decimal import Decimal, InvalidOperation
 from django.core.cache import cache
+from .models import Cart
+from . import cart_store
 
 def get_user_cart(user):
-    """Get or create user cart with caching"""
-    cache_key = f"user_cart_{user.id}"
-    cart = cache.get(cache_key)
-    
-    if not cart:
-        cart, created = Cart.objects.get_or_create(user=user)
-        # Cache for 1 hour
-        cache.set(cache_key, cart, 3600)
-    
+    """Get or create user cart (from the write-behind cache when CART_BACKEND = 'cache')"""
+    if cart_store.enabled():
+        return cart_store.get_cart(user)
+    cart, created = Cart.objects.get_or_create(user=user)
     return cart
 
 def clear_cart_cache(user):
     """Clear cart cache"""
-    cache_key = f"user_cart_{user.id}"
-    cache.delete(cache_key)
\ No newline at end of file
+    cart_store.discard(user.id)
+
+def safe_float(value):
+    """Safely convert to float, return None if invalid"""
+    try:
+        return float(value) if value not in [None, ''] else None
+    except (ValueError, TypeError):
+        return None
+
+def safe_int(value):
+    """Safely convert to int, return None if invalid"""
+    try:
+        return int(value) if value not in [None, ''] else None
+    except (ValueError, TypeError):
+        return None
+
+def safe_decimal(value):
+    """Safely convert to a finite Decimal, return None if invalid (or NaN/infinite)"""
+    if value in [None, ''] or isinstance(value, bool):
+        return None
+    try:
+        number = Decimal(str(value).strip())
+    except (InvalidOperation, ValueError, TypeError):
+        return None
+    return number if number.is_finite() else None
+
+def get_generation(service_type):
+    """Current generation of a service type; bumped whenever one of its rows changes"""
+    return cache.get(f"service_generation_{service_type}", 0)
+
+def bump_generation(service_type):
+    """Invalidate every in-memory structure derived from a service type"""
+    cache_key = f"service_generation_{service_type}"
+    try:
+        return cache.incr(cache_key)
+    except ValueError:
+        # Key missing (first change or evicted); start past any value readers may hold
+        cache.add(cache_key, 1, None)
+        return cache.incr(cache_key)
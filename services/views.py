@@ -3,18 +3,33 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.shortcuts import get_object_or_404
+from django.http import Http404
 from django.contrib.auth import get_user_model
 from django.db import transaction
 from django.utils import timezone
 from django.core.mail import send_mail
 from django.conf import settings
+from datetime import timedelta
+from wedding_backend.db_router import ReplicaReadMixin
+from wedding_backend.db_writes import serialized_write
+from orders.idempotency import idempotent
 from .models import *
 from .serializers import *
 from .permissions import IsStaffOrCreatorOrReadOnly
+from .availability import (
+    BookingConflict, parse_day, filter_available, find_conflicts, is_available,
+    block_dates, unblock_dates, get_calendar
+)
+from . import popularity
+from .packages import MAX_BUDGET, build_packages
+from .histograms import histogram, numeric_fields
+from .resolver import ServiceRef, get_snapshot, get_snapshots, load_snapshots
+from .utils import get_user_cart, clear_cart_cache, safe_decimal, safe_float, safe_int
+from . import cart_store
 
 User = get_user_model()
 
-class ServiceListView(APIView):
+class ServiceListView(ReplicaReadMixin, APIView):
     """Base list view for all services with filtering capabilities"""
     permission_classes = [AllowAny]
     model = None
@@ -61,6 +76,17 @@ class ServiceListView(APIView):
         if min_rating:
             queryset = queryset.filter(rating__gte=min_rating)
             
+        # Filter out services booked or blocked on a given day
+        available_on = parse_day(self.request.query_params.get('available_on'))
+        if available_on:
+            queryset = filter_available(queryset, get_service_type(self.model), available_on)
+            
+        # Order by recent engagement (views, wishlist/cart adds, bookings)
+        ordering = self.request.query_params.get('ordering')
+        if ordering in ('popularity', '-popularity'):
+            queryset = popularity.annotate_popularity(queryset, get_service_type(self.model))
+            queryset = queryset.order_by(ordering, '-rating', 'pk')
+            
         return queryset
     
     def get(self, request):
@@ -85,7 +111,7 @@ class ServiceCreateView(APIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class ServiceDetailView(APIView):
+class ServiceDetailView(ReplicaReadMixin, APIView):
     """Base detail view for all services with CRUD operations"""
     permission_classes = [IsStaffOrCreatorOrReadOnly]
     model = None
@@ -96,6 +122,7 @@ class ServiceDetailView(APIView):
     
     def get(self, request, pk):
         obj = self.get_object(pk)
+        popularity.record(get_service_type(self.model), obj.pk, 'views')
         serializer = self.serializer_class(obj)
         return Response(serializer.data)
     
@@ -268,12 +295,28 @@ class CateringDetailView(ServiceDetailView):
     serializer_class = CateringSerializer
 
 # Enhanced Cart Views
-class CartView(APIView):
+class CartBusyMixin:
+    """
+    APIView mixin: with the cache backend a cart change that cannot take the
+    user's cart lock in time fails with 503 (nothing changed) instead of
+    racing the request holding it.
+    """
+    
+    def handle_exception(self, exc):
+        if isinstance(exc, cart_store.CartBusy):
+            return Response(
+                {'error': 'Your cart is being updated by another request. Please retry.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '1'}
+            )
+        return super().handle_exception(exc)
+
+class CartView(CartBusyMixin, APIView):
     """View for managing user's shopping cart"""
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        cart, created = Cart.objects.get_or_create(user=request.user)
+        cart = get_user_cart(request.user)
         serializer = CartSerializer(cart)
         return Response(serializer.data)
     
@@ -300,76 +343,78 @@ class CartView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Check if object exists
-        model_map = {
-            'venue': Venue,
-            'planning_decor': PlanningAndDecor,
-            'photography': Photography,
-            'makeup': Makeup,
-            'bridal_wear': BridalWear,
-            'groom_wear': GroomWear,
-            'mehandi': Mehandi,
-            'wedding_cake': WeddingCake,
-            'car_rental': CarRental,
-            'dj': DJ,
-            'jewelry_rental': JewelryRental,
-            'catering': Catering,
-        }
-        
-        model_class = model_map.get(content_type)
-        if not model_class:
+        object_id, quantity = safe_int(object_id), safe_int(quantity)
+        if object_id is None or quantity is None or quantity < 1:
             return Response(
-                {'error': 'Invalid content_type'},
+                {'error': 'object_id and quantity must be positive integers'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            obj = model_class.objects.get(pk=object_id)
-        except model_class.DoesNotExist:
+        # Check if object exists. A DB cart line is priced from the service
+        # row; the cache backend stays off the DB and snapshots the line from
+        # the shared snapshot cache (the flush re-reads the row)
+        if cart_store.enabled():
+            snapshot = get_snapshot(content_type, object_id)
+        else:
+            ref = ServiceRef(content_type, object_id)
+            snapshot = load_snapshots([ref]).get(ref)
+        if not snapshot:
             return Response(
                 {'error': 'Object not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        cart, created = Cart.objects.get_or_create(user=request.user)
-        existing_item = cart.items.filter(
-            content_type=content_type,
-            object_id=object_id
-        ).first()
+        service_day = parse_day(service_date)
+        if service_day and not is_available(content_type, object_id, service_day):
+            return Response(
+                {'error': f'Service is not available on {service_day.isoformat()}'},
+                status=status.HTTP_409_CONFLICT
+            )
         
-        if existing_item:
-            existing_item.quantity += int(quantity)
-            if service_date:
-                existing_item.service_date = service_date
-            if service_time:
-                existing_item.service_time = service_time
-            if notes:
-                existing_item.notes = notes
-            existing_item.save()
-        else:
-            new_item = CartItem.objects.create(
-                content_type=content_type,
-                object_id=object_id,
-                quantity=quantity,
-                service_date=service_date,
-                service_time=service_time,
-                notes=notes
+        if cart_store.enabled():
+            cart = cart_store.add_item(
+                request.user, content_type, object_id, quantity=quantity,
+                service_date=service_date, service_time=service_time, notes=notes, snapshot=snapshot
             )
-            cart.items.add(new_item)
+            popularity.record(content_type, object_id, 'cart_adds', quantity)
+            return Response(CartSerializer(cart).data, status=status.HTTP_201_CREATED)
+        
+        cart = self.add_to_db_cart(
+            request.user, content_type, object_id, quantity=quantity, service_date=service_date,
+            service_time=service_time, notes=notes, snapshot=snapshot
+        )
+        
+        popularity.record(content_type, object_id, 'cart_adds', quantity)
         
         serializer = CartSerializer(cart)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
+    @serialized_write
+    def add_to_db_cart(self, user, content_type, object_id, snapshot, **fields):
+        """The DB backend's write; only this part takes the write lock"""
+        cart, created = Cart.objects.get_or_create(user=user)
+        cart_store.upsert_item(cart.pk, content_type, object_id, snapshot=snapshot, **fields)
+        cart_store.cart_changed(user.pk)
+        return cart
+    
     def delete(self, request):
         content_type = request.data.get('content_type')
-        object_id = request.data.get('object_id')
+        object_id = safe_int(request.data.get('object_id'))
         
-        if not content_type or not object_id:
+        if not content_type or object_id is None:
             return Response(
-                {'error': 'content_type and object_id are required'},
+                {'error': 'content_type and an integer object_id are required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        if cart_store.enabled():
+            if cart_store.remove_item(request.user, content_type=content_type, object_id=object_id):
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            return Response(
+                {'error': 'Item not found in cart'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
         cart = get_object_or_404(Cart, user=request.user)
         item = cart.items.filter(
             content_type=content_type,
@@ -377,15 +422,15 @@ class CartView(APIView):
         ).first()
         
         if item:
-            cart.items.remove(item)
             item.delete()
+            cart_store.cart_changed(request.user.pk)
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
             {'error': 'Item not found in cart'},
             status=status.HTTP_404_NOT_FOUND
         )
 
-class CartItemView(APIView):
+class CartItemView(CartBusyMixin, APIView):
     """View for managing individual cart items"""
     permission_classes = [IsAuthenticated]
     
@@ -400,11 +445,29 @@ class CartItemView(APIView):
                 {'error': 'At least one field to update is required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if quantity is not None:
+            quantity = safe_int(quantity)
+            if quantity is None or quantity < 1:
+                return Response(
+                    {'error': 'quantity must be a positive integer'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        if cart_store.enabled():
+            item = cart_store.update_item(
+                request.user, item_id, quantity=quantity, service_date=service_date,
+                service_time=service_time, notes=notes
+            )
+            if not item:
+                return Response(
+                    {'error': 'Not found'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            return Response(CartItemSerializer(item).data)
         
         try:
-            item = CartItem.objects.get(pk=item_id)
-            cart = Cart.objects.get(user=request.user, items=item)
-        except (CartItem.DoesNotExist, Cart.DoesNotExist):
+            item = CartItem.objects.get(pk=item_id, cart__user=request.user)
+        except CartItem.DoesNotExist:
             return Response(
                 {'error': 'Not found'},
                 status=status.HTTP_404_NOT_FOUND
@@ -420,180 +483,206 @@ class CartItemView(APIView):
             item.notes = notes
         
         item.save()
+        cart_store.cart_changed(request.user.pk)
         return Response(CartItemSerializer(item).data)
     
     def delete(self, request, item_id):
+        if cart_store.enabled():
+            if cart_store.remove_item(request.user, item_id=item_id):
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            return Response(
+                {'error': 'Not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
         try:
-            item = CartItem.objects.get(pk=item_id)
-            cart = Cart.objects.get(user=request.user, items=item)
-            cart.items.remove(item)
+            item = CartItem.objects.get(pk=item_id, cart__user=request.user)
             item.delete()
+            cart_store.cart_changed(request.user.pk)
             return Response(status=status.HTTP_204_NO_CONTENT)
-        except (CartItem.DoesNotExist, Cart.DoesNotExist):
+        except CartItem.DoesNotExist:
             return Response(
                 {'error': 'Not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-class CartCheckoutView(APIView):
+class CartSummaryView(APIView):
+    """Item count and total for the cart badge, without service details"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        return Response(cart_store.get_summary(request.user))
+
+class CartBatchView(CartBusyMixin, APIView):
+    """Apply several cart add/update/remove operations at once"""
+    permission_classes = [IsAuthenticated]
+    
+    OPERATIONS = ('add', 'update', 'remove')
+    MAX_OPERATIONS = 50
+    
+    def parse_operations(self, data):
+        """Normalize the operation list; returns (operations, errors)"""
+        valid_types = {choice[0] for choice in CartItem.CONTENT_TYPE_CHOICES}
+        operations = []
+        errors = []
+        for index, raw in enumerate(data):
+            if not isinstance(raw, dict):
+                errors.append({'index': index, 'error': 'Operation must be an object'})
+                continue
+            op = raw.get('op', 'add')
+            if op not in self.OPERATIONS:
+                errors.append({'index': index, 'error': f'Invalid op. Valid ops: {list(self.OPERATIONS)}'})
+                continue
+            if raw.get('content_type') not in valid_types:
+                errors.append({'index': index, 'error': 'Invalid content_type'})
+                continue
+            try:
+                object_id = int(raw.get('object_id'))
+                quantity = raw.get('quantity')
+                if quantity is not None:
+                    quantity = int(quantity)
+                    if quantity < 1:
+                        raise ValueError
+            except (TypeError, ValueError):
+                errors.append({'index': index, 'error': 'object_id and quantity must be positive integers'})
+                continue
+            operations.append({
+                'op': op,
+                'content_type': raw['content_type'],
+                'object_id': object_id,
+                'quantity': quantity,
+                'service_date': raw.get('service_date'),
+                'service_time': raw.get('service_time'),
+                'notes': raw.get('notes'),
+            })
+        return operations, errors
+    
+    def patch(self, request):
+        data = request.data.get('operations')
+        if not isinstance(data, list) or not data:
+            return Response(
+                {'error': 'operations must be a non-empty list'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(data) > self.MAX_OPERATIONS:
+            return Response(
+                {'error': f'At most {self.MAX_OPERATIONS} operations per batch'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        operations, errors = self.parse_operations(data)
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Validate every added service at once (one query per type on a cache miss)
+        adds = [op for op in operations if op['op'] == 'add']
+        snapshots = get_snapshots((op['content_type'], op['object_id']) for op in adds)
+        missing = [
+            {'content_type': op['content_type'], 'object_id': op['object_id']}
+            for op in adds if not snapshots.get(ServiceRef(op['content_type'], op['object_id']))
+        ]
+        if missing:
+            return Response(
+                {'error': 'Object not found', 'missing': missing},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        conflicts = find_conflicts(
+            (op['content_type'], op['object_id'], parse_day(op['service_date']))
+            for op in operations if op['op'] != 'remove' and parse_day(op['service_date'])
+        )
+        if conflicts:
+            return Response({
+                'error': 'Some services are not available on the selected dates.',
+                'conflicts': [
+                    {'content_type': t, 'object_id': i, 'service_date': d.isoformat()}
+                    for t, i, d in conflicts
+                ]
+            }, status=status.HTTP_409_CONFLICT)
+        
+        try:
+            if cart_store.enabled():
+                cart = cart_store.apply_batch(request.user, operations, snapshots=snapshots)
+            else:
+                cart = self.apply_to_db_cart(request.user, operations)
+        except cart_store.CartOperationError as e:
+            return Response(
+                {'errors': [{'index': e.index, 'error': str(e)}]},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        for op in adds:
+            popularity.record(op['content_type'], op['object_id'], 'cart_adds', op['quantity'] or 1)
+        
+        return Response(CartSerializer(cart).data)
+    
+    @serialized_write
+    def apply_to_db_cart(self, user, operations):
+        """The DB backend's read-modify-write, in one serialized transaction"""
+        state = cart_store.load_from_db(user)
+        cart_store.apply_operations(state, operations)
+        cart_store.persist_state(user.pk, state)
+        cart_store.cart_changed(user.pk)
+        return cart_store.build_cart(user, state)
+
+class CartCheckoutView(CartBusyMixin, APIView):
     """Checkout cart and create order from all cart items"""
     permission_classes = [IsAuthenticated]
     
-    @transaction.atomic
+    @serialized_write
+    @idempotent
     def post(self, request):
-        from orders.models import Order, OrderItem, VendorOrderNotification
+        from orders.checkout import place_order
+        
+        if cart_store.enabled():
+            # Checkout always works from the DB copy
+            cart_store.flush_user(request.user.pk)
         
         cart = get_object_or_404(Cart, user=request.user)
+        cart_items = list(cart.items.all())
         
         # Check if cart can be checked out
-        if not cart.items.exists():
+        if not cart_items:
             return Response(
                 {'error': 'Cart is empty. Add items before checkout.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get checkout data from request
-        event_date = request.data.get('event_date')
-        special_instructions = request.data.get('special_instructions', '')
-        
-        # Create order from cart items
-        order = Order.objects.create(
-            customer=request.user,
-            customer_name=f"{request.user.first_name} {request.user.last_name}".strip() or request.user.username,
-            customer_email=request.user.email,
-            customer_phone=request.user.phone_number or '',
-            event_date=event_date,
-            special_instructions=special_instructions,
-            total_amount=0  # Will be calculated
-        )
-        
-        total_amount = 0
-        order_items = []
-        
-        for cart_item in cart.items.all():
-            service_obj = cart_item.get_service_object()
-            if not service_obj:
-                continue
-            
-            # Determine unit price
-            unit_price = cart_item.get_unit_price()
-            item_total = unit_price * cart_item.quantity
-            total_amount += item_total
-            
-            # Create order item
-            order_item = OrderItem(
-                order=order,
-                service_type=cart_item.content_type,
-                service_id=cart_item.object_id,
-                service_name=service_obj.name,
-                service_price=unit_price,
-                vendor_name=service_obj.creator.get_full_name() if service_obj.creator else 'Unknown Vendor',
-                vendor_email=service_obj.creator.email if service_obj.creator else '',
-                quantity=cart_item.quantity,
-                unit_price=unit_price,
-                total_price=item_total,
-                service_date=cart_item.service_date,
-                service_time=cart_item.service_time,
-                notes=cart_item.notes
-            )
-            order_items.append(order_item)
-        
-        # Save all order items
-        OrderItem.objects.bulk_create(order_items)
-        
-        # Update order total
-        order.total_amount = total_amount
-        order.save()
-        
-        # Send notifications
-        self.send_vendor_notifications(order)
-        self.send_customer_confirmation(order)
+        # Create the order in one batched pass (emails are queued in the outbox)
+        try:
+            order = place_order(
+                request.user,
+                [
+                    {
+                        'service_type': item.content_type,
+                        'service_id': item.object_id,
+                        'quantity': item.quantity,
+                        'service_date': item.service_date,
+                        'service_time': item.service_time,
+                        'notes': item.notes,
+                    }
+                    for item in cart_items
+                ],
+                event_date=request.data.get('event_date'),
+                special_instructions=request.data.get('special_instructions', '')
+            )
+        except BookingConflict as e:
+            transaction.set_rollback(True)
+            return Response({
+                'error': 'Some services are no longer available on the selected dates.',
+                'conflicts': [
+                    {'content_type': t, 'object_id': i, 'service_date': d.isoformat()}
+                    for t, i, d in e.conflicts
+                ]
+            }, status=status.HTTP_409_CONFLICT)
         
         # Clear the cart after successful order
         cart.items.all().delete()
+        transaction.on_commit(lambda: clear_cart_cache(request.user))
         
         from orders.serializers import OrderSerializer
         response_serializer = OrderSerializer(order)
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
-    
-    def send_vendor_notifications(self, order):
-        """Send email notifications to vendors"""
-        vendors = order.get_vendors()
-        
-        for vendor in vendors:
-            from orders.models import VendorOrderNotification
-            
-            notification, created = VendorOrderNotification.objects.get_or_create(
-                order=order,
-                vendor=vendor
-            )
-            
-            vendor_items = order.items.filter(vendor_email=vendor.email)
-            
-            subject = f'New Order Received - #{order.order_number}'
-            
-            # Simple email content
-            message = f"""
-            New Order Received!
-            
-            Order Number: #{order.order_number}
-            Customer: {order.customer_name}
-            Email: {order.customer_email}
-            Phone: {order.customer_phone}
-            Event Date: {order.event_date}
-            
-            Services Ordered:
-            """
-            
-            for item in vendor_items:
-                message += f"\n- {item.service_name}: {item.quantity} x ₹{item.unit_price} = ₹{item.total_price}"
-            
-            message += f"\n\nTotal Amount: ₹{order.total_amount}"
-            
-            if order.special_instructions:
-                message += f"\n\nSpecial Instructions: {order.special_instructions}"
-            
-            try:
-                send_mail(
-                    subject,
-                    message,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [vendor.email],
-                    fail_silently=False,
-                )
-                notification.email_sent = True
-                notification.email_sent_at = timezone.now()
-                notification.save()
-            except Exception as e:
-                print(f"Failed to send email to vendor {vendor.email}: {str(e)}")
-    
-    def send_customer_confirmation(self, order):
-        """Send order confirmation to customer"""
-        subject = f'Order Confirmation - #{order.order_number}'
-        
-        message = f"""
-        Thank you for your order!
-        
-        Order Number: #{order.order_number}
-        Order Date: {order.created_at.strftime('%Y-%m-%d %H:%M')}
-        Total Amount: ₹{order.total_amount}
-        Status: {order.get_order_status_display()}
-        
-        Your vendors have been notified and will contact you shortly.
-        
-        Thank you for choosing our service!
-        """
-        
-        try:
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [order.customer_email],
-                fail_silently=False,
-            )
-        except Exception as e:
-            print(f"Failed to send confirmation email to customer: {str(e)}")
 
 class WishlistView(APIView):
     """View for managing user's wishlist"""
@@ -639,25 +728,15 @@ class WishlistView(APIView):
         
         wishlist, created = Wishlist.objects.get_or_create(user=request.user)
         
-        # Model mapping for validation
-        model_map = {
-            'venue': Venue,
-            'planning_decor': PlanningAndDecor,
-            'photography': Photography,
-            'makeup': Makeup,
-            'bridal_wear': BridalWear,
-            'groom_wear': GroomWear,
-            'mehandi': Mehandi,
-            'wedding_cake': WeddingCake,
-            'car_rental': CarRental,
-            'dj': DJ,
-            'jewelry_rental': JewelryRental,
-            'catering': Catering,
-        }
-        
-        model_class = model_map.get(content_type)
         try:
-            obj = model_class.objects.get(pk=object_id)
+            snapshot = get_snapshot(content_type, object_id)
+            if not snapshot:
+                return Response(
+                    {'error': 'Service not found'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            
+            object_id = snapshot['object_id']
             manager = getattr(wishlist, field_name)
             
             # Check if already in wishlist
@@ -668,19 +747,15 @@ class WishlistView(APIView):
                 )
             
             # Add to wishlist
-            manager.add(obj)
+            manager.add(object_id)
             wishlist.save()
+            popularity.record(content_type, object_id, 'wishlist_adds')
             
             return Response({
                 'message': 'Item added to wishlist successfully',
                 'wishlist': WishlistSerializer(wishlist).data
             }, status=status.HTTP_201_CREATED)
             
-        except model_class.DoesNotExist:
-            return Response(
-                {'error': 'Service not found'},
-                status=status.HTTP_404_NOT_FOUND
-            )
         except Exception as e:
             return Response(
                 {'error': f'Failed to add to wishlist: {str(e)}'},
@@ -749,9 +824,10 @@ class WishlistView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-class GlobalSearchView(APIView):
+class GlobalSearchView(ReplicaReadMixin, APIView):
     """Search across all vendor types with minimal query requirements"""
     permission_classes = [AllowAny]
+    replica_methods = ('POST',)
     
     def post(self, request):
         try:
@@ -768,7 +844,8 @@ class GlobalSearchView(APIView):
                 params.get('max_price'),
                 params.get('min_rating'),
                 params.get('min_capacity'),
-                params.get('max_capacity')
+                params.get('max_capacity'),
+                params.get('available_on')
             ]):
                 return Response({
                     'success': False,
@@ -782,13 +859,14 @@ class GlobalSearchView(APIView):
                 'location': params.get('location', '').strip(),
                 'vendor_type': params.get('vendor_type', '').strip(),
                 'category': params.get('category', '').strip(),
-                'min_price': self.safe_float(params.get('min_price')),
-                'max_price': self.safe_float(params.get('max_price')),
-                'min_rating': self.safe_float(params.get('min_rating')),
-                'min_capacity': self.safe_int(params.get('min_capacity')),
-                'max_capacity': self.safe_int(params.get('max_capacity')),
-                'page': self.safe_int(params.get('page', 1)),
-                'page_size': self.safe_int(params.get('page_size', 20)),
+                'min_price': safe_float(params.get('min_price')),
+                'max_price': safe_float(params.get('max_price')),
+                'min_rating': safe_float(params.get('min_rating')),
+                'min_capacity': safe_int(params.get('min_capacity')),
+                'max_capacity': safe_int(params.get('max_capacity')),
+                'available_on': parse_day(params.get('available_on')),
+                'page': safe_int(params.get('page', 1)),
+                'page_size': safe_int(params.get('page_size', 20)),
             }
             
             # Perform search
@@ -808,20 +886,6 @@ class GlobalSearchView(APIView):
                 'timestamp': timezone.now().isoformat()
             }, status=status.HTTP_400_BAD_REQUEST)
     
-    def safe_float(self, value):
-        """Safely convert to float, return None if invalid"""
-        try:
-            return float(value) if value not in [None, ''] else None
-        except (ValueError, TypeError):
-            return None
-    
-    def safe_int(self, value):
-        """Safely convert to int, return default if invalid"""
-        try:
-            return int(value) if value not in [None, ''] else None
-        except (ValueError, TypeError):
-            return None
-    
     def perform_search(self, params):
         """Perform search with minimal query requirements"""
         from django.core.paginator import Paginator, EmptyPage
@@ -896,6 +960,10 @@ class GlobalSearchView(APIView):
                 if params['max_capacity'] is not None and hasattr(model_class, 'capacity'):
                     queryset = queryset.filter(capacity__lte=params['max_capacity'])
                 
+                # Apply availability filter (optional)
+                if params['available_on'] is not None:
+                    queryset = filter_available(queryset, model_key, params['available_on'])
+                
                 # Apply pagination
                 paginator = Paginator(queryset, params['page_size'])
                 try:
@@ -913,4 +981,206 @@ class GlobalSearchView(APIView):
                     }
                 }
         
-        return results
\ No newline at end of file
+        return results
+
+class ServiceAvailabilityView(APIView):
+    """Booked/blocked calendar for a single service; staff can block dates"""
+    permission_classes = [IsStaffOrCreatorOrReadOnly]
+    
+    def get_object(self, service_type, pk):
+        model_class = SERVICE_MODELS.get(service_type)
+        if not model_class:
+            raise Http404
+        obj = get_object_or_404(model_class, pk=pk)
+        self.check_object_permissions(self.request, obj)
+        return obj
+    
+    def get_date_range(self, data):
+        start_date = parse_day(data.get('start_date')) or timezone.now().date()
+        end_date = parse_day(data.get('end_date')) or start_date + timedelta(days=365)
+        return start_date, end_date
+    
+    def get(self, request, service_type, pk):
+        obj = self.get_object(service_type, pk)
+        start_date, end_date = self.get_date_range(request.query_params)
+        if end_date < start_date:
+            return Response(
+                {'error': 'end_date must not be before start_date'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({
+            'content_type': service_type,
+            'object_id': obj.pk,
+            'start_date': start_date,
+            'end_date': end_date,
+            **get_calendar(service_type, obj.pk, start_date, end_date)
+        })
+    
+    def post(self, request, service_type, pk):
+        """Block a date range"""
+        obj = self.get_object(service_type, pk)
+        start_date = parse_day(request.data.get('start_date'))
+        end_date = parse_day(request.data.get('end_date')) or start_date
+        
+        if not start_date or end_date < start_date:
+            return Response(
+                {'error': 'A valid start_date (and optional end_date) is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if (end_date - start_date).days > 366:
+            return Response(
+                {'error': 'Date range cannot exceed one year'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        block_dates(service_type, obj.pk, start_date, end_date)
+        return Response({
+            'content_type': service_type,
+            'object_id': obj.pk,
+            **get_calendar(service_type, obj.pk, start_date, end_date)
+        }, status=status.HTTP_201_CREATED)
+    
+    def delete(self, request, service_type, pk):
+        """Unblock a date range"""
+        obj = self.get_object(service_type, pk)
+        start_date = parse_day(request.data.get('start_date'))
+        end_date = parse_day(request.data.get('end_date')) or start_date
+        
+        if not start_date:
+            return Response(
+                {'error': 'start_date is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        unblock_dates(service_type, obj.pk, start_date, end_date)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class SimilarServicesView(APIView):
+    """Precomputed "similar vendors" for a service, best match first"""
+    permission_classes = [AllowAny]
+    
+    def get(self, request, service_type, pk):
+        model_class = SERVICE_MODELS.get(service_type)
+        if not model_class:
+            raise Http404
+        
+        entry = SimilarServices.objects.filter(service_type=service_type, object_id=pk).first()
+        if not entry:
+            return Response({
+                'content_type': service_type,
+                'object_id': pk,
+                'computed_at': None,
+                'results': []
+            })
+        
+        try:
+            limit = int(request.query_params.get('limit', 0))
+        except ValueError:
+            limit = 0
+        neighbours = list(zip(entry.neighbours, entry.scores))[:limit or None]
+        services = model_class.objects.select_related('creator').in_bulk([pk for pk, _ in neighbours])
+        serializer_class = SERVICE_SERIALIZERS[service_type]
+        
+        results = []
+        for neighbour_id, score in neighbours:
+            if neighbour_id in services:
+                results.append({
+                    **serializer_class(services[neighbour_id]).data,
+                    'similarity': score
+                })
+        
+        return Response({
+            'content_type': service_type,
+            'object_id': pk,
+            'computed_at': entry.computed_at,
+            'results': results
+        })
+
+class PackageBuilderView(APIView):
+    """Best-rated combination of services (one per requested type) within a budget"""
+    permission_classes = [AllowAny]
+    
+    def post(self, request):
+        params = request.data
+        
+        budget = safe_decimal(params.get('budget'))
+        if budget is None or budget <= 0 or budget > MAX_BUDGET:
+            return Response({
+                'success': False,
+                'error': f'budget must be a positive number up to {MAX_BUDGET}',
+                'timestamp': timezone.now().isoformat()
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        service_types = params.get('service_types') or []
+        if (not isinstance(service_types, list) or not service_types
+                or len(set(service_types)) != len(service_types)
+                or any(t not in SERVICE_MODELS for t in service_types)):
+            return Response({
+                'success': False,
+                'error': f'service_types must be a list of distinct types from: {list(SERVICE_MODELS)}',
+                'timestamp': timezone.now().isoformat()
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        categories = params.get('categories') or {}
+        if not isinstance(categories, dict):
+            categories = {}
+        
+        search_params = {
+            'budget': budget,
+            'service_types': service_types,
+            'guests': safe_int(params.get('guests')),
+            'location': (params.get('location') or '').strip(),
+            'categories': categories,
+            'top_n': safe_int(params.get('top_n')) or 5,
+        }
+        
+        packages, complete = build_packages(
+            service_types,
+            budget,
+            guests=search_params['guests'],
+            location=search_params['location'],
+            categories=categories,
+            top_n=search_params['top_n']
+        )
+        
+        return Response({
+            'success': True,
+            'data': packages,
+            # False when the search hit its node/time budget (best found so far)
+            'complete': complete,
+            'filters': search_params,
+            'timestamp': timezone.now().isoformat()
+        })
+
+class ServiceHistogramView(APIView):
+    """Distribution of a numeric field (price, capacity, rating...) for range sliders"""
+    permission_classes = [AllowAny]
+    
+    def get(self, request, service_type):
+        model_class = SERVICE_MODELS.get(service_type)
+        if not model_class:
+            raise Http404
+        
+        fields = numeric_fields(model_class)
+        field = request.query_params.get('field') or get_price_field(model_class)
+        if field == 'price':
+            field = get_price_field(model_class)
+        if field not in fields:
+            return Response(
+                {'error': f'Invalid field. Valid fields: {fields}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            bins = int(request.query_params.get('bins', 20))
+        except ValueError:
+            bins = 20
+        bins = max(1, min(bins, 100))
+        
+        category = request.query_params.get('category')
+        return Response({
+            'content_type': service_type,
+            'category': category,
+            **histogram(service_type, field, bins=bins, category=category)
+        })
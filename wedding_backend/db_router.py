@@ -0,0 +1,94 @@
+"""
+Read-replica routing.
+
+Views that opt in with ReplicaReadMixin send their reads to the
+REPLICA_DB_ALIAS database. Everything else, and every write, uses the
+primary ("default"). Once a request writes, the rest of that request reads
+from the primary. The user is then pinned to the primary for
+REPLICA_PIN_SECONDS so they see their own writes.
+
+Local two-file setup:
+    cp db.sqlite3 db_replica.sqlite3
+    DATABASE_REPLICA_NAME=db_replica.sqlite3 python manage.py runserver
+"""
+import contextvars
+from django.conf import settings
+from django.core.cache import cache
+
+_state = contextvars.ContextVar('db_routing_state', default=None)
+
+
+class RoutingState:
+    __slots__ = ('use_replica', 'wrote')
+
+    def __init__(self):
+        self.use_replica = False
+        self.wrote = False
+
+
+def replica_alias():
+    alias = getattr(settings, 'REPLICA_DB_ALIAS', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+def pin_key(user_id):
+    return f"db_primary_pin_{user_id}"
+
+
+def is_pinned(user):
+    return bool(user and user.is_authenticated and cache.get(pin_key(user.pk)))
+
+
+class PrimaryReplicaRouter:
+    """Reads go to the replica only when the current request allows it"""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state and state.use_replica and not state.wrote:
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state:
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primary and replica hold the same data
+        return True
+
+
+class ReplicaStickinessMiddleware:
+    """Tracks writes per request and pins users who wrote to the primary"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+
+        # DRF copies the authenticated user back onto the Django request
+        user = getattr(request, 'user', None)
+        if state.wrote and user is not None and user.is_authenticated and replica_alias():
+            cache.set(pin_key(user.pk), 1, getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+        return response
+
+
+class ReplicaReadMixin:
+    """
+    APIView mixin: after authentication (which always reads the primary),
+    route this request's reads to the replica unless the user is pinned.
+    """
+    replica_methods = ('GET', 'HEAD')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        state = _state.get()
+        if state and request.method in self.replica_methods and not is_pinned(request.user):
+            state.use_replica = True
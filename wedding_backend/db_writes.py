@@ -0,0 +1,52 @@
+"""
+Write serialization for SQLite.
+
+SQLite allows a single writer. serialized_write queues the writers inside
+one process on a lock, which is fairer than SQLite's busy-wait polling. It
+runs the view in one transaction. If another process still holds the lock
+past busy_timeout, the whole transaction is retried with exponential
+backoff and jitter. On other database backends it only adds the
+transaction.
+"""
+import functools
+import logging
+import random
+import threading
+import time
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_write_lock = threading.Lock()
+
+
+def is_lock_error(error):
+    message = str(error).lower()
+    return 'database is locked' in message or 'database table is locked' in message or 'busy' in message
+
+
+def serialized_write(view_func):
+    """Decorator for write-heavy view methods; it opens the transaction itself"""
+
+    @functools.wraps(view_func)
+    def wrapper(*args, **kwargs):
+        if connection.vendor != 'sqlite' or connection.in_atomic_block:
+            with transaction.atomic():
+                return view_func(*args, **kwargs)
+
+        retries = getattr(settings, 'DB_WRITE_RETRIES', 2)
+        delay = getattr(settings, 'DB_WRITE_RETRY_DELAY', 0.25)
+        for attempt in range(retries + 1):
+            try:
+                with _write_lock:
+                    with transaction.atomic():
+                        return view_func(*args, **kwargs)
+            except OperationalError as e:
+                if not is_lock_error(e) or attempt == retries:
+                    raise
+                wait = delay * (2 ** attempt) * (0.5 + random.random())
+                logger.warning(f"{view_func.__qualname__}: database locked, retrying in {wait:.3f}s")
+                time.sleep(wait)
+
+    return wrapper
@@ -0,0 +1,150 @@
+"""
+Pooled SMTP email backend.
+
+Django's SMTP backend opens (and TLS-handshakes) a new connection for every
+send_mail() call. PooledSMTPBackend keeps one authenticated connection per
+worker thread and server, reuses it across calls, checks it with NOOP after
+EMAIL_POOL_HEALTHCHECK_AFTER idle seconds, drops it after EMAIL_POOL_MAX_IDLE
+(before the server's own idle timeout) and reconnects once, transparently,
+when the server has hung up mid-send.
+
+Enable with EMAIL_BACKEND = 'wedding_backend.mail.PooledSMTPBackend'.
+close() only releases the connection back to the pool; close_pool() really
+quits (called at exit).
+"""
+import atexit
+import smtplib
+import threading
+import time
+from django.conf import settings
+from django.core.mail.backends.smtp import EmailBackend
+
+_local = threading.local()
+_all_entries = []
+_registry_lock = threading.Lock()
+
+# Errors meaning the pooled connection is gone (rather than the message being rejected)
+DISCONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+class PooledConnection:
+    __slots__ = ('connection', 'last_used')
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.last_used = time.monotonic()
+
+
+def _quit(connection):
+    try:
+        connection.quit()
+    except Exception:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+class PooledSMTPBackend(EmailBackend):
+
+    def _pool(self):
+        pool = getattr(_local, 'pool', None)
+        if pool is None:
+            pool = _local.pool = {}
+        return pool
+
+    def _pool_key(self):
+        return (self.host, self.port, self.username, self.use_tls, self.use_ssl)
+
+    def _healthy(self, entry):
+        idle = time.monotonic() - entry.last_used
+        if idle >= getattr(settings, 'EMAIL_POOL_MAX_IDLE', 240):
+            return False
+        if idle >= getattr(settings, 'EMAIL_POOL_HEALTHCHECK_AFTER', 30):
+            try:
+                return entry.connection.noop()[0] == 250
+            except (smtplib.SMTPException, OSError):
+                return False
+        return True
+
+    def open(self):
+        """
+        Attach the pooled connection (opening one if needed). Returns False
+        rather than True for new connections so send_messages() leaves them
+        open for the next caller; None if opening failed silently.
+        """
+        if self.connection:
+            return False
+
+        pool = self._pool()
+        key = self._pool_key()
+        entry = pool.get(key)
+        if entry is not None:
+            if self._healthy(entry):
+                self.connection = entry.connection
+                return False
+            self._discard(key)
+
+        if super().open() is None or not self.connection:
+            return None
+        entry = pool[key] = PooledConnection(self.connection)
+        with _registry_lock:
+            _all_entries.append(entry)
+        return False
+
+    def close(self):
+        """Release the connection to the pool (it stays open)"""
+        if self.connection is not None:
+            entry = self._pool().get(self._pool_key())
+            if entry is not None and entry.connection is self.connection:
+                entry.last_used = time.monotonic()
+            self.connection = None
+
+    def _discard(self, key=None):
+        """Drop a dead or stale pooled connection"""
+        entry = self._pool().pop(key or self._pool_key(), None)
+        if entry is not None:
+            _quit(entry.connection)
+            with _registry_lock:
+                if entry in _all_entries:
+                    _all_entries.remove(entry)
+        self.connection = None
+
+    def send_messages(self, email_messages):
+        """
+        Send every message over the pooled connection. If the server has
+        dropped it, reconnect once and carry on from the failed message.
+        """
+        if not email_messages:
+            return 0
+        with self._lock:
+            num_sent = 0
+            for message in email_messages:
+                for attempt in (1, 2):
+                    if self.open() is None or not self.connection:
+                        return num_sent
+                    try:
+                        if self._send(message):
+                            num_sent += 1
+                        break
+                    except DISCONNECT_ERRORS:
+                        self._discard()
+                        if attempt == 2:
+                            if not self.fail_silently:
+                                raise
+                            return num_sent
+            self.close()
+        return num_sent
+
+
+def close_pool():
+    """Quit every pooled connection (all threads)"""
+    with _registry_lock:
+        entries = list(_all_entries)
+        _all_entries.clear()
+    for entry in entries:
+        _quit(entry.connection)
+    _local.pool = {}
+
+
+atexit.register(close_pool)
@@ -51,6 +51,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'wedding_backend.db_router.ReplicaStickinessMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -79,13 +80,81 @@ WSGI_APPLICATION = 'wedding_backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+from decouple import config
+
+# SQLite production profile: WAL lets readers run alongside the single
+# writer, IMMEDIATE transactions take the write lock up front (so busy_timeout
+# applies instead of failing on lock upgrade) and the cache/mmap sizes keep
+# hot pages in memory. Disable with SQLITE_PRODUCTION_MODE=False.
+# SQLITE_BUSY_TIMEOUT (seconds) is the only busy timeout: the driver's
+# 'timeout' sets SQLite's busy_timeout, so there is no PRAGMA for it.
+SQLITE_PRODUCTION_MODE = config('SQLITE_PRODUCTION_MODE', default=True, cast=bool)
+SQLITE_BUSY_TIMEOUT = 5
+SQLITE_OPTIONS = {
+    'timeout': SQLITE_BUSY_TIMEOUT,
+    'transaction_mode': 'IMMEDIATE',
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA mmap_size=134217728;'
+        'PRAGMA cache_size=-20000;'
+        'PRAGMA temp_store=MEMORY;'
+    ),
+} if SQLITE_PRODUCTION_MODE else {}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': SQLITE_OPTIONS,
+        # A file rather than in-memory, so threaded tests (one connection per
+        # thread) see the same database
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    }
+}
+
+# Optional read replica for catalog and listing reads (see wedding_backend/db_router.py)
+DATABASE_REPLICA_NAME = config('DATABASE_REPLICA_NAME', default='')
+if DATABASE_REPLICA_NAME:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / DATABASE_REPLICA_NAME,
+        'OPTIONS': SQLITE_OPTIONS,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['wedding_backend.db_router.PrimaryReplicaRouter']
+
+# Keeps the popularity flusher away from the test database (see wedding_backend/test_runner.py)
+TEST_RUNNER = 'wedding_backend.test_runner.TestRunner'
+REPLICA_DB_ALIAS = 'replica'
+# Seconds a user keeps reading from the primary after a write
+REPLICA_PIN_SECONDS = 5
+
+# Retries (with exponential backoff) for write-heavy views that still hit
+# "database is locked"; see wedding_backend/db_writes.py. Each attempt has
+# already waited up to SQLITE_BUSY_TIMEOUT, so the worst case is
+# 3 x 5s + 0.25s x (1 + 2) x 1.5 jitter, about 16s, inside a typical 30s request
+# timeout.
+DB_WRITE_RETRIES = 2
+DB_WRITE_RETRY_DELAY = 0.25
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/ref/settings/#caches
+# The local-memory default is per process. With several workers, point this
+# at a shared backend (e.g. django.core.cache.backends.redis.RedisCache) so
+# service snapshots, invalidations and replica pins are seen by all of them.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
     }
 }
 
+# Seconds a cached service snapshot (name, price, vendor) may be served;
+# saves and deletes invalidate it immediately (see services/resolver.py)
+SERVICE_SNAPSHOT_TTL = 3600
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -156,20 +225,79 @@ REST_KNOX = {
 OTP_EXPIRY_MINUTES = 5
 OTP_RESEND_COOLDOWN = 60
 
+# Cart storage: 'db' (Cart/CartItem rows on every change) or 'cache' (live
+# cart in CACHES, written to the DB every CART_FLUSH_INTERVAL seconds and
+# before checkout; see services/cart_store.py). 'cache' needs a shared cache
+# backend when running several workers.
+CART_BACKEND = config('CART_BACKEND', default='db')
+CART_FLUSH_INTERVAL = 5
+CART_CACHE_TIMEOUT = 7 * 24 * 3600
+# Seconds a cache-backend cart change waits for the user's cart lock before
+# failing with 503
+CART_LOCK_TIMEOUT = 5
+
+# Popularity counters: seconds between buffer flushes (0 disables the
+# background flusher) and the look-back window used for ?ordering=-popularity
+POPULARITY_FLUSH_INTERVAL = 30
+POPULARITY_WINDOW_DAYS = 30
+
+# Package builder search limits: the branch-and-bound stops after this many
+# nodes or seconds and returns the best packages found so far
+PACKAGE_SEARCH_MAX_NODES = 200_000
+PACKAGE_SEARCH_TIME_BUDGET = 0.2
+
+# Mark a type's "similar services" neighbour lists stale when one of its
+# services is saved or deleted; `build_similar_services --dirty` (cron, or
+# --loop as a worker) rebuilds marked types in batch
+SIMILAR_SERVICES_AUTO_REFRESH = True
+
+# Upper bound (seconds) on how stale in-memory histogram arrays can get when
+# changes from other workers are not visible through a shared cache
+HISTOGRAM_MAX_AGE = 300
+
 # Frontend URL for email templates
 FRONTEND_URL = 'http://localhost:5173'
 
 # Email settings (verify these exist)
-EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+# SMTP with one reused connection per worker thread (see wedding_backend/mail.py)
+EMAIL_BACKEND = "wedding_backend.mail.PooledSMTPBackend"
 EMAIL_HOST = "smtp.gmail.com"
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = "techdproject@gmail.com"
 EMAIL_HOST_PASSWORD = "benr mvwb opru dctj"
 DEFAULT_FROM_EMAIL = 'noreply@yourapp.com'
+# Pooled connections are NOOP-checked after this many idle seconds and
+# replaced after EMAIL_POOL_MAX_IDLE (below typical server idle timeouts)
+EMAIL_POOL_HEALTHCHECK_AFTER = 30
+EMAIL_POOL_MAX_IDLE = 240
+
+# Order email outbox (see orders/notifications.py); deliver with
+# `python manage.py send_outbox_emails --loop` or from cron
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_MAX_ATTEMPTS = 5
+# Seconds before the first retry; doubles on every further attempt
+OUTBOX_RETRY_DELAY = 60
+# Seconds a worker holds claimed rows before another worker may retry them
+OUTBOX_LEASE_SECONDS = 300
+
+# Order numbers (ORD<date>-<sequence>) are handed out from per-worker blocks
+# of this many numbers; unused numbers of a block are skipped, not reused
+ORDER_NUMBER_BLOCK_SIZE = 20
+
+# Seconds a stored Idempotency-Key response is replayed; prune older rows
+# with `python manage.py prune_idempotency_keys`
+IDEMPOTENCY_KEY_TTL = 24 * 3600
+
+# Order event stream (GET /orders/events/, see orders/events.py). Serve the
+# project through wedding_backend.asgi under an ASGI server so open streams
+# don't each hold a worker thread.
+ORDER_EVENTS_POLL_INTERVAL = 2
+ORDER_EVENTS_HEARTBEAT = 15
+# Seconds before a stream is closed; clients reconnect with Last-Event-ID
+ORDER_EVENTS_MAX_STREAM = 300
 
 # 2Factor.in SMS Gateway
-from decouple import config
 TWO_FACTOR_API_KEY = config('TWO_FACTOR_API_KEY')
 
 
@@ -182,6 +310,10 @@ CORS_ALLOW_ALL_ORIGINS = False
 
 CORS_ALLOW_CREDENTIALS = True
 
+from corsheaders.defaults import default_headers
+# Order creation and checkout accept an Idempotency-Key (see orders/idempotency.py)
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+
 ALLOWED_HOSTS = [
     "backend-ita7.onrender.com",  # Render internal
     "planithere.in",              # root domain
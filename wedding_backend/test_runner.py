@@ -0,0 +1,22 @@
+"""
+Test runner.
+
+The popularity buffer is flushed by a background thread and once more at
+exit. Under tests the thread is disabled, and whatever the tests left in
+the buffer is dropped before the test database is destroyed, so the exit
+flush has nothing to write to a database that no longer exists.
+"""
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.POPULARITY_FLUSH_INTERVAL = 0
+
+    def teardown_databases(self, old_config, **kwargs):
+        from services import popularity
+        popularity.drain()
+        super().teardown_databases(old_config, **kwargs)